@@ -0,0 +1,99 @@
+"""Recipe order throughput under contention, checked for lost updates and overselling.
+
+Runs against a throwaway SQLite database, so it needs no Firebase credentials:
+
+    python -m benchmarks.recipe_throughput --terminals 4 --orders 250
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Select the backend before any project module reads the configuration
+WORKDIR = tempfile.mkdtemp()
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(WORKDIR, "benchmark.db")
+os.environ["WRITE_QUEUE_PATH"] = os.path.join(WORKDIR, "pending_writes.db")
+os.environ["SNAPSHOT_PATH"] = os.path.join(WORKDIR, "snapshot.msgpack")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.food_inventory_controller import FoodInventory
+from controllers.inventory_cache import InventoryCache, INVENTORY_PATH
+from controllers.staff_controller import StaffController
+from storage import get_storage
+
+
+def seed(ingredient_count, stock_per_item):
+    inventory = FoodInventory()
+    for i in range(ingredient_count):
+        inventory.createItem({
+            "itemName": f"Ingredient {i}",
+            "stock": {"2999-01-01": stock_per_item // 2, "2999-06-01": stock_per_item - stock_per_item // 2},
+        })
+    ingredients = {f"Ingredient {i}": 1 for i in range(ingredient_count)}
+    recipe = StaffController().addRecipe({"recipeName": "Benchmark Dish", "ingredients": ingredients})
+    return next(iter(recipe))
+
+
+def run(terminals, orders, ingredient_count, stock_per_item):
+    with contextlib.redirect_stdout(io.StringIO()):
+        recipe_id = seed(ingredient_count, stock_per_item)
+
+    def terminal(_):
+        controller = StaffController()
+        return sum(1 for _ in range(orders) if controller.orderRecipe(recipe_id))
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=terminals) as pool:
+            succeeded = sum(pool.map(terminal, range(terminals)))
+    elapsed = time.perf_counter() - start
+
+    # Orders return once queued; wait until the database has them all
+    storage = get_storage()
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage.flush()
+    synced = time.perf_counter() - start
+    _, refused = storage.queue_status()
+
+    # Every item must have lost exactly one unit per applied order and never gone negative.
+    # A refused order leaves every one of its items untouched.
+    applied = succeeded - refused
+    items = storage.backend.get(INVENTORY_PATH)
+    lost_updates = [
+        item["itemName"] for item in items.values()
+        if item["totalQuantity"] < 0 or item["totalQuantity"] != sum(item.get("stock", {}).values())
+        or item["totalQuantity"] != stock_per_item - applied
+    ]
+    oversold = applied > stock_per_item
+
+    attempted = terminals * orders
+    # Throughput counts until the database has every order; queueing alone is reported apart
+    print(f"terminals={terminals} attempted={attempted} succeeded={succeeded} refused={refused} "
+          f"synced={synced:.2f}s throughput={attempted / synced:.1f} orders/s (queued after {elapsed:.2f}s)")
+    print(f"lost updates: {len(lost_updates)}  oversold: {oversold}")
+    return not lost_updates and not oversold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terminals", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=250, help="orders attempted per terminal")
+    parser.add_argument("--ingredients", type=int, default=12)
+    parser.add_argument("--stock", type=int, default=800,
+                        help="units per item; below terminals * orders the run also checks overselling")
+    args = parser.parse_args()
+
+    try:
+        ok = run(args.terminals, args.orders, args.ingredients, args.stock)
+    finally:
+        InventoryCache.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
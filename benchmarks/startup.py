@@ -0,0 +1,135 @@
+"""Application startup cost: module import time and time to the first window.
+
+Runs against a throwaway SQLite database, so it needs no Firebase credentials:
+
+    python -m benchmarks.startup --max-import-ms 250 --max-window-ms 1500
+
+Exits non-zero when startup goes over budget or a heavy dependency is imported
+before the window is shown. The window check is skipped when no display is available.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only specific features need; none of them may load at startup
+HEAVY_MODULES = ("matplotlib", "numpy", "msgpack")
+
+# msgpack reads the local snapshot on a page's worker thread, which may run before the window is up
+WINDOW_HEAVY_MODULES = ("matplotlib", "numpy")
+
+FIRST_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import tkinter
+try:
+    from ui.app import StockOverflowApp
+    app = StockOverflowApp()
+    app.update()
+except tkinter.TclError as e:
+    print("no-display", e)
+    raise SystemExit(0)
+elapsed = time.perf_counter() - start
+import sys
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print("window", elapsed * 1000, ",".join(heavy))
+app.destroy()
+from controllers.inventory_cache import InventoryCache
+InventoryCache.shutdown()
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env["STORAGE_BACKEND"] = "sqlite"
+    workdir = tempfile.mkdtemp()
+    env["SQLITE_PATH"] = os.path.join(workdir, "startup.db")
+    env["WRITE_QUEUE_PATH"] = os.path.join(workdir, "pending_writes.db")
+    env["SNAPSHOT_PATH"] = os.path.join(workdir, "snapshot.msgpack")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_imports():
+    # Cumulative import time of main.py in microseconds, plus every module it pulled in
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr}")
+
+    total_us, modules = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if name.strip() == "main":
+            total_us = int(cumulative)
+    return total_us, modules
+
+
+def measure_first_window():
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_WINDOW_SCRIPT.format(heavy=WINDOW_HEAVY_MODULES)],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("no-display"):
+            return None, []
+        if line.startswith("window"):
+            _, elapsed_ms, heavy = (line.split(" ") + [""])[:3]
+            return float(elapsed_ms), [name for name in heavy.split(",") if name]
+    raise RuntimeError(f"Starting the app failed:\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="runs per measurement; the median is reported")
+    parser.add_argument("--max-import-ms", type=float, default=250.0)
+    parser.add_argument("--max-window-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    ok = True
+    import_times = []
+    heavy_imported = set()
+    for _ in range(args.runs):
+        total_us, modules = measure_imports()
+        import_times.append(total_us / 1000)
+        heavy_imported.update(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    import_ms = statistics.median(import_times)
+    print(f"import main: {import_ms:.1f} ms (budget {args.max_import_ms:.0f} ms)")
+    if import_ms > args.max_import_ms:
+        ok = False
+    if heavy_imported:
+        print(f"heavy modules imported at startup: {', '.join(sorted(heavy_imported))}")
+        ok = False
+
+    window_times = []
+    for _ in range(args.runs):
+        elapsed_ms, heavy = measure_first_window()
+        if elapsed_ms is None:
+            print("first window: skipped, no display available")
+            break
+        window_times.append(elapsed_ms)
+        if heavy:
+            print(f"heavy modules imported before the first window: {', '.join(heavy)}")
+            ok = False
+    if window_times:
+        window_ms = statistics.median(window_times)
+        print(f"first window: {window_ms:.1f} ms (budget {args.max_window_ms:.0f} ms)")
+        if window_ms > args.max_window_ms:
+            ok = False
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Load time, memory and scroll latency of the inventory table at 100k rows.
+
+Compares a plain ttk.Treeview holding every row with the VirtualTable used by the
+inventory and order pages. Each variant runs in its own process so memory figures
+do not mix:
+
+    python -m benchmarks.table_scale --rows 100000 --max-scroll-ms 16
+
+Exits non-zero when the virtual table goes over budget. Needs a display; without
+one the run is skipped.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLUMNS = ("itemName", "stock", "totalQuantity")
+TAGS = ("", "low_stock", "near_expiry", "low_and_near")
+
+
+def resident_kib():
+    # Current resident set size; falls back to the peak where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        dates = ", ".join(f"2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(rng.randint(1, 3)))
+        rows.append((f"item{i}", (f"Ingredient {i}", dates, rng.randint(0, 500)), (rng.choice(TAGS),)))
+    return rows
+
+
+def run_variant(variant, count, scroll_steps):
+    import tkinter as tk
+    from tkinter import ttk
+    from ui.virtual_table import VirtualTable
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.geometry("900x600")
+    rows = make_rows(count)
+    root.update()
+    baseline = resident_kib()
+
+    start = time.perf_counter()
+    if variant == "treeview":
+        table = ttk.Treeview(root, columns=COLUMNS, show="headings")
+        table.pack(fill=tk.BOTH, expand=True)
+        for iid, values, tags in rows:
+            table.insert("", "end", iid=iid, values=values, tags=tags)
+
+        def scroll():
+            table.yview_scroll(10, "units")
+    else:
+        table = VirtualTable(root, columns=COLUMNS)
+        table.pack(fill=tk.BOTH, expand=True)
+        table.set_rows(rows)
+
+        def scroll():
+            table.scroll_to(table.top + 10)
+    root.update()
+    load_ms = (time.perf_counter() - start) * 1000
+    memory_kib = resident_kib() - baseline
+
+    latencies = []
+    for _ in range(scroll_steps):
+        step_start = time.perf_counter()
+        scroll()
+        root.update()
+        latencies.append((time.perf_counter() - step_start) * 1000)
+    root.destroy()
+
+    latencies.sort()
+    return {
+        "load_ms": load_ms,
+        "memory_kib": memory_kib,
+        "scroll_median_ms": statistics.median(latencies),
+        "scroll_p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def measure(variant, count, scroll_steps):
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.table_scale", "--variant", variant,
+         "--rows", str(count), "--scroll-steps", str(scroll_steps)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{variant} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--scroll-steps", type=int, default=200)
+    parser.add_argument("--max-load-ms", type=float, default=1000.0, help="budget for the virtual table")
+    parser.add_argument("--max-scroll-ms", type=float, default=16.0, help="p95 budget for the virtual table")
+    parser.add_argument("--variant", choices=("treeview", "virtual"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.rows, args.scroll_steps)))
+        return
+
+    results = {variant: measure(variant, args.rows, args.scroll_steps) for variant in ("treeview", "virtual")}
+    if any(result is None for result in results.values()):
+        print("skipped, no display available")
+        return
+
+    for variant, result in results.items():
+        print(f"{variant:>8}: rows={args.rows} load={result['load_ms']:.0f} ms "
+              f"memory={result['memory_kib'] / 1024:.1f} MiB "
+              f"scroll median={result['scroll_median_ms']:.2f} ms p95={result['scroll_p95_ms']:.2f} ms")
+
+    virtual = results["virtual"]
+    ok = virtual["load_ms"] <= args.max_load_ms and virtual["scroll_p95_ms"] <= args.max_scroll_ms
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
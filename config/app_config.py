@@ -1,6 +1,60 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 class AppConfig:
     # App name
     APP_NAME = "Stock Overflow"
+
+    # Storage backend: "firebase" (Realtime Database) or "sqlite" (local file)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firebase")
+    DB_URL = os.getenv("DB_URL")
+    FIREBASE_KEY_PATH = os.getenv("FIREBASE_KEY_PATH", "key.json")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "stockoverflow.db")
+
+    # Firebase requests give up after this many seconds instead of hanging the page that made them;
+    # the pool keeps this many keep-alive connections open for concurrent loads
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+    # Identical reads are shared while in flight and their result reused for this many seconds;
+    # changes made by other terminals can show up this much later
+    READ_CACHE_SECONDS = float(os.getenv("READ_CACHE_SECONDS", "2"))
+
+    # Attempts per read before the last known data is used instead; after BREAKER_FAILURES
+    # failed calls in a row the database is treated as down and retried every BREAKER_RESET_SECONDS
+    READ_ATTEMPTS = 2
+    BREAKER_FAILURES = 3
+    BREAKER_RESET_SECONDS = 30
+
+    # Trees kept in a local msgpack snapshot, so a start reads the file and then fetches only the
+    # records changed since; the file is rewritten every SNAPSHOT_SAVE_SECONDS and on exit
+    SNAPSHOT_TREES = ("db/inventory", "db/recipes", "orders")
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "snapshot.msgpack")
+    SNAPSHOT_SAVE_SECONDS = int(os.getenv("SNAPSHOT_SAVE_SECONDS", "300"))
+
+    # Local file holding writes that have not reached the database yet, so none are lost offline
+    WRITE_QUEUE_PATH = os.getenv("WRITE_QUEUE_PATH", "pending_writes.db")
+
+    # Also keep the itemName -> item_id index as its own node, which stops two terminals
+    # from creating the same new item at once
+    STORE_NAME_INDEX = os.getenv("STORE_NAME_INDEX", "false").lower() == "true"
+
+    # Received orders shown on the Order page besides all pending ones
+    ORDER_PAGE_LIMIT = 200
+
+    # Pages without a live listener refetch on navigation only when their data is older than this
+    PAGE_REFRESH_SECONDS = int(os.getenv("PAGE_REFRESH_SECONDS", "60"))
+
+    # Received orders older than this are moved out of the hot orders node, either into
+    # monthly "ordersArchive" nodes ("database") or monthly files in ARCHIVE_DIR ("msgpack")
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_TARGET = os.getenv("ARCHIVE_TARGET", "database")
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+    # Conflicting writes a stock transaction retries before it gives up
+    TRANSACTION_MAX_RETRIES = 10
     
     # Colors
     BG_COLOR = "#f5f5f5"
@@ -0,0 +1,120 @@
+import os
+import msgpack
+from datetime import datetime, timedelta
+from config.app_config import AppConfig
+from storage import get_storage
+from controllers.order_controller import ORDERS_PATH
+
+ARCHIVE_PATH = "ordersArchive"
+
+class ArchiveController:
+    def __init__(self, target=None, archive_dir=None):
+        # Archive into monthly database nodes ("database") or local msgpack files ("msgpack")
+        self.storage = get_storage()
+        self.target = target or AppConfig.ARCHIVE_TARGET
+        self.archive_dir = archive_dir or AppConfig.ARCHIVE_DIR
+
+    def archive_orders(self, max_age_days=None):
+        # Move received orders older than max_age_days out of the hot orders node
+        if max_age_days is None:
+            max_age_days = AppConfig.ARCHIVE_AFTER_DAYS
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y-%m-%d")
+
+        try:
+            # The cutoff date sorts before any time on that day, so only older orders match
+            candidates = self.storage.query(ORDERS_PATH, "order_date", end_at=cutoff)
+        except Exception as e:
+            print(f"Error fetching orders to archive: {e}")
+            return 0
+
+        # Group by month; the status is dropped since every archived order is received
+        months = {}
+        for order_id, order_data in candidates.items():
+            if order_data.get("order_status") != "Received":
+                continue
+            month = order_data.get("order_date", "")[:7]
+            months.setdefault(month, {})[order_id] = {
+                "order_date": order_data.get("order_date"),
+                "order_content": order_data.get("order_content", {})
+            }
+        if not months:
+            print("No orders to archive.")
+            return 0
+
+        try:
+            changes = {}
+            if self.target == "msgpack":
+                # Files are written before the orders are removed, so a failure loses nothing
+                for month, orders in months.items():
+                    self._write_month_file(month, orders)
+            else:
+                for month, orders in months.items():
+                    for order_id, order_data in orders.items():
+                        changes[f"{ARCHIVE_PATH}/{month}/{order_id}"] = order_data
+
+            # Copy and removal happen in one write when archiving to the database
+            for orders in months.values():
+                for order_id in orders:
+                    changes[f"{ORDERS_PATH}/{order_id}"] = None
+            self.storage.update("/", changes)
+        except Exception as e:
+            print(f"Error archiving orders: {e}")
+            return 0
+
+        archived = sum(len(orders) for orders in months.values())
+        print(f"Archived {archived} orders into {len(months)} monthly archives.")
+        return archived
+
+    def get_archived_orders(self, start_date, end_date):
+        # Fetch archived orders placed from start_date through end_date (YYYY-MM-DD, inclusive)
+        start_month, end_month = start_date[:7], end_date[:7]
+        try:
+            if self.target == "msgpack":
+                months = self._list_month_files()
+            else:
+                months = self.storage.keys(ARCHIVE_PATH)
+
+            orders = {}
+            for month in sorted(months):
+                if not start_month <= month <= end_month:
+                    continue
+                if self.target == "msgpack":
+                    month_orders = self._read_month_file(month)
+                else:
+                    month_orders = self.storage.get(f"{ARCHIVE_PATH}/{month}") or {}
+                for order_id, order_data in month_orders.items():
+                    if start_date <= order_data.get("order_date", "")[:10] <= end_date:
+                        orders[order_id] = dict(order_data, order_status="Received")
+            return orders
+        except Exception as e:
+            print(f"Error reading archived orders: {e}")
+            return {}
+
+    def _month_file(self, month):
+        return os.path.join(self.archive_dir, f"orders-{month}.msgpack")
+
+    def _list_month_files(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return [
+            name[len("orders-"):-len(".msgpack")]
+            for name in os.listdir(self.archive_dir)
+            if name.startswith("orders-") and name.endswith(".msgpack")
+        ]
+
+    def _read_month_file(self, month):
+        path = self._month_file(month)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read())
+
+    def _write_month_file(self, month, orders):
+        # Merge with what is already archived, then swap the file in atomically
+        os.makedirs(self.archive_dir, exist_ok=True)
+        merged = self._read_month_file(month)
+        merged.update(orders)
+        path = self._month_file(month)
+        with open(path + ".tmp", "wb") as f:
+            f.write(msgpack.packb(merged))
+        os.replace(path + ".tmp", path)
@@ -1,22 +1,22 @@
-import requests
-import os
-from dotenv import load_dotenv
+from storage import get_storage
 
-load_dotenv()
+USER_PATH = "user"
 
 class AuthController:
     def __init__(self):
-        # Initialize admin state and database URL
+        # Initialize admin state and storage
         self.admin = None
-        self.db_url = os.getenv("DB_URL") + "/user.json"
+        self.storage = get_storage()
 
     def get_admin_credentials(self):
         # Fetch stored admin credentials from the database
-        response = requests.get(self.db_url)
-        if response.status_code == 200:
-            admin_data = response.json()
-            if admin_data:
-                return admin_data.get('username'), admin_data.get('password')
+        try:
+            admin_data = self.storage.get(USER_PATH)
+        except Exception as e:
+            print(f"Error fetching admin credentials: {e}")
+            return None, None
+        if admin_data:
+            return admin_data.get('username'), admin_data.get('password')
         return None, None
 
     def login_admin(self, username, password):
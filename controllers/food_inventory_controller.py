@@ -1,58 +1,59 @@
-from models.inventory import InventoryItem
-from firebase_admin import db
+from config.app_config import AppConfig
+from storage import get_storage
+from storage.base import encode_key, new_key
+from controllers.inventory_cache import InventoryCache, INVENTORY_PATH, NAME_INDEX_PATH
+from controllers.operations import claim_steps, stock_changes
 from datetime import datetime, timedelta
 
 class FoodInventory:
     def __init__(self):
-        # Initialize database references
-        self.ref = db.reference('db')
-        self.items_ref = self.ref.child('inventory')
+        # Initialize storage and the shared inventory cache
+        self.storage = get_storage()
+        self.cache = InventoryCache.instance()
 
     def displayItems(self, sortBy="itemName", isReversed=False):
-        current_date = datetime.now().date()
-        warning_date = current_date + timedelta(days=7)
+        # ISO dates compare correctly as strings, so no date parsing is needed per item
+        warning_date = (datetime.now().date() + timedelta(days=7)).isoformat()
 
-        # Retrieve all items from the database
-        items = self.items_ref.get()
+        # Retrieve all items from the in-memory cache
+        items = self.cache.get_items()
         if not items:
             print("No items found in inventory.")
             return []
         
-        inventory_list = []
+        # Near-expiry items come straight from the lot index instead of a scan over every lot
+        near_expiry_ids = self.cache.lots.items_expiring_before(warning_date)
+        rows = []
 
         for item_id, item_data in items.items():
-            is_low = False
-            near_expiry = False
-            
-            # Check if any item is near expiry
-            expiry_date_str = item_data.get("stock")
-            if expiry_date_str:
-                for item_expiry_date in expiry_date_str.keys():
-                    expiry_date = datetime.strptime(item_expiry_date, "%Y-%m-%d").date()
-                    if expiry_date < warning_date:
-                        near_expiry = True
-
-            # Check if item stock is low
-            item_stock = item_data.get("totalQuantity")
-            if item_stock < 20:
-                is_low = True
-
-            item_data["is_low"] = is_low
-            item_data["near_expiry"] = near_expiry
-            inventory_list.append({item_id: item_data})
+            # Copy so the flags below never leak into the shared cache
+            item_data = dict(item_data)
+
+            # The lot index keeps each item's expiry dates sorted, so the earliest is at hand
+            item_data["earliestExpiry"] = self.cache.lots.earliest(item_id)
+
+            # Check if any lot is near expiry and if item stock is low
+            item_data["near_expiry"] = item_id in near_expiry_ids
+            item_data["is_low"] = item_data.get("totalQuantity", 0) < 20
+            rows.append((item_id, item_data))
 
         # Sort the inventory list based on the given criteria
         if sortBy == "itemName":
-            inventory_list.sort(key=lambda x: list(x.values())[0]["itemName"])
+            rows.sort(key=lambda row: row[1]["itemName"])
         elif sortBy == "stock":
-            inventory_list.sort(key=lambda x: min(list(x.values())[0]["stock"].keys()))
+            rows.sort(key=lambda row: row[1].get("earliestExpiry") or "")
         elif sortBy == "totalQuantity":
-            inventory_list.sort(key=lambda x: list(x.values())[0]["totalQuantity"])
+            rows.sort(key=lambda row: row[1].get("totalQuantity", 0))
 
         if isReversed:
-            inventory_list.reverse()
+            rows.reverse()
+
+        return [{item_id: item_data} for item_id, item_data in rows]
 
-        return inventory_list
+    def getExpiringLots(self, days=7):
+        # Lots expiring within the given number of days as (expiry, item_id, quantity), soonest first
+        before_date = (datetime.now().date() + timedelta(days=days)).isoformat()
+        return self.cache.lots.expiring_before(before_date)
 
     # Admin Functions
     def createItem(self, item):
@@ -61,54 +62,110 @@ class FoodInventory:
             itemName = item["itemName"]
             new_stock = item["stock"] 
 
-            # Check if item already exists
-            existing_items = self.items_ref.order_by_child("itemName").equal_to(itemName).get()
-
-            if existing_items:
-                # If the item exists, update its stock
-                for item_id, existing_item in existing_items.items():
-                    existing_stock = existing_item.get("stock", {})
-
-                    # Add new quantities to existing stock
-                    for expiry_date, quantity in new_stock.items():
-                        existing_stock[expiry_date] = existing_stock.get(expiry_date, 0) + quantity
-
-                    totalQuantity = sum(existing_stock.values())
+            is_new = self.cache.find_id(itemName) is None
+            items, claims = self.receiptItems({itemName: new_stock})
+            item_id = next(iter(items))
 
-                    self.items_ref.child(item_id).update({
-                        "stock": existing_stock,
-                        "totalQuantity": totalQuantity
-                    })
-                    print(f"Updated stock for {itemName}. New total: {totalQuantity}")
-                    return {item_id: {"itemName": itemName, "stock": existing_stock, "totalQuantity": totalQuantity}}
+            # The write is queued and the cache shows it straight away
+            self.queueReceipt(items, claims)
 
-            else:
-                # Create a new item if it doesn't exist
-                new_item = InventoryItem(itemName, new_stock)
-                new_item_dict = new_item.to_dict()
-                new_ref = self.items_ref.push(new_item_dict)
+            if is_new:
                 print(f"Created new item: {itemName}")
-                return {new_ref.key: new_item}
+            else:
+                totalQuantity = self.cache.get_item(item_id)["totalQuantity"]
+                print(f"Updated stock for {itemName}. New total: {totalQuantity}")
+            return {item_id: self.cache.get_item(item_id)}
 
         except Exception as e:
             print(f"Error creating/updating item: {e}")
             return None
 
-    def updateItem(self, itemId, item):
-        # Update an existing item and recalculate total quantity if stock is modified
+    def receiptItems(self, received, new_ids=None):
+        # Group received ({itemName: {expiry_date: quantity}}) by item as {item_id: {"itemName", "stock"}},
+        # giving new items a new key; pass the same new_ids dict to receipts queued together so they
+        # agree on those keys. Also returns {item_id: itemName} for the new items whose names have
+        # to be claimed in the stored index first.
+        items = {}
+        claims = {}
+        for itemName, new_stock in received.items():
+            # Look the item up in the local name index instead of querying the database
+            item_id = self.cache.find_id(itemName)
+            if item_id is None:
+                item_id = new_key() if new_ids is None else new_ids.setdefault(itemName, new_key())
+                if AppConfig.STORE_NAME_INDEX:
+                    claims[item_id] = itemName
+            items[item_id] = {"itemName": itemName, "stock": new_stock}
+        return items, claims
+
+    def queueReceipt(self, items, claims):
+        # Queue adding the lots of receiptItems(). Claims are queued with them rather than waited
+        # on, so this works offline; if another terminal claimed a name first, the lots follow it.
+        if claims:
+            self.storage.enqueue(claim_steps(claims), ("addStock", {"items": items, "claimed": list(claims)}))
+        else:
+            self.storage.update("/", stock_changes(items))
+
+    def updateItem(self, itemId, item, base=None):
+        # Update an existing item and recalculate total quantity if stock is modified. base is the
+        # item as it was when the edit started (the cached item by default); the edit is queued as
+        # an operation that is refused if the stored item no longer matches it.
         try:
+            base = base if base is not None else self.cache.get_item(itemId)
+            if base is None:
+                print(f"No item found with ID: {itemId}")
+                return
+
             if "stock" in item:
                 item["totalQuantity"] = sum(item["stock"].values())
 
-            self.items_ref.child(itemId).update(item)
+            # Move the stored name index entry along with a rename, once the edit applied
+            changes = {}
+            old_name = base.get("itemName")
+            if AppConfig.STORE_NAME_INDEX and "itemName" in item and item["itemName"] != old_name:
+                if old_name is not None:
+                    changes[f"{NAME_INDEX_PATH}/{encode_key(old_name)}"] = None
+                changes[f"{NAME_INDEX_PATH}/{encode_key(item['itemName'])}"] = itemId
+
+            self.storage.enqueue(
+                [(f"{INVENTORY_PATH}/{itemId}", "editItem", {"base": base, "fields": item})],
+                ("applyChanges", {"changes": changes}) if changes else None
+            )
             print(f"Updated item: {itemId}")
         except Exception as e:
             print(f"Error updating item: {e}")
 
-    def deleteItem(self, itemId):
-        # Remove an item from the inventory
+    def deleteItem(self, itemId, base=None):
+        # Remove an item from the inventory, unless the stored item no longer matches base (the
+        # cached item by default); the check and the delete are queued as one operation
         try:
-            self.items_ref.child(itemId).delete()
+            base = base if base is not None else self.cache.get_item(itemId)
+            if base is None:
+                print(f"No item found with ID: {itemId}")
+                return
+
+            changes = {f"{INVENTORY_PATH}/{itemId}": None}
+            item_name = base.get("itemName")
+            if AppConfig.STORE_NAME_INDEX and item_name is not None:
+                changes[f"{NAME_INDEX_PATH}/{encode_key(item_name)}"] = None
+
+            self.storage.enqueue(
+                [(f"{INVENTORY_PATH}/{itemId}", "checkItem", {"base": base})],
+                ("applyChanges", {"changes": changes})
+            )
             print(f"Deleted item: {itemId}")
         except Exception as e:
             print(f"Error deleting item: {e}")
+
+    def rebuildNameIndex(self):
+        # Replace the stored itemName -> item_id index with one built from the cached inventory,
+        # dropping entries for items that were renamed or deleted
+        try:
+            index = {
+                encode_key(item_name): item_id
+                for item_name, item_id in self.cache.name_index.items()
+                if item_name
+            }
+            self.storage.set(NAME_INDEX_PATH, index or None)
+            print(f"Stored name index for {len(index)} items.")
+        except Exception as e:
+            print(f"Error rebuilding name index: {e}")
@@ -0,0 +1,183 @@
+import threading
+from storage import get_storage
+from storage.base import split_path, with_value
+from controllers.lot_index import LotIndex
+
+INVENTORY_PATH = "db/inventory"
+NAME_INDEX_PATH = "db/inventoryIndex"
+
+# Pause between attempts to register the listener after it failed, e.g. while offline
+LISTEN_RETRY_SECONDS = 15
+
+
+class InventoryCache:
+    # Process-wide copy of the inventory tree, kept current by a storage listener
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path=INVENTORY_PATH, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.items = {}
+        self.name_index = {}
+        self._sorted_names = (None, [])
+        self.lots = LotIndex()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+        self._registration = None
+
+    @classmethod
+    def instance(cls):
+        # Return the shared cache, starting its listener on first use. It is shared only once it
+        # has started, so a start that could not load anything is tried again by the next call.
+        with cls._instance_lock:
+            if cls._instance is None:
+                cache = cls()
+                cache.start()
+                cls._instance = cache
+            return cls._instance
+
+    @classmethod
+    def shutdown(cls):
+        # Stop the shared listener so the process can exit
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.close()
+                cls._instance = None
+
+    def start(self):
+        # The first listener event is a full "put" of the tree, so it doubles as the initial load.
+        # Firebase downloads the whole tree for it, while a read is answered from the local
+        # snapshot plus the records changed since (or the snapshot alone while offline), so
+        # start from that first. Without a snapshot that read would be a second full download,
+        # so then just wait for the listener.
+        storage = get_storage()
+        if storage.has_local_copy(self.path):
+            try:
+                self._seed(storage.get(self.path))
+            except Exception as e:
+                print(f"Error loading inventory from the snapshot: {e}")
+        try:
+            self._registration = storage.listen(self.path, self.apply)
+        except Exception as e:
+            print(f"Error listening to inventory changes, retrying in the background: {e}")
+            if not self._ready.is_set():
+                # Raises when there is nothing to show at all
+                self.apply("put", "/", storage.get(self.path))
+            threading.Thread(target=self._retry_listen, daemon=True).start()
+            return
+        if not self._ready.wait(self.timeout):
+            print("Inventory listener did not respond, loading inventory directly.")
+            try:
+                self.apply("put", "/", storage.get(self.path))
+            except Exception:
+                self.close()
+                raise
+
+    def _retry_listen(self):
+        # Register the listener once the database can be reached; its first event brings the
+        # cache up to date
+        storage = get_storage()
+        while not self._closed.wait(LISTEN_RETRY_SECONDS):
+            try:
+                registration = storage.listen(self.path, self.apply)
+            except Exception as e:
+                print(f"Error listening to inventory changes, will retry: {e}")
+                continue
+            with self._lock:
+                if not self._closed.is_set():
+                    self._registration = registration
+                    return
+            registration.close()
+            return
+
+    def close(self):
+        with self._lock:
+            self._closed.set()
+            registration, self._registration = self._registration, None
+        if registration is not None:
+            registration.close()
+
+    def get_items(self):
+        # Items are replaced, never mutated, so callers may iterate the returned dict freely
+        return self.items
+
+    def get_item(self, item_id):
+        return self.items.get(item_id)
+
+    def find_id(self, item_name):
+        # O(1) itemName -> item_id lookup without touching the network
+        return self.name_index.get(item_name)
+
+    def item_names(self):
+        # Sorted item names for pickers, without touching stock; re-sorted only after a name changes
+        name_index = self.name_index
+        source, names = self._sorted_names
+        if source is not name_index:
+            names = sorted(name for name in name_index if name is not None)
+            self._sorted_names = (name_index, names)
+        return names
+
+    def apply(self, event_type, path, data):
+        # Apply a change using the same put/patch semantics as Firebase listener events
+        with self._lock:
+            self._apply(event_type, path, data)
+            # Set under the lock so a seed waiting for it cannot overwrite this event
+            self._ready.set()
+
+    def _seed(self, data):
+        # Show data until the listener's first event arrives and replaces it
+        with self._lock:
+            if not self._ready.is_set():
+                self._apply("put", "/", data)
+                self._ready.set()
+
+    def _apply(self, event_type, path, data):
+        parts = split_path(path)
+        if event_type == "put":
+            writes = [(parts, data)]
+        else:
+            writes = [(parts + split_path(child_path), value) for child_path, value in data.items()]
+
+        items = self.items
+        for write_parts, value in writes:
+            items = with_value(items, write_parts, value)
+        old_items, self.items = self.items, (items if isinstance(items, dict) else {})
+
+        # A write at the root replaces the whole tree, otherwise only the touched items change
+        if all(write_parts for write_parts, _ in writes):
+            touched_ids = {write_parts[0] for write_parts, _ in writes}
+            self._reindex(old_items, touched_ids)
+            for item_id in touched_ids:
+                old_stock = (old_items.get(item_id) or {}).get("stock")
+                new_stock = (self.items.get(item_id) or {}).get("stock")
+                if new_stock is not old_stock:
+                    self.lots.update_item(item_id, new_stock)
+        else:
+            self._reindex(old_items, None)
+            self.lots.rebuild(self.items)
+
+    def _reindex(self, old_items, item_ids):
+        # Keep name_index in step with the items; it is replaced rather than mutated, like items
+        if item_ids is None:
+            name_index = {}
+            for item_id, item_data in self.items.items():
+                name_index.setdefault(item_data.get("itemName"), item_id)
+            self.name_index = name_index
+            return
+
+        name_index = None
+        for item_id in item_ids:
+            old_name = (old_items.get(item_id) or {}).get("itemName")
+            new_name = (self.items.get(item_id) or {}).get("itemName")
+            if old_name == new_name:
+                continue
+            if name_index is None:
+                name_index = dict(self.name_index)
+            if old_name is not None and name_index.get(old_name) == item_id:
+                del name_index[old_name]
+            if new_name is not None:
+                name_index.setdefault(new_name, item_id)
+        if name_index is not None:
+            self.name_index = name_index
@@ -0,0 +1,91 @@
+import heapq
+import threading
+from bisect import bisect_left
+
+
+class LotIndex:
+    # Every stock lot of the inventory ordered by (expiry date, item id), kept in a heap so a
+    # change to one item costs O(log n) per lot. Lots that are removed stay in the heap until a
+    # range query reaches them and skips them (lazy deletion); the heap is rebuilt once those
+    # outnumber the live lots.
+
+    def __init__(self):
+        self._heap = []
+        # Live lots by (expiry date, item id), every lot in the heap, live or not, and the sorted
+        # expiry dates of each item
+        self._quantities = {}
+        self._in_heap = set()
+        self._item_lots = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, items):
+        # Replace the whole index from an {item_id: item} tree
+        quantities, item_lots = {}, {}
+        for item_id, item_data in (items or {}).items():
+            stock = (item_data or {}).get("stock") or {}
+            for expiry_date, quantity in stock.items():
+                quantities[(expiry_date, item_id)] = quantity
+            item_lots[item_id] = sorted(stock)
+        heap = list(quantities)
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap, self._quantities, self._in_heap, self._item_lots = heap, quantities, set(heap), item_lots
+
+    def update_item(self, item_id, stock):
+        # Replace the lots of one item; pass None when the item is deleted
+        stock = stock or {}
+        with self._lock:
+            for expiry_date in self._item_lots.pop(item_id, []):
+                del self._quantities[(expiry_date, item_id)]
+            for expiry_date, quantity in stock.items():
+                lot = (expiry_date, item_id)
+                self._quantities[lot] = quantity
+                if lot not in self._in_heap:
+                    self._in_heap.add(lot)
+                    heapq.heappush(self._heap, lot)
+            if stock:
+                self._item_lots[item_id] = sorted(stock)
+            if len(self._heap) > 2 * len(self._quantities) + 64:
+                self._heap = list(self._quantities)
+                heapq.heapify(self._heap)
+                self._in_heap = set(self._heap)
+
+    def expiring_before(self, date):
+        # Lots expiring before date (YYYY-MM-DD) as (expiry, item_id, quantity), soonest first.
+        # Pops the lots in range in order, dropping removed ones for good, and pushes the rest back.
+        with self._lock:
+            found = []
+            while self._heap and self._heap[0] < (date,):
+                lot = heapq.heappop(self._heap)
+                if lot in self._quantities:
+                    found.append(lot)
+                else:
+                    self._in_heap.discard(lot)
+            for lot in found:
+                heapq.heappush(self._heap, lot)
+            return [(expiry_date, item_id, self._quantities[(expiry_date, item_id)]) for expiry_date, item_id in found]
+
+    def items_expiring_before(self, date):
+        return {item_id for _, item_id, _ in self.expiring_before(date)}
+
+    def earliest(self, item_id):
+        # Earliest expiry date of an item's lots, None when it has none
+        with self._lock:
+            dates = self._item_lots.get(item_id)
+            return dates[0] if dates else None
+
+    def pick(self, item_id, quantity, not_before):
+        # First-expiry-first-out lots covering quantity, skipping lots expired before not_before
+        with self._lock:
+            dates = self._item_lots.get(item_id, [])
+            taken = {}
+            remaining = quantity
+            for expiry_date in dates[bisect_left(dates, not_before):]:
+                if remaining <= 0:
+                    break
+                available = self._quantities[(expiry_date, item_id)]
+                if available <= 0:
+                    continue
+                taken[expiry_date] = min(remaining, available)
+                remaining -= taken[expiry_date]
+        return taken if remaining <= 0 else None
@@ -0,0 +1,139 @@
+from storage.base import Increment, TransactionAbortedError, encode_key, follow_up, operation
+from controllers.inventory_cache import INVENTORY_PATH, NAME_INDEX_PATH
+
+# Operations the write queue can replay. get_storage() imports this module before the queue starts
+# sending, so operations queued in an earlier session are known even before their controllers load.
+
+
+@operation("deductLots")
+def deduct_lots(item_data, args):
+    # Take args["quantity"] from an item, from the planned lots in args["lots"] while they still hold
+    # enough and otherwise first-expiring lots first, skipping lots expired before args["today"]
+    itemName = args["itemName"]
+    requiredQty = args["quantity"]
+    if not item_data:
+        raise TransactionAbortedError(f"Insufficient stock for {itemName}")
+
+    stock = dict(item_data.get("stock", {}))
+    totalQuantity = item_data.get("totalQuantity", 0)
+    if totalQuantity < requiredQty:
+        raise TransactionAbortedError(f"Not enough {itemName} in stock.")
+
+    taken = args.get("lots") or {}
+    if sum(taken.values()) != requiredQty or any(
+        stock.get(expiryDate, 0) < quantity for expiryDate, quantity in taken.items()
+    ):
+        # Another terminal used these lots meanwhile, pick again from what is left
+        taken = {}
+        remaining = requiredQty
+        for expiryDate, quantity in sorted(stock.items()):
+            if remaining <= 0:
+                break
+            if expiryDate < args["today"]:
+                continue
+            taken[expiryDate] = min(remaining, quantity)
+            remaining -= taken[expiryDate]
+        if remaining > 0:
+            raise TransactionAbortedError(f"Not enough non-expired {itemName} in stock.")
+
+    for expiryDate, toDeduct in taken.items():
+        stock[expiryDate] -= toDeduct
+        if stock[expiryDate] == 0:
+            del stock[expiryDate]
+    return dict(item_data, stock=stock, totalQuantity=totalQuantity - requiredQty)
+
+
+@operation("claimName")
+def claim_name(owner, args):
+    # Reserve a name in the stored index for args["itemId"], unless an item already owns it
+    return owner or args["itemId"]
+
+
+@operation("receiveOrder")
+def receive_order(order, args):
+    # Mark an order received, refusing unless it is still pending. The order stays accepted when
+    # this same receipt (args["receiptId"]) already marked it, in case the queue sends it again.
+    orderId = args["orderId"]
+    if not order:
+        raise TransactionAbortedError(f"Order {orderId} no longer exists.")
+    if order.get("receiptId") == args["receiptId"]:
+        return order
+    if order.get("order_status") != "Pending":
+        raise TransactionAbortedError(f"Order {orderId} is {order.get('order_status')}, not Pending.")
+    return dict(order, order_status="Received", receiptId=args["receiptId"])
+
+
+@operation("editItem")
+def edit_item(item_data, args):
+    # Apply an admin's edit (args["fields"], None removing a field) to the item it was made on,
+    # args["base"]. Refused once the item no longer matches it, so the edit cannot overwrite
+    # deductions or receipts from other terminals. An item already showing the edit is accepted,
+    # in case the queue sends it again.
+    edited = dict(args["base"], **args["fields"])
+    edited = {field: value for field, value in edited.items() if value is not None}
+    if _pruned(item_data) == _pruned(edited):
+        return item_data
+    if _pruned(item_data) != _pruned(args["base"]):
+        raise TransactionAbortedError(f"{args['base'].get('itemName')} was changed elsewhere since it was edited.")
+    return edited
+
+
+@operation("checkItem")
+def check_item(item_data, args):
+    # Leave an item as it is, refusing once it no longer matches args["base"]; queued ahead of
+    # deleting it, so a delete cannot drop stock another terminal added meanwhile
+    if _pruned(item_data) != _pruned(args["base"]):
+        raise TransactionAbortedError(f"{args['base'].get('itemName')} was changed elsewhere since it was deleted.")
+    return item_data
+
+
+@follow_up("applyChanges")
+def apply_changes(results, args):
+    # Write args["changes"], {absolute path: value}, once the steps applied
+    return args["changes"]
+
+
+@follow_up("receiveStock")
+def receive_stock(results, args):
+    # Add the lots of an order once it is marked received, claiming the names of new items first
+    claims = args.get("claims") or {}
+    if claims:
+        return claim_steps(claims), ("addStock", {"items": args["items"], "claimed": list(claims)})
+    return stock_changes(args["items"])
+
+
+@follow_up("addStock")
+def add_stock(results, args):
+    # Add the lots in args["items"] once the claims of args["claimed"], ids of new items in step
+    # order, are settled; an item whose name turned out to be taken goes to the owner instead
+    claimed = args.get("claimed") or []
+    return stock_changes(args["items"], dict(zip(claimed, results)) if results is not None else None)
+
+
+def claim_steps(claims):
+    # Steps claiming the names of new items, given as {item_id: itemName}
+    return [
+        (f"{NAME_INDEX_PATH}/{encode_key(itemName)}", "claimName", {"itemId": item_id})
+        for item_id, itemName in claims.items()
+    ]
+
+
+def stock_changes(items, owners=None):
+    # Writes adding {item_id: {"itemName", "stock"}} to the inventory with server-side increments,
+    # so concurrent receipts, even two terminals creating the same item, cannot overwrite each other
+    changes = {}
+    for item_id, item in items.items():
+        item_id = (owners or {}).get(item_id, item_id)
+        changes[f"{INVENTORY_PATH}/{item_id}/itemName"] = item["itemName"]
+        for expiry_date, quantity in item["stock"].items():
+            changes[f"{INVENTORY_PATH}/{item_id}/stock/{expiry_date}"] = Increment(quantity)
+        changes[f"{INVENTORY_PATH}/{item_id}/totalQuantity"] = Increment(sum(item["stock"].values()))
+    return changes
+
+
+def _pruned(value):
+    # value as the database stores it: empty objects and None children are not kept
+    if not isinstance(value, dict):
+        return value
+    pruned = {key: _pruned(child) for key, child in value.items()}
+    return {key: child for key, child in pruned.items() if child is not None and child != {}} or None
@@ -1,56 +1,125 @@
-import requests
-import os
-from dotenv import load_dotenv
+from storage import get_storage
+from storage.base import new_key
 from models.order import Order
 from datetime import datetime
 from controllers.food_inventory_controller import FoodInventory
 
-load_dotenv()
-DB_URL = os.getenv("DB_URL") + "/orders.json"
+ORDERS_PATH = "orders"
 
 class OrderController:
     def __init__(self):
-        # Set database URL and initialize inventory controller
-        self.db_url = DB_URL
-        self.inventory = FoodInventory()
+        # Initialize storage; the inventory controller is only built when receiving orders
+        self.storage = get_storage()
+        self._inventory = None
+
+    @property
+    def inventory(self):
+        # Reading orders does not need the inventory cache, so it is not started for it
+        if self._inventory is None:
+            self._inventory = FoodInventory()
+        return self._inventory
 
     def place_order(self, order: Order):
-        # Save the order to Firebase
+        # Save the order to the database
         data = order.to_dict()
-        response = requests.post(self.db_url, json=data)
-        if response.status_code == 200:
+        try:
+            self.storage.push(ORDERS_PATH, data)
             print(f"Order placed successfully: {order.order_content}")
-        else:
-            print("Failed to place order.")
+        except Exception as e:
+            print(f"Failed to place order: {e}")
 
     def get_all_orders(self):
-        # Fetch all orders from Firebase
-        response = requests.get(self.db_url)
-        if response.status_code == 200 and response.json():
-            return response.json()
-        return {}
+        # Fetch all orders from the database
+        try:
+            return self.storage.get(ORDERS_PATH) or {}
+        except Exception as e:
+            print(f"Error fetching orders: {e}")
+            return {}
+
+    def get_pending_orders(self):
+        # Fetch only orders that are still waiting to be received
+        try:
+            return self.storage.query(ORDERS_PATH, "order_status", equal_to="Pending")
+        except Exception as e:
+            print(f"Error fetching pending orders: {e}")
+            return {}
+
+    def get_orders_between(self, start_date, end_date):
+        # Fetch orders placed from start_date through end_date (YYYY-MM-DD, both inclusive)
+        try:
+            # "\uf8ff" sorts after any time suffix, so the whole end day is included
+            return self.storage.query(
+                ORDERS_PATH, "order_date", start_at=start_date, end_at=end_date + "\uf8ff"
+            )
+        except Exception as e:
+            print(f"Error fetching orders: {e}")
+            return {}
+
+    def get_recent_orders(self, limit):
+        # Fetch the latest orders by date, newest first
+        try:
+            orders = self.storage.query(ORDERS_PATH, "order_date", limit_to_last=limit)
+            return dict(reversed(list(orders.items())))
+        except Exception as e:
+            print(f"Error fetching recent orders: {e}")
+            return {}
+
+    def count_orders(self):
+        # Count orders with a shallow read of their keys
+        try:
+            return len(self.storage.keys(ORDERS_PATH))
+        except Exception as e:
+            print(f"Error counting orders: {e}")
+            return 0
 
     def receive_order(self, order_id):
         # Mark an order as received and update inventory
-        order_url = f"{self.db_url[:-5]}/{order_id}.json"
-        response = requests.get(order_url)
-        
-        if response.status_code == 200 and response.json():
-            order_data = response.json()
-            order_content = order_data.get("order_content", {})
-
-            # Update inventory with received items and their respective expiry dates
-            for item_name, item_details in order_content.items():
-                quantity = item_details["quantity"]
+        return bool(self.receive_orders([order_id]))
+
+    def receive_orders(self, order_ids=None):
+        # Queue receiving several orders (every pending one when order_ids is None). Each order is
+        # marked received by an operation the database refuses once the order is no longer pending,
+        # and its stock is only added after that went through. Returns the ids queued.
+        if order_ids is None:
+            orders = self.get_pending_orders()
+        else:
+            # Read just the requested orders; queued receipts already show in them
+            orders = {}
+            for order_id in order_ids:
+                try:
+                    orders[order_id] = self.storage.get(f"{ORDERS_PATH}/{order_id}")
+                except Exception as e:
+                    print(f"Error fetching order {order_id}: {e}")
+
+        new_ids = {}
+        operations = []
+        for order_id, order_data in orders.items():
+            if (order_data or {}).get("order_status") != "Pending":
+                print(f"Order {order_id} is not pending, skipping.")
+                continue
+
+            # Combine lines for the same item and expiry date
+            received_stock = {}
+            for item_name, item_details in order_data.get("order_content", {}).items():
+                lots = received_stock.setdefault(item_name, {})
                 expiry_date = item_details["expiry_date"]
+                lots[expiry_date] = lots.get(expiry_date, 0) + item_details["quantity"]
 
-                self.inventory.createItem({
-                    "itemName": item_name,
-                    "stock": {expiry_date: quantity}
-                })
+            items, claims = self.inventory.receiptItems(received_stock, new_ids)
+            operations.append((
+                [(f"{ORDERS_PATH}/{order_id}", "receiveOrder", {"orderId": order_id, "receiptId": new_key()})],
+                ("receiveStock", {"items": items, "claims": claims})
+            ))
+        if not operations:
+            return []
 
-            # Mark order as received in the database
-            requests.patch(order_url, json={"order_status": "Received"})
-            print(f"Order {order_id} received and inventory updated.")
-        else:
-            print("Failed to fetch order data.")
+        try:
+            self.storage.enqueue_many(operations)
+        except Exception as e:
+            print(f"Error receiving orders: {e}")
+            return []
+
+        received = [steps[0][2]["orderId"] for steps, _ in operations]
+        for order_id in received:
+            print(f"Order {order_id} queued as received; its stock is added once the database accepts it.")
+        return received
@@ -0,0 +1,157 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+# Share of trigrams two words must have in common to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    # In-memory search over short texts such as names: a prefix trie for search-as-you-type,
+    # a trigram index for typos, and id prefixes. The trie and trigrams hold distinct words
+    # only, each word pointing at the documents that contain it, so the index grows with the
+    # vocabulary rather than with the number of documents. Documents are re-indexed one at a
+    # time as they change.
+
+    def __init__(self):
+        self.documents = {}
+        self.postings = {}
+        self.trie = {}
+        self.trigrams = {}
+        self.ids = []
+        self._lock = threading.Lock()
+
+    def sync(self, documents):
+        # Bring the index in line with {doc_id: texts}, touching only documents that changed
+        with self._lock:
+            for doc_id in [doc_id for doc_id in self.documents if doc_id not in documents]:
+                self._remove(doc_id)
+            for doc_id, texts in documents.items():
+                tokens = frozenset(token for text in texts for token in tokenize(text))
+                if self.documents.get(doc_id) != tokens:
+                    self._remove(doc_id)
+                    self._add(doc_id, tokens)
+
+    def update(self, doc_id, texts):
+        # Re-index one document; texts=None removes it
+        with self._lock:
+            self._remove(doc_id)
+            if texts is not None:
+                self._add(doc_id, frozenset(token for text in texts for token in tokenize(text)))
+
+    def search(self, query):
+        # Ids of documents matching every word of the query by prefix (of a word or of the id),
+        # or fuzzily when nothing matches. Returns None for an empty query, meaning "no filter".
+        # The returned set may be shared with the index and must not be modified.
+        words = tokenize(query)
+        if not words:
+            return None
+        with self._lock:
+            matches = None
+            for word in words:
+                found = self._prefix(word) or self._fuzzy(word)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return set()
+            return matches
+
+    def _add(self, doc_id, tokens):
+        self.documents[doc_id] = tokens
+        insort(self.ids, (self._id_key(doc_id), doc_id))
+        for token in tokens:
+            owners = self.postings.get(token)
+            if owners is None:
+                owners = self.postings[token] = set()
+                self._add_word(token)
+            owners.add(doc_id)
+
+    def _remove(self, doc_id):
+        tokens = self.documents.pop(doc_id, None)
+        if tokens is None:
+            return
+        position = bisect_left(self.ids, (self._id_key(doc_id), doc_id))
+        del self.ids[position]
+        for token in tokens:
+            owners = self.postings[token]
+            owners.discard(doc_id)
+            if not owners:
+                del self.postings[token]
+                self._remove_word(token)
+
+    def _add_word(self, token):
+        node = self.trie
+        for char in token:
+            node = node.setdefault(char, {})
+            node.setdefault("", set()).add(token)
+        for gram in trigrams(token):
+            self.trigrams.setdefault(gram, set()).add(token)
+
+    def _remove_word(self, token):
+        path = [self.trie]
+        for char in token:
+            path.append(path[-1][char])
+            path[-1][""].discard(token)
+        # Prune trie nodes no word goes through any more
+        for depth in range(len(token), 0, -1):
+            if path[depth][""]:
+                break
+            del path[depth - 1][token[depth - 1]]
+        for gram in trigrams(token):
+            self.trigrams[gram].discard(token)
+            if not self.trigrams[gram]:
+                del self.trigrams[gram]
+
+    def _prefix(self, word):
+        node = self.trie
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                break
+        tokens = node[""] if node is not None else ()
+
+        id_matches = self._id_matches(word)
+        if len(tokens) == 1 and not id_matches:
+            return self.postings[next(iter(tokens))]
+        matches = id_matches
+        for token in tokens:
+            matches |= self.postings[token]
+        return matches
+
+    def _id_matches(self, word):
+        # Documents whose id starts with word, e.g. an order id typed into the search box
+        position = bisect_left(self.ids, (word,))
+        matches = set()
+        while position < len(self.ids) and self.ids[position][0].startswith(word):
+            matches.add(self.ids[position][1])
+            position += 1
+        return matches
+
+    def _fuzzy(self, word):
+        # Words sharing enough trigrams with the query word, e.g. "tomatoe" -> "tomato"
+        if len(word) < 3:
+            return set()
+        grams = trigrams(word)
+        shared = {}
+        for gram in grams:
+            for token in self.trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        matches = set()
+        for token, count in shared.items():
+            # A padded word of n letters has at most n trigrams
+            if count / max(len(grams), len(token)) >= FUZZY_THRESHOLD:
+                matches |= self.postings[token]
+        return matches
+
+    def _id_key(self, doc_id):
+        return "".join(tokenize(doc_id))
@@ -1,19 +1,25 @@
-from firebase_admin import db
 import datetime
+import threading
+from storage import get_storage
+from controllers.inventory_cache import InventoryCache, INVENTORY_PATH
+
+RECIPES_PATH = "db/recipes"
+
+# Held while a recipe is planned against the cached lots, so two orders cannot plan on the same units
+_plan_lock = threading.Lock()
+
 
 class StaffController:
     def __init__(self):
-        # Initialize database references
-        self.ref = db.reference('db')
-        self.recipes_ref = self.ref.child('recipes')
-        self.inventory_ref = self.ref.child('inventory')
+        # Initialize storage
+        self.storage = get_storage()
         
     def addRecipe(self, recipe):
         # Add a new recipe to the database
         try:
-            new_ref = self.recipes_ref.push(recipe)
+            new_key = self.storage.push(RECIPES_PATH, recipe)
             print(f"Added new recipe: {recipe['recipeName']}")
-            return {new_ref.key: recipe}
+            return {new_key: recipe}
         except Exception as e:
             print(f"Error adding recipe: {e}")
             return None
@@ -21,7 +27,7 @@ class StaffController:
     def viewAllRecipes(self):
         # Retrieve all recipes from the database
         try:
-            recipes = self.recipes_ref.get()
+            recipes = self.storage.get(RECIPES_PATH)
             if not recipes:
                 print("No recipes found.")
                 return []
@@ -40,74 +46,62 @@ class StaffController:
             print(f"Error retrieving recipes: {e}")
             return []
 
-    def orderRecipe(self, recipeId):
-        # Process a recipe order by checking inventory and updating stock
+    def orderRecipe(self, recipeId, recipe=None):
+        # Process a recipe order by queueing its deductions as one operation; the database checks
+        # them against its own stock when they arrive and applies all of them or none. Callers
+        # that already loaded the recipe pass it in, which saves reading it again.
         try:
-            recipe = self.recipes_ref.child(recipeId).get()
+            if recipe is None:
+                recipe = self.storage.get(f"{RECIPES_PATH}/{recipeId}")
             if not recipe:
                 print(f"No recipe found with ID: {recipeId}")
                 return False
             
             ingredients = recipe.get("ingredients", {})
-            
-            for itemName, requiredQty in ingredients.items():
-                # Retrieve item stock from inventory
-                items = self.inventory_ref.order_by_child("itemName").equal_to(itemName).get()
-                if not items:
+
+            # Resolve every ingredient through the local name index instead of one query each
+            cache = InventoryCache.instance()
+            items_by_name = {}
+            for itemName in ingredients:
+                item_id = cache.find_id(itemName)
+                if item_id is None:
                     print(f"Insufficient stock for {itemName}")
                     return False
-                
-                for item_id, item_data in items.items():
-                    stock = item_data.get("stock", {})
-                    totalQuantity = item_data.get("totalQuantity", 0)
-                    
-                    if totalQuantity < requiredQty:
-                        print(f"Not enough {itemName} in stock.")
-                        return False
-                    
-                    # Deduct stock based on expiry date, ignoring expired items
-                    sorted_stock = sorted(stock.items(), key=lambda x: x[0])
-                    deducted = 0
-                    today = datetime.date.today().isoformat()
-                    
-                    for expiryDate, quantity in sorted_stock:
-                        if expiryDate < today:
-                            print(f"Skipping expired {itemName} (expiry: {expiryDate})")
-                            continue
-                        
-                        if deducted >= requiredQty:
-                            break
-                        toDeduct = min(requiredQty - deducted, quantity)
-                        stock[expiryDate] -= toDeduct
-                        deducted += toDeduct
-                        if stock[expiryDate] == 0:
-                            del stock[expiryDate]
-                    
-                    if deducted < requiredQty:
-                        print(f"Not enough non-expired {itemName} in stock.")
-                        return False
-                    
-                    # Update inventory in Firebase
-                    totalQuantity -= requiredQty
-                    self.inventory_ref.child(item_id).update({
-                        "stock": stock,
-                        "totalQuantity": totalQuantity
-                    })
-            
-            print(f"Successfully ordered recipe: {recipe['recipeName']}")
-            return True
+                items_by_name[itemName] = item_id
         except Exception as e:
             print(f"Error ordering recipe: {e}")
             return False
 
+        today = datetime.date.today().isoformat()
+
+        # Plan every ingredient against the cached lots first, so an order that cannot be made is
+        # turned down here instead of being refused by the database later
+        with _plan_lock:
+            planned = {}
+            for itemName, requiredQty in ingredients.items():
+                item_id = items_by_name[itemName]
+                picked = cache.lots.pick(item_id, requiredQty, today)
+                if picked is None:
+                    print(f"Not enough non-expired {itemName} in stock.")
+                    return False
+                planned[item_id] = {"itemName": itemName, "quantity": requiredQty, "lots": picked, "today": today}
+
+            # The deductions show up in the cache right away and reach the database in the background
+            self.storage.enqueue([
+                (f"{INVENTORY_PATH}/{item_id}", "deductLots", args) for item_id, args in planned.items()
+            ])
+        
+        print(f"Queued order for recipe: {recipe['recipeName']}")
+        return True
+
     def deleteRecipe(self, recipeId):
         # Delete a recipe from the database
         try:
-            recipe = self.recipes_ref.child(recipeId).get()
+            recipe = self.storage.get(f"{RECIPES_PATH}/{recipeId}")
             if not recipe:
                 print("No recipe found.")
                 return False
-            self.recipes_ref.child(recipeId).delete()
+            self.storage.delete(f"{RECIPES_PATH}/{recipeId}")
             return True
         except Exception as e:
             print(f"Error deleting recipe: {e}")
@@ -116,11 +110,11 @@ class StaffController:
     def updateRecipe(self, recipeId, recipeName, new_recipe):
         # Update an existing recipe in the database
         try:
-            recipe = self.recipes_ref.child(recipeId).get()
+            recipe = self.storage.get(f"{RECIPES_PATH}/{recipeId}")
             if not recipe:
                 print("No recipe found.")
                 return False
-            self.recipes_ref.child(recipeId).update({
+            self.storage.update(f"{RECIPES_PATH}/{recipeId}", {
                 "recipeName": recipeName, 
                 "ingredients": new_recipe
             })
@@ -1,8 +1,40 @@
+import argparse
+from storage import get_storage
 from ui.app import StockOverflowApp
+from controllers.inventory_cache import InventoryCache
+from controllers.food_inventory_controller import FoodInventory
 
 def main():
+    parser = argparse.ArgumentParser(description="Stock Overflow inventory manager")
+    parser.add_argument(
+        "--rebuild-name-index", action="store_true",
+        help="store the itemName -> item_id index in the database and exit"
+    )
+    parser.add_argument(
+        "--archive-orders", nargs="?", type=int, const=-1, metavar="DAYS",
+        help="archive received orders older than DAYS (default: ARCHIVE_AFTER_DAYS) and exit"
+    )
+    args = parser.parse_args()
+
+    if args.archive_orders is not None:
+        # Imported here so msgpack is not loaded on every start of the app
+        from controllers.archive_controller import ArchiveController
+        ArchiveController().archive_orders(args.archive_orders if args.archive_orders >= 0 else None)
+        get_storage().close()
+        return
+
+    if args.rebuild_name_index:
+        FoodInventory().rebuildNameIndex()
+        InventoryCache.shutdown()
+        get_storage().close()
+        return
+
     app = StockOverflowApp()
     app.mainloop()
 
+    # Close the inventory listener thread so the process can exit, and send any queued writes
+    InventoryCache.shutdown()
+    get_storage().close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
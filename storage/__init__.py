@@ -0,0 +1,49 @@
+import threading
+from config.app_config import AppConfig
+from storage.base import Storage
+from storage.coalescing import CoalescingStorage
+from storage.resilience import CircuitBreaker, ResilientStorage
+from storage.snapshot import SnapshotStorage
+from storage.write_behind import WriteBehindStorage
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    # Return the process-wide storage backend selected by AppConfig.STORAGE_BACKEND. Writes are
+    # queued locally and sent in the background, the main trees are read from a local snapshot
+    # kept in sync by fetching only changed records, identical concurrent reads are merged into
+    # one request, and outages are answered from the last data read.
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            # Register the queueable operations before the queue starts sending what it holds
+            import controllers.operations
+            breaker = CircuitBreaker(AppConfig.BREAKER_FAILURES, AppConfig.BREAKER_RESET_SECONDS)
+            _storage = WriteBehindStorage(
+                SnapshotStorage(
+                    CoalescingStorage(
+                        ResilientStorage(_create_storage(AppConfig.STORAGE_BACKEND), breaker, AppConfig.READ_ATTEMPTS),
+                        AppConfig.READ_CACHE_SECONDS
+                    ),
+                    AppConfig.SNAPSHOT_PATH, AppConfig.SNAPSHOT_TREES, AppConfig.READ_CACHE_SECONDS,
+                    AppConfig.SNAPSHOT_SAVE_SECONDS
+                ),
+                AppConfig.WRITE_QUEUE_PATH, AppConfig.BREAKER_RESET_SECONDS
+            )
+        return _storage
+
+
+def _create_storage(backend):
+    # Backends are imported lazily so the SQLite engine runs without Firebase credentials
+    if backend == "firebase":
+        from storage.firebase_storage import FirebaseStorage
+        return FirebaseStorage(
+            AppConfig.DB_URL, AppConfig.FIREBASE_KEY_PATH, AppConfig.TRANSACTION_MAX_RETRIES,
+            AppConfig.HTTP_TIMEOUT_SECONDS, AppConfig.HTTP_POOL_SIZE
+        )
+    if backend == "sqlite":
+        from storage.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(AppConfig.SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,248 @@
+import heapq
+import random
+import time
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+# Named read-modify-write functions that can be queued with Storage.enqueue, see operation()
+OPERATIONS = {}
+
+# Named functions giving the write that follows a queued operation, see follow_up()
+FOLLOW_UPS = {}
+
+
+class Storage:
+    # Interface shared by all storage backends. Paths use Firebase notation ("db/inventory/<id>"),
+    # and listener callbacks receive (event_type, path, data) with Firebase put/patch semantics.
+
+    # Errors that mean the database could not be reached, as opposed to a refused request
+    transient_errors = ()
+
+    def get(self, path):
+        raise NotImplementedError
+
+    def set(self, path, value):
+        raise NotImplementedError
+
+    def update(self, path, values):
+        # Apply several child writes at once; keys of values are paths relative to path
+        raise NotImplementedError
+
+    def push(self, path, value):
+        # Store value under a new chronological key and return that key
+        raise NotImplementedError
+
+    def delete(self, path):
+        raise NotImplementedError
+
+    def keys(self, path):
+        # Return only the child keys of path, without downloading their values
+        raise NotImplementedError
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        # Return the children of path ordered by the given child key
+        raise NotImplementedError
+
+    def transaction(self, path, update_fn):
+        # Atomically replace the value at path with update_fn(current value) and return it.
+        # update_fn may be called more than once and can raise TransactionAbortedError to give up.
+        raise NotImplementedError
+
+    def transaction_many(self, paths, update_fn):
+        # Like transaction() over several paths that do not contain one another: update_fn gets
+        # their current values as a list and returns the new ones, written together or not at
+        # all. Each new value must depend only on the value at its own path, since a backend may
+        # write the paths one at a time and call update_fn again when one of them changed
+        # meanwhile. This default runs one transaction on the deepest node above all of them.
+        parts = [split_path(path) for path in paths]
+        common = parts[0]
+        for path_parts in parts[1:]:
+            depth = 0
+            while depth < min(len(common), len(path_parts)) and common[depth] == path_parts[depth]:
+                depth += 1
+            common = common[:depth]
+        new_values = []
+
+        def apply(value):
+            new_values[:] = update_fn([value_at(value, path_parts[len(common):]) for path_parts in parts])
+            for path_parts, new_value in zip(parts, new_values):
+                value = with_value(value, path_parts[len(common):], new_value)
+            return value
+        self.transaction("/".join(common), apply)
+        return new_values
+
+    def enqueue(self, steps, then=None):
+        # Apply registered operations as one write: steps is a list of (path, name, args), each
+        # replacing the value at path with OPERATIONS[name](value, args). They run in a single
+        # transaction_many, so if one raises TransactionAbortedError none of them is applied.
+        # then is an optional (name, args) follow-up, see follow_up(), written only once the steps
+        # applied. Queueing backends return before any of it runs.
+        while True:
+            new_values = self.transaction_many(
+                [path for path, _, _ in steps],
+                lambda values: [OPERATIONS[name](value, args) for (_, name, args), value in zip(steps, values)]
+            )
+            if then is None:
+                return
+            write = FOLLOW_UPS[then[0]](new_values, then[1])
+            if isinstance(write, dict):
+                self.update("/", write)
+                return
+            steps, then = write
+
+    def enqueue_many(self, operations):
+        # enqueue() for a list of (steps, then), recorded together
+        for steps, then in operations:
+            self.enqueue(steps, then)
+
+    def listen(self, path, callback):
+        # Register callback for changes under path and return an object with close()
+        raise NotImplementedError
+
+    def has_local_copy(self, path):
+        # Whether reads of path can be answered without downloading it, e.g. from a saved snapshot
+        return False
+
+    def queue_status(self):
+        # (writes waiting to be sent, writes refused) for queueing backends
+        return 0, 0
+
+    def offline_since(self):
+        # When the database was last reachable, if the data served now may be out of date
+        return None
+
+    def close(self):
+        pass
+
+
+class TransactionAbortedError(Exception):
+    # Raised by a transaction function to give up
+    pass
+
+
+class TransactionContentionError(Exception):
+    # Raised by a backend when a transaction kept losing to concurrent writes until its retries
+    # ran out. Nothing was refused, so the write can be tried again later.
+    pass
+
+
+class Increment:
+    # Numeric increment applied by the backend itself, usable as a value in set() and update()
+
+    def __init__(self, amount):
+        self.amount = amount
+
+    def apply(self, current):
+        return (current if isinstance(current, (int, float)) else 0) + self.amount
+
+
+def operation(name):
+    # Register fn(value, args) -> new value as a queueable operation. It must not modify value
+    # and raises TransactionAbortedError when the write no longer makes sense against value.
+    def register(fn):
+        OPERATIONS[name] = fn
+        return fn
+    return register
+
+
+def follow_up(name):
+    # Register fn(results, args) as a follow-up that can be queued after an operation's steps.
+    # Once they applied it is called with their new values and returns the next write:
+    # {absolute path: value} changes, or (steps, then) to enqueue. Queueing backends also call it
+    # with results None to show the write ahead of time, assuming the steps go as planned.
+    def register(fn):
+        FOLLOW_UPS[name] = fn
+        return fn
+    return register
+
+
+def new_key():
+    # Generate a 20-character key that sorts chronologically, like a Firebase push ID
+    now = int(time.time() * 1000)
+    timestamp_chars = []
+    for _ in range(8):
+        timestamp_chars.append(PUSH_CHARS[now % 64])
+        now //= 64
+    random_chars = [random.choice(PUSH_CHARS) for _ in range(12)]
+    return "".join(reversed(timestamp_chars)) + "".join(random_chars)
+
+
+def encode_key(key):
+    # Escape characters Firebase does not allow in keys so any name can be used as one
+    for char in "%.$#[]/":
+        key = key.replace(char, f"%{ord(char):02X}")
+    return key
+
+
+def split_path(path):
+    return [part for part in path.split("/") if part]
+
+
+def join_path(*paths):
+    parts = []
+    for path in paths:
+        parts.extend(split_path(path))
+    return "/".join(parts)
+
+
+def value_at(node, parts):
+    for part in parts:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+
+def with_value(node, parts, value):
+    # Return a copy of node with value placed at parts; empty children are pruned like in Firebase
+    if not parts:
+        return value.apply(node) if isinstance(value, Increment) else value
+    node = dict(node) if isinstance(node, dict) else {}
+    child = with_value(node.get(parts[0]), parts[1:], value)
+    if child is None or child == {}:
+        node.pop(parts[0], None)
+    else:
+        node[parts[0]] = child
+    return node
+
+
+def query_children(children, order_by, equal_to=None, start_at=None, end_at=None,
+                   limit_to_first=None, limit_to_last=None):
+    # Run Storage.query over {key: child} held in memory: children whose order_by value is set
+    # and in range, ordered by that value and then by key
+    order_parts = split_path(order_by)
+    rows = []
+    for key, child in children.items():
+        order_value = value_at(child, order_parts)
+        if order_value is None:
+            continue
+        if equal_to is not None and order_value != equal_to:
+            continue
+        if start_at is not None and _order_key(order_value) < _order_key(start_at):
+            continue
+        if end_at is not None and _order_key(order_value) > _order_key(end_at):
+            continue
+        rows.append((_order_key(order_value), key, child))
+
+    def sort_key(row):
+        return row[:2]
+    # A limited query only sorts the rows it keeps
+    if limit_to_first is not None:
+        rows = heapq.nsmallest(limit_to_first, rows, key=sort_key)
+    elif limit_to_last is not None:
+        rows = heapq.nlargest(limit_to_last, rows, key=sort_key)[::-1]
+    else:
+        rows.sort(key=sort_key)
+    return {key: child for _, key, child in rows}
+
+
+def _order_key(value):
+    # Firebase orders booleans before numbers before strings before objects
+    if isinstance(value, bool):
+        return (0, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
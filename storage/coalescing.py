@@ -0,0 +1,137 @@
+import threading
+import time
+from storage.base import Storage, split_path
+
+
+class _Flight:
+    # One read in progress; callers asking for the same read meanwhile wait for its result
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CoalescingStorage(Storage):
+    # Wraps a backend so identical concurrent reads share one request (single-flight) and a
+    # result is reused for ttl seconds. Writes through this wrapper drop cached reads of any
+    # overlapping path, so a terminal always sees its own writes. Results are shared between
+    # callers and must be treated as read-only.
+
+    def __init__(self, backend, ttl=2.0):
+        self.backend = backend
+        self.transient_errors = backend.transient_errors
+        self.ttl = ttl
+        self._results = {}
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    # Reads
+
+    def get(self, path):
+        return self._read(("get", path), path, lambda: self.backend.get(path))
+
+    def keys(self, path):
+        return self._read(("keys", path), path, lambda: self.backend.keys(path))
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        key = ("query", path, order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last)
+        return self._read(key, path, lambda: self.backend.query(
+            path, order_by, equal_to=equal_to, start_at=start_at, end_at=end_at,
+            limit_to_first=limit_to_first, limit_to_last=limit_to_last
+        ))
+
+    def _read(self, key, path, fetch):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            del self._flights[key]
+            # A write that landed while the read was in flight may not be in its result
+            if flight.error is None and self.ttl > 0 and generation == self._generation:
+                now = time.monotonic()
+                # Expired results are never read again, drop them so one-off reads do not pile up
+                for expired in [cached_key for cached_key, cached in self._results.items() if now - cached[0] >= self.ttl]:
+                    del self._results[expired]
+                self._results[key] = (now, flight.value, split_path(path))
+        flight.done.set()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _invalidate(self, path):
+        # Drop cached reads at, above or below path
+        parts = split_path(path)
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (_, _, read_parts) in self._results.items()
+                        if read_parts[:len(parts)] == parts or parts[:len(read_parts)] == read_parts]:
+                del self._results[key]
+
+    # Writes
+
+    def set(self, path, value):
+        try:
+            self.backend.set(path, value)
+        finally:
+            self._invalidate(path)
+
+    def update(self, path, values):
+        try:
+            self.backend.update(path, values)
+        finally:
+            self._invalidate(path)
+
+    def push(self, path, value):
+        try:
+            return self.backend.push(path, value)
+        finally:
+            self._invalidate(path)
+
+    def delete(self, path):
+        try:
+            self.backend.delete(path)
+        finally:
+            self._invalidate(path)
+
+    def transaction(self, path, update_fn):
+        try:
+            return self.backend.transaction(path, update_fn)
+        finally:
+            self._invalidate(path)
+
+    def transaction_many(self, paths, update_fn):
+        try:
+            return self.backend.transaction_many(paths, update_fn)
+        finally:
+            for path in paths:
+                self._invalidate(path)
+
+    def listen(self, path, callback):
+        return self.backend.listen(path, callback)
+
+    def offline_since(self):
+        return self.backend.offline_since()
+
+    def close(self):
+        self.backend.close()
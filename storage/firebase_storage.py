@@ -0,0 +1,164 @@
+import random
+import time
+import firebase_admin
+from firebase_admin import credentials, db, exceptions
+from requests.adapters import HTTPAdapter
+from storage.base import Storage, Increment, TransactionContentionError, join_path
+
+# Upper bound of the random pause before retrying a conflicting transaction, grows per attempt
+RETRY_BACKOFF_SECONDS = 0.05
+
+
+class FirebaseStorage(Storage):
+    # Storage backed by the Firebase Realtime Database through the Admin SDK
+
+    transient_errors = (
+        exceptions.UnavailableError, exceptions.DeadlineExceededError, exceptions.InternalError, OSError
+    )
+
+    def __init__(self, db_url, key_path, max_retries=10, timeout=None, pool_size=10):
+        self.max_retries = max_retries
+
+        # Initialize the Firebase Admin SDK once per process
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            cred = credentials.Certificate(key_path)
+            firebase_admin.initialize_app(cred, {"databaseURL": db_url, "httpTimeout": timeout})
+        self._size_pool(pool_size)
+
+    def _size_pool(self, pool_size):
+        # Every reference shares the SDK's keep-alive session, but its default pool keeps only
+        # 10 connections and drops the rest after use, so bursts from the page loaders and
+        # dashboard pay a fresh TCP+TLS handshake. Give it room for all of them. The session is
+        # not public SDK API (checked against firebase-admin 6.7.0, pinned in requirements.txt),
+        # so if it moves the SDK's own pool is kept.
+        try:
+            from firebase_admin import _http_client
+            session = db.reference("/")._client.session
+            retries = getattr(_http_client, "DEFAULT_RETRY_CONFIG", 0)
+        except (ImportError, AttributeError) as e:
+            print(f"Error resizing the Firebase connection pool, keeping the default: {e}")
+            return
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries))
+
+    def get(self, path):
+        return db.reference(path).get()
+
+    def set(self, path, value):
+        if value is None:
+            db.reference(path).delete()
+        else:
+            db.reference(path).set(_encode(value))
+
+    def update(self, path, values):
+        db.reference(path).update(_encode(values))
+
+    def push(self, path, value):
+        return db.reference(path).push(value).key
+
+    def delete(self, path):
+        db.reference(path).delete()
+
+    def keys(self, path):
+        return list(db.reference(path).get(shallow=True) or {})
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        query = db.reference(path).order_by_child(order_by)
+        if equal_to is not None:
+            query = query.equal_to(equal_to)
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        if limit_to_first is not None:
+            query = query.limit_to_first(limit_to_first)
+        if limit_to_last is not None:
+            query = query.limit_to_last(limit_to_last)
+        return query.get() or {}
+
+    def transaction(self, path, update_fn):
+        # Optimistic read-modify-write with ETag-conditional puts and a bounded number of retries
+        ref = db.reference(path)
+        value, etag = ref.get(etag=True)
+        for attempt in range(self.max_retries):
+            new_value = update_fn(value)
+            success, value, etag = ref.set_if_unchanged(etag, _encode(new_value))
+            if success:
+                return new_value
+            time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * (attempt + 1)))
+        raise TransactionContentionError(f"Too many conflicting writes on {path}, giving up.")
+
+    def transaction_many(self, paths, update_fn):
+        # The Realtime Database has no transactions across nodes, so each path gets its own
+        # ETag-conditional write, in order. A path that changed since it was read is read again
+        # and its new value computed anew. If that raises, or its retries run out, the paths
+        # already written are put back: numbers by increments, so writes made meanwhile by
+        # others are kept, anything else only where it still holds what was written here.
+        refs = [db.reference(path) for path in paths]
+        read = [ref.get(etag=True) for ref in refs]
+        values = [value for value, _ in read]
+        new_values = update_fn(values)
+        written = []
+        try:
+            for index, (ref, path) in enumerate(zip(refs, paths)):
+                etag = read[index][1]
+                for attempt in range(self.max_retries):
+                    success, current, etag = ref.set_if_unchanged(etag, _encode(new_values[index]))
+                    if success:
+                        break
+                    time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * (attempt + 1)))
+                    values[index] = current
+                    new_values[index] = update_fn(values)[index]
+                else:
+                    raise TransactionContentionError(f"Too many conflicting writes on {path}, giving up.")
+                written.append((path, values[index], new_values[index]))
+        except Exception:
+            self._undo(written)
+            raise
+        return new_values
+
+    def _undo(self, written):
+        # Put back (path, old value, written value) for the paths an unfinished transaction_many wrote
+        increments, restores = {}, {}
+        for path, old, new in written:
+            _compensate(path, old, new, increments, restores)
+        try:
+            if increments:
+                self.update("/", increments)
+            for path, (old, new) in restores.items():
+                if old is not None:
+                    self.transaction(path, lambda current, old=old, new=new: old if current == new else current)
+                elif db.reference(path).get() == new:
+                    # The SDK has no conditional delete
+                    db.reference(path).delete()
+        except Exception as e:
+            print(f"Error undoing a partly written transaction: {e}")
+
+
+def _compensate(path, old, new, increments, restores):
+    # Collect the writes that turn new at path back into old: an increment for every number,
+    # a conditional restore for every other changed value
+    if _is_number(old) and (new is None or _is_number(new)):
+        if old != new:
+            increments[path] = Increment(old - (new or 0))
+    elif isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() | new.keys():
+            _compensate(join_path(path, key), old.get(key), new.get(key), increments, restores)
+    elif old != new:
+        restores[path] = (old, new)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _encode(value):
+    # Convert Increment markers into Firebase server values
+    if isinstance(value, Increment):
+        return {".sv": {"increment": value.amount}}
+    if isinstance(value, dict):
+        return {key: _encode(child) for key, child in value.items()}
+    return value
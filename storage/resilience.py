@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from storage.base import Storage, split_path, value_at
+
+
+class CircuitOpenError(Exception):
+    # Raised instead of calling the backend while it is considered down
+    pass
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures; once open, a single trial call is let
+    # through every reset_seconds and the first one that succeeds closes it again
+
+    def __init__(self, failure_threshold=3, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        # Whether a call may go to the backend now
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class ResilientStorage(Storage):
+    # Wraps a backend so a slow or unreachable database cannot stall the app. Reads retry with
+    # exponential backoff and jitter, and when they still fail (or the circuit is open) the last
+    # good result of the same read is returned instead; only the max_snapshots most recently used
+    # results are kept for that. Writes fail fast with CircuitOpenError while the circuit is open.
+    # Only the backend's transient_errors count as outages.
+
+    def __init__(self, backend, breaker=None, read_attempts=2, backoff_seconds=0.2, max_snapshots=64):
+        self.backend = backend
+        # Callers above treat an open circuit like any other outage
+        self.transient_errors = backend.transient_errors + (CircuitOpenError,)
+        self.breaker = breaker or CircuitBreaker()
+        self.read_attempts = read_attempts
+        self.backoff_seconds = backoff_seconds
+        self.last_success = None
+        self.serving_stale = False
+        self.max_snapshots = max_snapshots
+        # Last good result per read, least recently used first; queries whose bounds move with
+        # every sync would otherwise pile up here
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def offline_since(self):
+        # None while the database answers, otherwise when it last did (or now, if it never has)
+        if not (self.serving_stale or self.breaker.is_open):
+            return None
+        return self.last_success or datetime.now()
+
+    # Reads
+
+    def get(self, path):
+        return self._read(("get", path), path, lambda: self.backend.get(path))
+
+    def keys(self, path):
+        return self._read(("keys", path), path, lambda: self.backend.keys(path))
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        key = ("query", path, order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last)
+        return self._read(key, path, lambda: self.backend.query(
+            path, order_by, equal_to=equal_to, start_at=start_at, end_at=end_at,
+            limit_to_first=limit_to_first, limit_to_last=limit_to_last
+        ))
+
+    def _read(self, key, path, fetch):
+        if not self.breaker.allow():
+            return self._stale(key, path, CircuitOpenError(f"Database unavailable, cannot read {path}"))
+
+        error = None
+        for attempt in range(self.read_attempts):
+            if attempt:
+                # Full jitter keeps terminals that failed together from retrying together
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+            try:
+                value = fetch()
+            except self.backend.transient_errors as e:
+                error = e
+                continue
+            except Exception:
+                self._succeeded()
+                raise
+            self._succeeded()
+            with self._lock:
+                self._snapshots[key] = value
+                self._snapshots.move_to_end(key)
+                while len(self._snapshots) > self.max_snapshots:
+                    self._snapshots.popitem(last=False)
+            return value
+
+        self.breaker.record_failure()
+        print(f"Error reading {path}, using last known data: {error}")
+        return self._stale(key, path, error)
+
+    def _stale(self, key, path, error):
+        # The last good result of this read, or of a "get" of an enclosing path
+        with self._lock:
+            if key in self._snapshots:
+                self.serving_stale = True
+                self._snapshots.move_to_end(key)
+                return self._snapshots[key]
+            if key[0] == "get":
+                parts = split_path(path)
+                for depth in range(len(parts) - 1, -1, -1):
+                    ancestor = ("get", "/".join(parts[:depth]))
+                    if ancestor in self._snapshots:
+                        self.serving_stale = True
+                        self._snapshots.move_to_end(ancestor)
+                        return value_at(self._snapshots[ancestor], parts[depth:])
+        raise error
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        self.last_success = datetime.now()
+        self.serving_stale = False
+
+    # Writes
+
+    def _write(self, path, call):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Database unavailable, cannot write {path}")
+        try:
+            result = call()
+        except self.backend.transient_errors:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self._succeeded()
+            raise
+        self._succeeded()
+        return result
+
+    def set(self, path, value):
+        self._write(path, lambda: self.backend.set(path, value))
+
+    def update(self, path, values):
+        self._write(path, lambda: self.backend.update(path, values))
+
+    def push(self, path, value):
+        return self._write(path, lambda: self.backend.push(path, value))
+
+    def delete(self, path):
+        self._write(path, lambda: self.backend.delete(path))
+
+    def transaction(self, path, update_fn):
+        return self._write(path, lambda: self.backend.transaction(path, update_fn))
+
+    def transaction_many(self, paths, update_fn):
+        return self._write(paths[0], lambda: self.backend.transaction_many(paths, update_fn))
+
+    def listen(self, path, callback):
+        return self.backend.listen(path, callback)
+
+    def close(self):
+        self.backend.close()
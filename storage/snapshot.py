@@ -0,0 +1,430 @@
+import os
+import threading
+import time
+from datetime import datetime
+from storage.base import Storage, new_key, query_children, split_path, join_path, value_at, with_value
+
+# Child every record of a snapshot tree carries: when it was last written, in ms since the epoch
+STAMP_FIELD = "updatedAt"
+
+# Records stamped up to this long before a sync are fetched again by the next one, so terminals
+# whose clocks run slightly behind cannot slip a change past it
+CLOCK_SKEW_MS = 60 * 1000
+
+
+class SnapshotStorage(Storage):
+    # Wraps a backend so whole trees of keyed records (inventory, recipes, orders) are read from
+    # a local copy that is saved to a msgpack file every save_seconds and on close. A cold start
+    # reads the file instead of downloading the trees, then fetches only the records changed
+    # since the copy was last synced: every write through this wrapper stamps the records it
+    # touches with updatedAt, so the changes are one query ordered by that child, and a shallow
+    # read of the keys catches deletions. Reads sync a tree again once its copy is older than
+    # max_age seconds or something was written to it, and fall back to the copy while the
+    # database cannot be reached. A listener on a whole tree keeps its copy current as well, so
+    # the file has the tree even if nothing read it. The stamps stay in the database; reads of
+    # the trees, transactions and listener events above this wrapper never see them.
+
+    def __init__(self, backend, path, trees, max_age=2.0, save_seconds=300.0):
+        self.backend = backend
+        self.transient_errors = backend.transient_errors
+        self.path = path
+        self.trees = [split_path(tree) for tree in trees]
+        self.max_age = max_age
+        self.save_seconds = save_seconds
+        # tree -> {key: record} and tree -> ms stamp a sync fetches changes from
+        self.records = {}
+        self.since = {}
+        self._synced_at = {}
+        # Bumped by every write to a tree, so a sync running meanwhile does not count as fresh
+        self._generations = {"/".join(tree): 0 for tree in self.trees}
+        self._sync_locks = {"/".join(tree): threading.Lock() for tree in self.trees}
+        self._lock = threading.Lock()
+        # Listeners per tree whose copy they keep current, counted once their full first event came
+        self._live = {}
+        self._loaded = False
+        self._dirty = False
+        self._closed = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    # Reads
+
+    def get(self, path):
+        located = self._locate(split_path(path))
+        if located is None:
+            return self.backend.get(path)
+        tree, rest = located
+        records = self._records(tree)
+        if not rest:
+            # A listener may change the copy in place, so callers get their own
+            return dict(records) or None
+        return value_at(records, rest)
+
+    def keys(self, path):
+        located = self._locate(split_path(path))
+        if located is None:
+            return self.backend.keys(path)
+        tree, rest = located
+        value = value_at(self._records(tree), rest)
+        return list(value) if isinstance(value, dict) else []
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        located = self._locate(split_path(path))
+        if located is None or located[1]:
+            return self.backend.query(
+                path, order_by, equal_to=equal_to, start_at=start_at, end_at=end_at,
+                limit_to_first=limit_to_first, limit_to_last=limit_to_last
+            )
+        return query_children(
+            dict(self._records(located[0])), order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last
+        )
+
+    def _records(self, tree):
+        # The local copy of tree, synced first when it is out of date
+        self._load()
+        with self._sync_locks[tree]:
+            if not self._is_fresh(tree):
+                try:
+                    self._sync(tree)
+                except self.transient_errors as e:
+                    if tree not in self.records:
+                        raise
+                    print(f"Error syncing {tree}, using saved data: {e}")
+        return self.records[tree]
+
+    def _is_fresh(self, tree):
+        synced_at = self._synced_at.get(tree)
+        return synced_at is not None and time.monotonic() - synced_at < self.max_age
+
+    def _sync(self, tree):
+        started = time.time()
+        generation = self._generations[tree]
+        records = self.records.get(tree)
+        if records is not None:
+            try:
+                records = self._changes(tree, records)
+            except self.transient_errors:
+                raise
+            except Exception as e:
+                # e.g. Firebase refuses queries on updatedAt until the rules index it
+                print(f"Error fetching changes to {tree}, loading all of it: {e}")
+                records = None
+        if records is None:
+            records = {key: _unstamped(record) for key, record in (self.backend.get(tree) or {}).items()}
+
+        with self._lock:
+            self.records[tree] = records
+            self.since[tree] = int(started * 1000) - CLOCK_SKEW_MS
+            self._dirty = True
+            if generation == self._generations[tree]:
+                self._synced_at[tree] = time.monotonic()
+
+    def _changes(self, tree, records):
+        # records brought up to date with the records stamped since the last sync
+        changed = self.backend.query(tree, STAMP_FIELD, start_at=self.since[tree])
+        keys = self.backend.keys(tree)
+        updated = {key: records[key] for key in keys if key in records}
+        for key, record in changed.items():
+            updated[key] = _unstamped(record)
+        for key in keys:
+            if key not in updated:
+                # Written without a stamp, e.g. by an older version of the app
+                record = self.backend.get(join_path(tree, key))
+                if record is not None:
+                    updated[key] = _unstamped(record)
+        return updated
+
+    # Writes
+
+    def set(self, path, value):
+        changes = self._stamp({join_path(path): value})
+        try:
+            if len(changes) == 1:
+                self.backend.set(path, changes[join_path(path)])
+            else:
+                self.backend.update("/", changes)
+        finally:
+            self._touched(changes)
+
+    def update(self, path, values):
+        changes = self._stamp({join_path(path, child_path): value for child_path, value in values.items()})
+        try:
+            self.backend.update("/", changes)
+        finally:
+            self._touched(changes)
+
+    def push(self, path, value):
+        key = new_key()
+        self.set(join_path(path, key), value)
+        return key
+
+    def delete(self, path):
+        self.set(path, None)
+
+    def transaction(self, path, update_fn):
+        return self.transaction_many([path], lambda values: [update_fn(values[0])])[0]
+
+    def transaction_many(self, paths, update_fn):
+        parts = [split_path(path) for path in paths]
+        located = [self._locate(path_parts) for path_parts in parts]
+
+        # Whole records are stamped in the same write, anything inside one right after it
+        computed = []
+
+        def stamped(values):
+            new_values = update_fn([
+                self._unstamped_at(path_parts, value) for path_parts, value in zip(parts, values)
+            ])
+            now = _now_ms()
+            computed.append(True)
+            return [_stamped_at(place, new_value, now) for place, new_value in zip(located, new_values)]
+        try:
+            try:
+                new_values = self.backend.transaction_many(paths, stamped)
+            except Exception:
+                if computed and len(paths) > 1:
+                    self._restamp(located)
+                raise
+            inner_stamps = {
+                join_path(tree, rest[0], STAMP_FIELD): _now_ms()
+                for tree, rest in filter(None, located) if len(rest) > 1
+            }
+            if inner_stamps:
+                self.backend.update("/", inner_stamps)
+            return [self._unstamped_at(path_parts, value) for path_parts, value in zip(parts, new_values)]
+        finally:
+            self._touched({path: None for path in paths})
+
+    def _restamp(self, located):
+        # A backend that writes the paths of a transaction_many one at a time puts back those it
+        # wrote when a later one fails, stamps included, so other terminals' next sync would miss
+        # the change back. Stamp the records again, those that still exist.
+        now = _now_ms()
+        for tree, rest in filter(None, located):
+            if not rest:
+                continue
+            try:
+                self.backend.transaction(
+                    join_path(tree, rest[0]),
+                    lambda record: _with_stamp(record, now) if isinstance(record, dict) else record
+                )
+            except Exception as e:
+                print(f"Error stamping {join_path(tree, rest[0])} again: {e}")
+
+    def _stamp(self, changes):
+        # changes ({absolute path: value}) plus updatedAt for every record they write to
+        now = _now_ms()
+        stamped = dict(changes)
+        for path, value in changes.items():
+            located = self._locate(split_path(path))
+            if located is None:
+                continue
+            tree, rest = located
+            if not rest:
+                if isinstance(value, dict):
+                    stamped[path] = {key: _with_stamp(record, now) for key, record in value.items()}
+            elif len(rest) == 1:
+                stamped[path] = _with_stamp(value, now)
+            elif rest[1] != STAMP_FIELD and join_path(tree, rest[0]) not in changes:
+                stamped[join_path(tree, rest[0], STAMP_FIELD)] = now
+        return stamped
+
+    def _touched(self, changes):
+        # Make the next read of every tree written to sync it again
+        with self._lock:
+            for path in changes:
+                parts = split_path(path)
+                for tree in self.trees:
+                    if parts[:len(tree)] == tree or tree[:len(parts)] == parts:
+                        self._generations["/".join(tree)] += 1
+                        self._synced_at.pop("/".join(tree), None)
+
+    # Everything else
+
+    def listen(self, path, callback):
+        parts = split_path(path)
+        located = self._locate(parts)
+        listener = _TreeListener(self, located[0] if located is not None and not located[1] else None)
+        if listener.tree is not None:
+            # Events go on top of the saved copy, so it has to be read first
+            self._load()
+
+        def on_event(event_type, event_path, data):
+            event_parts = parts + split_path(event_path)
+            if event_type == "put":
+                if not self._is_stamp(event_parts):
+                    data = self._unstamped_at(event_parts, data)
+                    listener.follow([(split_path(event_path), data)])
+                    callback(event_type, event_path, data)
+                return
+            data = {
+                child_path: self._unstamped_at(event_parts + split_path(child_path), value)
+                for child_path, value in data.items()
+                if not self._is_stamp(event_parts + split_path(child_path))
+            }
+            if data:
+                listener.follow([
+                    (split_path(event_path) + split_path(child_path), value) for child_path, value in data.items()
+                ])
+                callback(event_type, event_path, data)
+        listener.registration = self.backend.listen(path, on_event)
+        return listener
+
+    def _is_stamp(self, parts):
+        located = self._locate(parts)
+        return located is not None and len(located[1]) == 2 and located[1][1] == STAMP_FIELD
+
+    def _unstamped_at(self, parts, value):
+        # value read at parts, without the stamps of the records in it
+        located = self._locate(parts)
+        if located is None:
+            return value
+        rest = located[1]
+        if not rest and isinstance(value, dict):
+            return {key: _unstamped(record) for key, record in value.items()}
+        if len(rest) == 1:
+            return _unstamped(value)
+        return value
+
+    def _locate(self, parts):
+        # (tree, path inside it) for parts at or below a snapshot tree, otherwise None
+        for tree in self.trees:
+            if parts[:len(tree)] == tree:
+                return "/".join(tree), parts[len(tree):]
+        return None
+
+    def has_local_copy(self, path):
+        located = self._locate(split_path(path))
+        if located is None:
+            return self.backend.has_local_copy(path)
+        self._load()
+        return located[0] in self.records
+
+    def offline_since(self):
+        return self.backend.offline_since()
+
+    def close(self):
+        self._closed.set()
+        self.save()
+        self.backend.close()
+
+    # Snapshot file
+
+    def _load(self):
+        # Read the snapshot file once, on first use. msgpack is imported here rather than at the
+        # top so starting the app does not wait for it.
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.path):
+                return
+            import msgpack
+            try:
+                with open(self.path, "rb") as f:
+                    saved = msgpack.unpackb(f.read())
+            except Exception as e:
+                print(f"Error reading snapshot {self.path}, loading from the database instead: {e}")
+                return
+            for tree, saved_tree in saved.get("trees", {}).items():
+                if tree in self._sync_locks:
+                    self.records[tree] = saved_tree["records"]
+                    self.since[tree] = saved_tree["since"]
+
+    def save(self):
+        # Write the local copies to the snapshot file if they changed since the last save
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # A tree a listener keeps current holds every change made up to now
+            for tree in self._live:
+                self.since[tree] = _now_ms() - CLOCK_SKEW_MS
+            saved = {
+                "savedAt": datetime.now().isoformat(timespec="seconds"),
+                "trees": {
+                    tree: {"since": self.since[tree], "records": dict(records)}
+                    for tree, records in self.records.items()
+                }
+            }
+        import msgpack
+        try:
+            # Written next to the old file and swapped in, so a crash mid-write keeps the old one
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(msgpack.packb(saved))
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving snapshot {self.path}: {e}")
+
+    def _run(self):
+        while not self._closed.wait(self.save_seconds):
+            self.save()
+
+
+class _TreeListener:
+    # Registration returned by SnapshotStorage.listen; for a listener on a whole tree, it also
+    # applies the events to the tree's local copy
+
+    def __init__(self, storage, tree):
+        self.storage = storage
+        self.tree = tree
+        self.live = False
+        self.registration = None
+
+    def follow(self, writes):
+        # writes are (path inside the tree, value) pairs of one event, without stamps
+        if self.tree is None:
+            return
+        storage = self.storage
+        with storage._lock:
+            for parts, value in writes:
+                if not parts:
+                    storage.records[self.tree] = dict(value) if isinstance(value, dict) else {}
+                    storage.since.setdefault(self.tree, _now_ms() - CLOCK_SKEW_MS)
+                    if not self.live:
+                        self.live = True
+                        storage._live[self.tree] = storage._live.get(self.tree, 0) + 1
+                elif self.tree in storage.records:
+                    # Records are replaced rather than changed, so values already handed out stay as they were
+                    records = storage.records[self.tree]
+                    record = with_value(records.get(parts[0]), parts[1:], value)
+                    if record is None or record == {}:
+                        records.pop(parts[0], None)
+                    else:
+                        records[parts[0]] = record
+            storage._dirty = True
+
+    def close(self):
+        storage = self.storage
+        with storage._lock:
+            if self.live:
+                self.live = False
+                storage._live[self.tree] -= 1
+                if not storage._live[self.tree]:
+                    del storage._live[self.tree]
+        self.registration.close()
+
+
+def _with_stamp(record, now):
+    return dict(record, **{STAMP_FIELD: now}) if isinstance(record, dict) else record
+
+
+def _stamped_at(place, value, now):
+    # value to write at place (tree, path inside it), with the records it holds stamped
+    if place is None or len(place[1]) > 1:
+        return value
+    if not place[1]:
+        return {key: _with_stamp(record, now) for key, record in value.items()} if isinstance(value, dict) else value
+    return _with_stamp(value, now)
+
+
+def _unstamped(record):
+    if isinstance(record, dict) and STAMP_FIELD in record:
+        record = dict(record)
+        del record[STAMP_FIELD]
+    return record
+
+
+def _now_ms():
+    return int(time.time() * 1000)
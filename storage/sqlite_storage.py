@@ -0,0 +1,256 @@
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from storage.base import Storage, new_key, split_path, join_path, value_at, with_value
+
+# Top-level nodes stored as collections of keyed records
+COLLECTIONS = ("db/inventory", "db/inventoryIndex", "db/recipes", "orders", "ordersArchive", "user")
+
+# Child keys that get an expression index per collection
+INDEXED_CHILDREN = {
+    "db/inventory": ("itemName", "updatedAt"),
+    "db/recipes": ("recipeName", "updatedAt"),
+    "orders": ("order_status", "order_date", "updatedAt"),
+}
+
+CHILD_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class SQLiteStorage(Storage):
+    # Storage backed by a local SQLite file, one row per record with the record stored as JSON
+
+    def __init__(self, db_path):
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (collection, key))"
+        )
+        for collection, children in INDEXED_CHILDREN.items():
+            for child in children:
+                index_name = f"idx_{collection.replace('/', '_')}_{child}"
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} "
+                    f"ON records (collection, json_extract(value, '$.{child}'))"
+                )
+        self._conn.commit()
+
+    def get(self, path):
+        with self._lock:
+            return self._read(split_path(path))
+
+    def set(self, path, value):
+        with self._lock:
+            resolved = self._write_many(path, {"": value})
+            self._notify("put", split_path(path), resolved[""])
+
+    def update(self, path, values):
+        with self._lock:
+            resolved = self._write_many(path, values)
+            self._notify("patch", split_path(path), resolved)
+
+    def push(self, path, value):
+        key = new_key()
+        self.set(join_path(path, key), value)
+        return key
+
+    def delete(self, path):
+        self.set(path, None)
+
+    def keys(self, path):
+        collection, key, _ = self._locate(split_path(path))
+        if key is not None:
+            value = self.get(path)
+            return list(value) if isinstance(value, dict) else []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM records WHERE collection = ? ORDER BY key", (collection,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        collection, key, _ = self._locate(split_path(path))
+        if key is not None:
+            raise ValueError(f"Queries are only supported on collections, not {path}")
+        if not CHILD_KEY_PATTERN.match(order_by):
+            raise ValueError(f"Invalid child key: {order_by}")
+
+        # Matches the expression index so lookups by child value do not scan the table
+        child = f"json_extract(value, '$.{order_by}')"
+        sql = "SELECT key, value FROM records WHERE collection = ?"
+        params = [collection]
+        if equal_to is not None:
+            sql += f" AND {child} = ?"
+            params.append(equal_to)
+        if start_at is not None:
+            sql += f" AND {child} >= ?"
+            params.append(start_at)
+        if end_at is not None:
+            sql += f" AND {child} <= ?"
+            params.append(end_at)
+        if limit_to_last is not None:
+            sql += f" ORDER BY {child} DESC, key DESC LIMIT ?"
+            params.append(limit_to_last)
+        else:
+            sql += f" ORDER BY {child}, key"
+            if limit_to_first is not None:
+                sql += " LIMIT ?"
+                params.append(limit_to_first)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if limit_to_last is not None:
+            rows.reverse()
+        return {row_key: json.loads(value) for row_key, value in rows}
+
+    def transaction(self, path, update_fn):
+        # The write lock is held for the whole read-modify-write, so no retries are needed
+        parts = split_path(path)
+        with self._lock:
+            with self._transaction():
+                new_value = update_fn(self._read(parts))
+                resolved = self._write(parts, new_value)
+            self._notify("put", parts, resolved)
+        return new_value
+
+    def transaction_many(self, paths, update_fn):
+        # Each path is read and written on its own, all under the one write lock
+        parts = [split_path(path) for path in paths]
+        with self._lock:
+            with self._transaction():
+                new_values = update_fn([self._read(path_parts) for path_parts in parts])
+                resolved = {
+                    "/".join(path_parts): self._write(path_parts, new_value)
+                    for path_parts, new_value in zip(parts, new_values)
+                }
+            self._notify("patch", [], resolved)
+        return new_values
+
+    def listen(self, path, callback):
+        registration = _Registration(self, split_path(path), callback)
+        with self._lock:
+            self._listeners.append(registration)
+            initial = self._read(registration.parts)
+        # Like Firebase, the first event delivers the current value of the whole node
+        callback("put", "/", initial)
+        return registration
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _locate(self, parts):
+        # Split a path into (collection, record key, path inside the record)
+        for collection in COLLECTIONS:
+            collection_parts = collection.split("/")
+            if parts[:len(collection_parts)] == collection_parts:
+                rest = parts[len(collection_parts):]
+                if not rest:
+                    return collection, None, []
+                return collection, rest[0], rest[1:]
+        raise ValueError(f"Path is outside the stored collections: {'/'.join(parts)}")
+
+    def _read(self, parts):
+        collection, key, rest = self._locate(parts)
+        if key is None:
+            rows = self._conn.execute(
+                "SELECT key, value FROM records WHERE collection = ? ORDER BY key", (collection,)
+            ).fetchall()
+            return {row_key: json.loads(value) for row_key, value in rows} or None
+
+        return value_at(self._read_record(collection, key), rest)
+
+    def _read_record(self, collection, key):
+        row = self._conn.execute(
+            "SELECT value FROM records WHERE collection = ? AND key = ?", (collection, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, parts, value):
+        # Write value at parts and return what ended up stored there (increments resolved)
+        collection, key, rest = self._locate(parts)
+        if key is None:
+            self._conn.execute("DELETE FROM records WHERE collection = ?", (collection,))
+            for child_key, child_value in (value or {}).items():
+                self._write(parts + [child_key], child_value)
+            return value
+
+        record = with_value(self._read_record(collection, key), rest, value)
+        if record is None or record == {}:
+            self._conn.execute(
+                "DELETE FROM records WHERE collection = ? AND key = ?", (collection, key)
+            )
+        else:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records (collection, key, value) VALUES (?, ?, ?)",
+                (collection, key, json.dumps(record))
+            )
+        return value_at(record, rest)
+
+    def _write_many(self, path, values):
+        # All writes of one call commit in a single SQLite transaction
+        with self._lock:
+            with self._transaction():
+                return {
+                    child_path: self._write(split_path(join_path(path, child_path)), value)
+                    for child_path, value in values.items()
+                }
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front so other processes cannot interleave
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        else:
+            self._conn.commit()
+
+    def _notify(self, event_type, parts, data):
+        # Called with the lock held so listeners see changes in commit order
+        listeners = list(self._listeners)
+        if event_type == "put":
+            writes = {"/".join(parts): data}
+        else:
+            writes = {join_path("/".join(parts), child_path): value for child_path, value in data.items()}
+
+        for registration in listeners:
+            prefix = registration.parts
+            relative = {}
+            reload = False
+            for write_path, value in writes.items():
+                write_parts = split_path(write_path)
+                if write_parts[:len(prefix)] == prefix:
+                    relative["/".join(write_parts[len(prefix):])] = value
+                elif prefix[:len(write_parts)] == write_parts:
+                    reload = True
+
+            if reload:
+                # A write above the listened node; resend the node as a whole
+                registration.callback("put", "/", self.get("/".join(prefix)))
+            elif event_type == "put" and relative:
+                child_path, value = next(iter(relative.items()))
+                registration.callback("put", "/" + child_path, value)
+            elif relative:
+                registration.callback("patch", "/", relative)
+
+
+class _Registration:
+    def __init__(self, storage, parts, callback):
+        self.storage = storage
+        self.parts = parts
+        self.callback = callback
+
+    def close(self):
+        with self.storage._lock:
+            if self in self.storage._listeners:
+                self.storage._listeners.remove(self)
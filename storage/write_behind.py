@@ -0,0 +1,681 @@
+import json
+import sqlite3
+import threading
+from itertools import islice
+from datetime import datetime
+from storage.base import (
+    Storage, Increment, FOLLOW_UPS, OPERATIONS, TransactionAbortedError, TransactionContentionError, new_key,
+    query_children, split_path, join_path, value_at, with_value
+)
+
+# Queued writes merged into one multi-path update at most
+MAX_BATCH_WRITES = 500
+
+
+class WriteJournal:
+    # Durable, ordered log of writes not yet sent, in a local SQLite file. Each entry is either
+    # {"kind": "update", "changes": {absolute path: value}} or
+    # {"kind": "operation", "steps": [{"path": path, "name": name, "args": args}, ...],
+    # "then": [follow-up name, args] or None}.
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conflicts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL, reason TEXT NOT NULL, "
+            "created_at TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def append(self, entries):
+        # Commit entries in one go and return their ids
+        with self._lock:
+            entry_ids = [
+                self._conn.execute("INSERT INTO pending (entry) VALUES (?)", (_dumps(entry),)).lastrowid
+                for entry in entries
+            ]
+            self._conn.commit()
+            return entry_ids
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, entry FROM pending ORDER BY id").fetchall()
+        return [(entry_id, _loads(entry)) for entry_id, entry in rows]
+
+    def replace(self, entry_id, entry):
+        # Swap an entry for the one that follows it, keeping its place in the queue
+        with self._lock:
+            self._conn.execute("UPDATE pending SET entry = ? WHERE id = ?", (_dumps(entry), entry_id))
+            self._conn.commit()
+
+    def remove(self, entry_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+            self._conn.commit()
+
+    def record_conflict(self, entry_id, entry, reason):
+        # Move a refused entry out of the queue, keeping it for an admin to look at
+        with self._lock:
+            self._conn.execute("DELETE FROM pending WHERE id = ?", (entry_id,))
+            self._conn.execute(
+                "INSERT INTO conflicts (entry, reason, created_at) VALUES (?, ?, ?)",
+                (_dumps(entry), reason, datetime.now().isoformat(timespec="seconds"))
+            )
+            self._conn.commit()
+
+    def conflict_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conflicts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WriteBehindStorage(Storage):
+    # Wraps a backend so writes never wait on the network. set/update/push/delete and enqueued
+    # operations are committed to a local WriteJournal and return at once; a background thread
+    # sends them in order, merging runs of plain writes into one multi-path update and running
+    # the steps of each enqueued operation together in one transaction_many against the server's
+    # current values. An operation with a step that raises TransactionAbortedError there is a
+    # conflict; none of its steps is applied and it is moved to the journal's conflicts table.
+    # Otherwise its follow-up, if it has one, takes its place in the queue and is sent next. While
+    # the database cannot be reached, or a transaction keeps losing to other terminals' writes,
+    # the queue waits and retries.
+    #
+    # Reads and listeners see the queued writes applied on top of the stored data, so the app
+    # shows its own changes at once; listeners get the affected children again whenever a
+    # write is queued or refused.
+
+    def __init__(self, backend, journal_path, retry_seconds=5.0):
+        self.backend = backend
+        self.transient_errors = backend.transient_errors + (TransactionContentionError,)
+        self.retry_seconds = retry_seconds
+        self.journal = WriteJournal(journal_path)
+        # Queued entries by id, oldest first, the paths each writes, and indexes of them by path:
+        # _below holds every entry at or below a path, _at the entries written exactly at it
+        self.pending = {}
+        self._paths = {}
+        self._below = {}
+        self._at = {}
+        for entry_id, entry in self.journal.load():
+            self._track(entry_id, entry)
+        self.conflicts = self.journal.conflict_count()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._append_lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        # Held while one batch is sent; _send_generation is odd meanwhile, so reads can tell
+        # whether a batch landed while they were running
+        self._send_lock = threading.Lock()
+        self._send_generation = 0
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if self.pending:
+            self._wake.set()
+
+    # Writes
+
+    def set(self, path, value):
+        self._append([{"kind": "update", "changes": {join_path(path): value}}])
+
+    def update(self, path, values):
+        self._append([{"kind": "update", "changes": {
+            join_path(path, child_path): value for child_path, value in values.items()
+        }}])
+
+    def push(self, path, value):
+        # Push keys are generated on the client anyway, so the key is known before the write is sent
+        key = new_key()
+        self.set(join_path(path, key), value)
+        return key
+
+    def delete(self, path):
+        self.set(path, None)
+
+    def enqueue(self, steps, then=None):
+        self.enqueue_many([(steps, then)])
+
+    def enqueue_many(self, operations):
+        self._append([_entry(operation) for operation in operations])
+
+    def transaction(self, path, update_fn):
+        # Needs the server's answer, so queued writes go first to keep the order
+        self.flush()
+        return self.backend.transaction(path, update_fn)
+
+    def _append(self, entries):
+        # Held throughout so listeners learn of entries in id order
+        with self._append_lock:
+            queued = list(zip(self.journal.append(entries), entries))
+            with self._lock:
+                for entry_id, entry in queued:
+                    self._track(entry_id, entry)
+            for listener in self._current_listeners():
+                listener.appended(queued)
+        self._wake.set()
+
+    # Reads
+
+    def get(self, path):
+        return self._read(path, lambda: self.backend.get(path), lambda value, pending: _overlay(path, value, pending))
+
+    def keys(self, path):
+        return self._read(path, lambda: self.backend.keys(path), lambda keys, pending: _overlay_keys(path, keys, pending))
+
+    def query(self, path, order_by, equal_to=None, start_at=None, end_at=None,
+              limit_to_first=None, limit_to_last=None):
+        def fetch():
+            return self.backend.query(
+                path, order_by, equal_to=equal_to, start_at=start_at, end_at=end_at,
+                limit_to_first=limit_to_first, limit_to_last=limit_to_last
+            )
+
+        def overlay(children, pending):
+            return _overlay_query(
+                path, children, pending, order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last
+            )
+        return self._read(path, fetch, overlay)
+
+    def _read(self, path, fetch, overlay):
+        # A batch sent while the read was running may or may not be in its result, so retry then
+        for _ in range(3):
+            generation = self._send_generation
+            value = fetch()
+            if generation == self._send_generation and generation % 2 == 0:
+                break
+        else:
+            with self._send_lock:
+                value = fetch()
+        pending = self._pending_for(path)
+        return overlay(value, pending) if pending else value
+
+    def _pending_for(self, path):
+        return [entry for _, entry in self._pending_items(path)]
+
+    def _pending_items(self, path):
+        # (entry id, entry) of queued entries at, below or above path, oldest first
+        parts = split_path(path)
+        with self._lock:
+            found = dict(self._below.get("/".join(parts), {}))
+            for depth in range(len(parts)):
+                found.update(self._at.get("/".join(parts[:depth]), {}))
+        return sorted(found.items())
+
+    def _track(self, entry_id, entry):
+        self.pending[entry_id] = entry
+        self._paths[entry_id] = _entry_paths(entry)
+        for path in self._paths[entry_id]:
+            parts = split_path(path)
+            self._at.setdefault("/".join(parts), {})[entry_id] = entry
+            for depth in range(len(parts) + 1):
+                self._below.setdefault("/".join(parts[:depth]), {})[entry_id] = entry
+
+    def _untrack(self, entry_id):
+        del self.pending[entry_id]
+        for path in self._paths.pop(entry_id):
+            parts = split_path(path)
+            for index, key in [(self._at, "/".join(parts))] + [
+                (self._below, "/".join(parts[:depth])) for depth in range(len(parts) + 1)
+            ]:
+                entries = index.get(key)
+                if entries is not None:
+                    entries.pop(entry_id, None)
+                    if not entries:
+                        del index[key]
+
+    # Sending
+
+    def flush(self):
+        # Send queued writes in order; returns False if the database could not be reached
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._next_batch()
+                if batch is None:
+                    return True
+                entries, changes = batch
+                unknown = [] if changes is not None else _unknown_names(entries[0][1])
+                if unknown:
+                    # e.g. queued by another version of the app; set aside so the queue goes on
+                    self._refuse(entries[0], f"Unknown operation {', '.join(unknown)}")
+                    for listener in self._current_listeners():
+                        listener.settled(entries, {entries[0][0]}, {})
+                    continue
+                listeners = self._current_listeners()
+                for listener in listeners:
+                    listener.sending(entries)
+                refused = set()
+                replaced = {}
+                with self._send_lock:
+                    self._send_generation += 1
+                    try:
+                        self._send(entries, changes, refused, replaced)
+                    except self.transient_errors as e:
+                        print(f"Error sending queued writes, will retry: {e}")
+                        return False
+                    finally:
+                        self._send_generation += 1
+                        for listener in listeners:
+                            listener.settled(entries, refused, replaced)
+
+    def _next_batch(self):
+        # (entries, merged changes) for the longest run of plain writes that merges into one
+        # multi-path update, or ([operation entry], None); None when the queue is empty
+        if not self.pending:
+            return None
+        first = next(iter(self.pending.items()))
+        if first[1]["kind"] == "operation":
+            return [first], None
+        entries = []
+        changes = {}
+        prefixes = set()
+        for entry_id, entry in islice(self.pending.items(), MAX_BATCH_WRITES):
+            if entry["kind"] != "update" or not _merge(changes, prefixes, entry["changes"]):
+                break
+            entries.append((entry_id, entry))
+        return entries, changes
+
+    def _send(self, entries, changes, refused, replaced):
+        try:
+            if changes is not None:
+                self.backend.update("/", changes)
+            else:
+                steps = entries[0][1]["steps"]
+                new_values = self.backend.transaction_many(
+                    [step["path"] for step in steps],
+                    lambda values: [OPERATIONS[step["name"]](value, step["args"]) for step, value in zip(steps, values)]
+                )
+        except self.transient_errors:
+            raise
+        except Exception as e:
+            if len(entries) > 1:
+                # Find the write that was refused by sending the batch one write at a time
+                for entry_id, entry in entries:
+                    self._send([(entry_id, entry)], entry["changes"], refused, replaced)
+            else:
+                self._refuse(entries[0], e)
+                refused.add(entries[0][0])
+            return
+        if changes is None and entries[0][1].get("then"):
+            self._follow(entries[0], new_values, refused, replaced)
+            return
+        self.journal.remove([entry_id for entry_id, _ in entries])
+        with self._lock:
+            for entry_id, _ in entries:
+                self._untrack(entry_id)
+
+    def _follow(self, pending_entry, new_values, refused, replaced):
+        # The operation applied; its follow-up takes its place at the head of the queue. Should
+        # this process stop before that is recorded, the operation is sent again, so operations
+        # with a follow-up must accept a value they already wrote themselves.
+        entry_id, entry = pending_entry
+        try:
+            follow = _follow_up(entry, new_values)
+        except Exception as e:
+            self._refuse(pending_entry, f"Applied, but its follow-up failed: {e}")
+            refused.add(entry_id)
+            return
+        self.journal.replace(entry_id, follow)
+        with self._lock:
+            self._untrack(entry_id)
+            self._track(entry_id, follow)
+        replaced[entry_id] = follow
+
+    def _refuse(self, pending_entry, error):
+        # Refused by the database or by the operation itself; the rest of the queue goes on
+        entry_id, entry = pending_entry
+        print(f"Queued write conflicts with the database and was not applied: {error}")
+        self.journal.record_conflict(entry_id, entry, str(error))
+        with self._lock:
+            self._untrack(entry_id)
+            self.conflicts += 1
+
+    def _run(self):
+        delay = None
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._closed:
+                return
+            delay = None if self.flush() else self.retry_seconds
+
+    # Everything else
+
+    def listen(self, path, callback):
+        listener = _Listener(self, path, callback)
+        with self._lock:
+            self._listeners.append(listener)
+        listener.registration = self.backend.listen(path, listener.on_event)
+        return listener
+
+    def _current_listeners(self):
+        with self._lock:
+            return list(self._listeners)
+
+    def has_local_copy(self, path):
+        return self.backend.has_local_copy(path)
+
+    def queue_status(self):
+        return len(self.pending), self.conflicts
+
+    def offline_since(self):
+        return self.backend.offline_since()
+
+    def close(self):
+        # Try to send what is queued; anything left is sent on the next start
+        self.flush()
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=1)
+        self.journal.close()
+        self.backend.close()
+
+
+class _Listener:
+    # Hands the callback the listened node with the queued writes applied. Keeps the node as the
+    # backend last reported it (stored) and as last handed to the callback (shown). A queued
+    # write is applied to shown once; an event that is just the echo of a write being sent
+    # leaves shown as it is. Anything else (a change made elsewhere, a refused write) rebuilds
+    # the affected children from stored and the queue. The callback only ever receives whole
+    # children (or the whole node).
+
+    def __init__(self, storage, path, callback):
+        self.storage = storage
+        self.path = join_path(path)
+        self.parts = split_path(path)
+        self.callback = callback
+        self.stored = None
+        self.shown = None
+        self.started = False
+        # Entries being sent by id, with the children whose echo has not been seen yet, and
+        # entries whose echo has been seen but that are still queued until the send returns
+        self.in_flight = {}
+        self.echoed = set()
+        # Newest entry id already in shown, per child and for the node as a whole
+        self.shown_up_to = {}
+        self.whole_up_to = 0
+        self.registration = None
+        self._lock = threading.Lock()
+
+    def on_event(self, event_type, path, data):
+        parts = split_path(path)
+        if event_type == "put":
+            writes = [(parts, data)]
+        else:
+            writes = [(parts + split_path(child_path), value) for child_path, value in data.items()]
+        with self._lock:
+            before = self.stored
+            for write_parts, value in writes:
+                self.stored = with_value(self.stored, write_parts, value)
+            if not self.started or not all(write_parts for write_parts, _ in writes):
+                self.started = True
+                # Assume whatever was being sent is in the new value
+                self.echoed.update(self.in_flight)
+                self.in_flight.clear()
+                self._rebuild(None)
+                return
+            changed = [
+                child for child in {write_parts[0] for write_parts, _ in writes}
+                if not self._is_echo(child, value_at(before, [child]), value_at(self.stored, [child]))
+            ]
+            if changed:
+                self._rebuild(changed)
+
+    def _is_echo(self, child, before, after):
+        # Whether child changed exactly as the oldest writes being sent to it say
+        child_path = join_path(self.path, child)
+        value = before
+        matched = []
+        for entry_id in sorted(self.in_flight):
+            entry, children = self.in_flight[entry_id]
+            if child not in children:
+                continue
+            value = _overlay(child_path, value, [entry])
+            matched.append(entry_id)
+            if value == after:
+                for entry_id in matched:
+                    children = self.in_flight[entry_id][1]
+                    children.discard(child)
+                    if not children:
+                        del self.in_flight[entry_id]
+                        self.echoed.add(entry_id)
+                return True
+        return False
+
+    def appended(self, entries):
+        # Newly queued (entry id, entry) pairs, oldest first
+        with self._lock:
+            # Before the backend's first event there is nothing to show the writes on top of
+            if not self.started:
+                return
+            touched = {}
+            for entry_id, entry in entries:
+                children = self._children(entry)
+                if children is None:
+                    self._rebuild(None)
+                    return
+                for child in children:
+                    if entry_id > max(self.whole_up_to, self.shown_up_to.get(child, 0)):
+                        touched.setdefault(child, []).append(entry)
+                        self.shown_up_to[child] = entry_id
+            for child, child_entries in touched.items():
+                value = _overlay(join_path(self.path, child), value_at(self.shown, [child]), child_entries)
+                self.shown = with_value(self.shown, [child], value)
+            if touched:
+                self.callback("patch", "/", {child: value_at(self.shown, [child]) for child in touched})
+
+    def sending(self, entries):
+        with self._lock:
+            for entry_id, entry in entries:
+                children = self._children(entry)
+                if children:
+                    self.in_flight[entry_id] = (entry, set(children))
+
+    def settled(self, entries, refused, replaced):
+        # The send of entries returned; refused holds the ids the database did not apply and
+        # replaced the follow-ups queued in place of operations, by id
+        with self._lock:
+            if not self.started:
+                return
+            stale = set()
+            for entry_id, entry in entries:
+                self.echoed.discard(entry_id)
+                if entry_id in self.in_flight:
+                    # Sent but never echoed, so there is no telling what the server did with it
+                    stale.update(self.in_flight.pop(entry_id)[1])
+                if entry_id in refused or entry_id in replaced:
+                    children = self._children(replaced.get(entry_id, entry))
+                    if children is None:
+                        self._rebuild(None)
+                        return
+                    stale.update(children)
+            if stale:
+                self._rebuild(stale)
+
+    def _children(self, entry):
+        # Children of the node that entry writes; None when it writes the node itself or above it
+        children = set()
+        for path in _entry_paths(entry):
+            parts = split_path(path)
+            if len(parts) > len(self.parts) and parts[:len(self.parts)] == self.parts:
+                children.add(parts[len(self.parts)])
+            elif self.parts[:len(parts)] == parts:
+                return None
+        return children
+
+    def _rebuild(self, children):
+        # Recompute shown from stored and the queue for children (None for the whole node)
+        if children is None:
+            queued = self.storage._pending_items(self.path)
+            self.shown = _overlay(self.path, self.stored, [
+                entry for entry_id, entry in queued if entry_id not in self.echoed
+            ])
+            self.shown_up_to = {}
+            self.whole_up_to = max([self.whole_up_to] + [entry_id for entry_id, _ in queued])
+            self.callback("put", "/", self.shown)
+            return
+        values = {}
+        for child in children:
+            child_path = join_path(self.path, child)
+            queued = self.storage._pending_items(child_path)
+            values[child] = _overlay(child_path, value_at(self.stored, [child]), [
+                entry for entry_id, entry in queued if entry_id not in self.echoed
+            ])
+            self.shown = with_value(self.shown, [child], values[child])
+            if queued:
+                self.shown_up_to[child] = max(self.shown_up_to.get(child, 0), queued[-1][0])
+        self.callback("patch", "/", values)
+
+    def close(self):
+        with self.storage._lock:
+            if self in self.storage._listeners:
+                self.storage._listeners.remove(self)
+        if self.registration is not None:
+            self.registration.close()
+
+
+def _entry(write):
+    # Journal entry for a write given as (steps, then), or as {absolute path: value} changes
+    if isinstance(write, dict):
+        return {"kind": "update", "changes": {join_path(path): value for path, value in write.items()}}
+    steps, then = write
+    return {"kind": "operation", "steps": [
+        {"path": join_path(path), "name": name, "args": args} for path, name, args in steps
+    ], "then": then}
+
+
+def _follow_up(entry, new_values=None):
+    # The entry that follows an operation entry once its steps applied, or None; without
+    # new_values, the one expected while they have not run yet
+    then = entry.get("then")
+    if not then or then[0] not in FOLLOW_UPS:
+        return None
+    return _entry(FOLLOW_UPS[then[0]](new_values, then[1]))
+
+
+def _unknown_names(entry):
+    # Operations and follow-ups an operation entry names that are not registered
+    unknown = [step["name"] for step in entry["steps"] if step["name"] not in OPERATIONS]
+    if entry.get("then") and entry["then"][0] not in FOLLOW_UPS:
+        unknown.append(entry["then"][0])
+    return unknown
+
+
+def _entry_paths(entry):
+    if entry["kind"] == "update":
+        return list(entry["changes"])
+    follow = _follow_up(entry)
+    return [step["path"] for step in entry["steps"]] + (_entry_paths(follow) if follow else [])
+
+
+def _merge(merged, prefixes, changes):
+    # Fold changes into merged as if applied after it; False when a path is above or below one
+    # already merged, which a single multi-path update cannot express. prefixes holds every
+    # proper prefix of the merged paths.
+    for path in changes:
+        parts = split_path(path)
+        if path not in merged and (
+            path in prefixes or any("/".join(parts[:depth]) in merged for depth in range(len(parts)))
+        ):
+            return False
+    for path, value in changes.items():
+        parts = split_path(path)
+        prefixes.update("/".join(parts[:depth]) for depth in range(len(parts)))
+        if path in merged and isinstance(value, Increment):
+            previous = merged[path]
+            if isinstance(previous, Increment):
+                value = Increment(previous.amount + value.amount)
+            else:
+                value = value.apply(previous)
+        merged[path] = value
+    return True
+
+
+def _overlay(path, value, pending):
+    # value read at path, with the queued writes applied on top
+    parts = split_path(path)
+    for entry in pending:
+        if entry["kind"] == "update":
+            for write_path, write_value in entry["changes"].items():
+                write_parts = split_path(write_path)
+                if write_parts[:len(parts)] == parts:
+                    value = with_value(value, write_parts[len(parts):], write_value)
+                elif parts[:len(write_parts)] == write_parts and not isinstance(write_value, Increment):
+                    value = value_at(write_value, parts[len(write_parts):])
+        else:
+            # Each step is shown on its own; whether a step outside path would refuse the
+            # operation only shows once it is sent
+            aborted = False
+            for step in entry["steps"]:
+                operation = OPERATIONS.get(step["name"])
+                step_parts = split_path(step["path"])
+                if operation is None or step_parts[:len(parts)] != parts:
+                    continue
+                try:
+                    result = operation(value_at(value, step_parts[len(parts):]), step["args"])
+                except TransactionAbortedError:
+                    aborted = True
+                    continue
+                value = with_value(value, step_parts[len(parts):], result)
+            follow = None if aborted else _follow_up(entry)
+            if follow is not None:
+                value = _overlay(path, value, [follow])
+    return value
+
+
+def _touched_children(path, pending):
+    # Direct children of path that the queued writes touch
+    parts = split_path(path)
+    children = []
+    for entry in pending:
+        for write_path in _entry_paths(entry):
+            write_parts = split_path(write_path)
+            if len(write_parts) > len(parts) and write_parts[:len(parts)] == parts:
+                if write_parts[len(parts)] not in children:
+                    children.append(write_parts[len(parts)])
+    return children
+
+
+def _overlay_keys(path, keys, pending):
+    keys = list(keys)
+    for child in _touched_children(path, pending):
+        exists = child in keys
+        value = _overlay(join_path(path, child), {} if exists else None, pending)
+        if value is None and exists:
+            keys.remove(child)
+        elif value is not None and not exists:
+            keys.append(child)
+    return keys
+
+
+def _overlay_query(path, children, pending, order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last):
+    touched = _touched_children(path, pending)
+    if not touched:
+        return children
+    children = dict(children)
+    for child in touched:
+        value = _overlay(join_path(path, child), children.get(child), pending)
+        if isinstance(value, dict):
+            children[child] = value
+        else:
+            children.pop(child, None)
+    return query_children(children, order_by, equal_to, start_at, end_at, limit_to_first, limit_to_last)
+
+
+def _dumps(entry):
+    return json.dumps(entry, default=lambda value: {"__increment__": value.amount})
+
+
+def _loads(text):
+    return json.loads(
+        text, object_hook=lambda node: Increment(node["__increment__"]) if "__increment__" in node else node
+    )
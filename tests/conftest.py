@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    # A fresh SQLite backend per test
+    storage = SQLiteStorage(str(tmp_path / "test.db"))
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The process-wide storage and inventory cache, on files in tmp_path; yields the raw backend
+    import storage
+    from config.app_config import AppConfig
+    from controllers.inventory_cache import InventoryCache
+
+    monkeypatch.setattr(AppConfig, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(AppConfig, "SQLITE_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setattr(AppConfig, "WRITE_QUEUE_PATH", str(tmp_path / "pending_writes.db"))
+    monkeypatch.setattr(AppConfig, "SNAPSHOT_PATH", str(tmp_path / "snapshot.msgpack"))
+    backend = SQLiteStorage(str(tmp_path / "app.db"))
+    yield backend
+    InventoryCache.shutdown()
+    if storage._storage is not None:
+        storage._storage.close()
+        storage._storage = None
+    backend.close()
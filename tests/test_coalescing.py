@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from storage.coalescing import CoalescingStorage
+
+
+class CountingStorage:
+    # Passes calls to a backend, counting gets and holding them until release is set
+    transient_errors = ()
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.gets = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def get(self, path):
+        self.gets += 1
+        self.release.wait(5)
+        return self.backend.get(path)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def test_concurrent_identical_reads_share_one_request(sqlite):
+    sqlite.set("orders/o1", {"order_status": "Pending"})
+    counting = CountingStorage(sqlite)
+    storage = CoalescingStorage(counting, ttl=0)
+    counting.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(storage.get("orders"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not storage._flights:
+        time.sleep(0.001)
+    counting.release.set()
+    for thread in threads:
+        thread.join()
+    assert counting.gets == 1
+    assert results == [{"o1": {"order_status": "Pending"}}] * 5
+
+
+def test_result_is_reused_until_a_write_overlaps(sqlite):
+    sqlite.set("orders/o1", {"order_status": "Pending"})
+    counting = CountingStorage(sqlite)
+    storage = CoalescingStorage(counting, ttl=60)
+    storage.get("orders")
+    storage.get("orders")
+    assert counting.gets == 1
+
+    storage.set("db/recipes/r1", {"recipeName": "Soup"})
+    storage.get("orders")
+    assert counting.gets == 1
+
+    storage.update("orders/o1", {"order_status": "Received"})
+    assert storage.get("orders") == {"o1": {"order_status": "Received"}}
+    assert counting.gets == 2
+
+
+def test_errors_are_not_cached(sqlite):
+    counting = CountingStorage(sqlite)
+    storage = CoalescingStorage(counting, ttl=60)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            storage.get("outside/the/collections")
+    assert counting.gets == 2
+
+
+def test_expired_results_are_dropped(sqlite, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    storage = CoalescingStorage(sqlite, ttl=2)
+    for order_id in ("o1", "o2", "o3"):
+        storage.get(f"orders/{order_id}")
+    now[0] += 2
+    storage.get("orders/o4")
+    assert list(storage._results) == [("get", "orders/o4")]
@@ -0,0 +1,71 @@
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from ui.dashboard_page import DashboardChart
+
+LABELS = ["Good", "Low", "Expired"]
+COLORS = ["green", "yellow", "red"]
+NAMES = ["Flour", "Eggs", "Salt", "Milk"]
+
+
+def headless_chart():
+    # DashboardChart on an Agg canvas instead of a Tk one, so no display is needed
+    chart = DashboardChart.__new__(DashboardChart)
+    chart.frame = None
+    chart.figure = Figure(figsize=(4, 3), dpi=100, layout="tight")
+    chart.ax = chart.figure.add_subplot()
+    chart.canvas = FigureCanvasAgg(chart.figure)
+    chart.data_key = None
+    chart.labels = None
+    chart.bars, chart.annotations, chart.wedges, chart.texts, chart.autotexts = [], [], [], [], []
+    return chart
+
+
+def pixels(chart):
+    chart.canvas.draw()
+    return np.asarray(chart.canvas.buffer_rgba()).astype(int)
+
+
+def differing_pixels(first, second):
+    # Pixels that differ by more than anti-aliasing noise
+    return int((np.abs(pixels(first) - pixels(second)).sum(axis=2) > 30).sum())
+
+
+@pytest.mark.parametrize("before, after", [([5, 3, 2], [1, 7, 2]), ([1, 1, 1], [10, 1, 0.5])])
+def test_pie_updated_in_place_matches_a_fresh_one(before, after):
+    updated = headless_chart()
+    updated.update_pie(before, LABELS, COLORS)
+    pixels(updated)
+    wedges = updated.wedges
+    updated.update_pie(after, LABELS, COLORS)
+    assert updated.wedges is wedges
+
+    fresh = headless_chart()
+    fresh.update_pie(after, LABELS, COLORS)
+    assert differing_pixels(updated, fresh) == 0
+
+
+@pytest.mark.parametrize("before, after", [([5, 3, 2, 1], [1, 7, 2, 9]), ([10, 20, 30, 40], [400, 1, 1, 1])])
+def test_bars_updated_in_place_match_fresh_ones(before, after):
+    updated = headless_chart()
+    updated.update_bars(NAMES, before, "blue", "Quantity", "Stock")
+    pixels(updated)
+    bars = updated.bars
+    updated.update_bars(NAMES, after, "blue", "Quantity", "Stock")
+    assert updated.bars is bars
+
+    fresh = headless_chart()
+    fresh.update_bars(NAMES, after, "blue", "Quantity", "Stock")
+    assert differing_pixels(updated, fresh) == 0
+
+
+def test_unchanged_data_is_not_redrawn():
+    chart = headless_chart()
+    chart.update_bars(NAMES, [1, 2, 3, 4], "blue", "Quantity", "Stock")
+    chart.canvas.draw_idle = lambda: pytest.fail("redrawn without a change")
+    chart.update_bars(NAMES, [1, 2, 3, 4], "blue", "Quantity", "Stock")
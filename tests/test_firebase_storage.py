@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+import controllers.operations
+from storage import firebase_storage
+from storage.base import OPERATIONS, Increment, TransactionAbortedError, TransactionContentionError
+from storage.firebase_storage import FirebaseStorage
+from storage.write_behind import WriteBehindStorage
+
+
+class FakeDatabase:
+    # Stands in for firebase_admin.db on top of a SQLite backend, with ETags and a hook run
+    # before every conditional put so a test can write in between, as another terminal would
+    def __init__(self, backend):
+        self.backend = backend
+        self.before_put = lambda path: None
+        self.puts = []
+
+    def reference(self, path):
+        return FakeReference(self, path)
+
+
+class FakeReference:
+    def __init__(self, database, path):
+        self.database = database
+        self.path = path
+
+    def get(self, etag=False):
+        value = self.database.backend.get(self.path)
+        return (value, _etag(value)) if etag else value
+
+    def set_if_unchanged(self, expected_etag, value):
+        self.database.before_put(self.path)
+        current = self.database.backend.get(self.path)
+        if _etag(current) != expected_etag:
+            return False, current, _etag(current)
+        self.database.puts.append(self.path)
+        self.database.backend.set(self.path, value)
+        return True, value, _etag(value)
+
+    def update(self, values):
+        self.database.backend.update(self.path, _decode(values))
+
+    def delete(self):
+        self.database.backend.delete(self.path)
+
+
+def _etag(value):
+    return json.dumps(value, sort_keys=True)
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if ".sv" in value:
+            return Increment(value[".sv"]["increment"])
+        return {key: _decode(child) for key, child in value.items()}
+    return value
+
+
+@pytest.fixture
+def database(sqlite, monkeypatch):
+    database = FakeDatabase(sqlite)
+    monkeypatch.setattr(firebase_storage, "db", database)
+    monkeypatch.setattr(firebase_storage, "RETRY_BACKOFF_SECONDS", 0)
+    return database
+
+
+@pytest.fixture
+def firebase(database):
+    storage = FirebaseStorage.__new__(FirebaseStorage)
+    storage.max_retries = 3
+    return storage
+
+
+def deduct(item_id, itemName, quantity):
+    return (f"db/inventory/{item_id}", "deductLots", {"itemName": itemName, "quantity": quantity, "today": "2029-01-01"})
+
+
+def enqueue(storage, steps):
+    paths = [path for path, _, _ in steps]
+    return storage.transaction_many(paths, lambda values: [
+        OPERATIONS[name](value, args) for (_, name, args), value in zip(steps, values)
+    ])
+
+
+def stock(quantity):
+    return {"stock": {"2030-01-01": quantity}, "totalQuantity": quantity}
+
+
+def test_each_item_is_written_on_its_own(sqlite, database, firebase):
+    sqlite.update("db/inventory", {"a": dict(stock(5), itemName="Flour"), "b": dict(stock(3), itemName="Eggs")})
+    enqueue(firebase, [deduct("a", "Flour", 2), deduct("b", "Eggs", 1)])
+
+    assert database.puts == ["db/inventory/a", "db/inventory/b"]
+    assert sqlite.get("db/inventory/a/totalQuantity") == 3
+    assert sqlite.get("db/inventory/b/totalQuantity") == 2
+
+
+def test_abort_puts_back_written_items_and_keeps_other_writes(sqlite, database, firebase):
+    sqlite.update("db/inventory", {"a": dict(stock(5), itemName="Flour"), "b": dict(stock(3), itemName="Eggs")})
+
+    def other_terminal(path):
+        # Receives Flour after a was written, and takes the Eggs before b is
+        if path == "db/inventory/b" and sqlite.get("db/inventory/b/totalQuantity") == 3:
+            sqlite.update("db/inventory/a", {"stock/2030-01-01": Increment(4), "totalQuantity": Increment(4)})
+            sqlite.update("db/inventory/b", stock(0))
+    database.before_put = other_terminal
+
+    with pytest.raises(TransactionAbortedError):
+        enqueue(firebase, [deduct("a", "Flour", 5), deduct("b", "Eggs", 1)])
+    assert sqlite.get("db/inventory/a") == dict(stock(9), itemName="Flour")
+
+
+def test_running_out_of_retries_is_not_a_refusal(sqlite, database, firebase, tmp_path):
+    sqlite.update("db/inventory", {"a": dict(stock(5), itemName="Flour"), "b": dict(stock(3), itemName="Eggs")})
+    # Another terminal changes b before every attempt to write it
+    database.before_put = lambda path: path == "db/inventory/b" and sqlite.update(
+        "db/inventory/b", {"edits": Increment(1)}
+    )
+    with pytest.raises(TransactionContentionError):
+        enqueue(firebase, [deduct("a", "Flour", 2), deduct("b", "Eggs", 1)])
+    assert sqlite.get("db/inventory/a/totalQuantity") == 5
+
+    queue = WriteBehindStorage(firebase, str(tmp_path / "queue.db"))
+    try:
+        queue.enqueue([deduct("a", "Flour", 2), deduct("b", "Eggs", 1)])
+        assert not queue.flush()
+        assert queue.queue_status() == (1, 0)
+
+        database.before_put = lambda path: None
+        assert queue.flush()
+        assert queue.queue_status() == (0, 0)
+        assert sqlite.get("db/inventory/a/totalQuantity") == 3
+    finally:
+        queue.close()
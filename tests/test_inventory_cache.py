@@ -0,0 +1,45 @@
+import pytest
+
+from controllers import inventory_cache
+from controllers.inventory_cache import InventoryCache
+
+
+class OfflineStorage:
+    # A storage whose listener cannot be registered, optionally with a local copy of the inventory
+    def __init__(self, local_copy=None):
+        self.local_copy = local_copy
+
+    def has_local_copy(self, path):
+        return self.local_copy is not None
+
+    def get(self, path):
+        if self.local_copy is None:
+            raise ConnectionError("unreachable")
+        return self.local_copy
+
+    def listen(self, path, callback):
+        raise ConnectionError("unreachable")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    storage = OfflineStorage()
+    monkeypatch.setattr(inventory_cache, "get_storage", lambda: storage)
+    yield storage
+    InventoryCache.shutdown()
+
+
+def test_offline_start_serves_the_snapshot(offline):
+    offline.local_copy = {"a": {"itemName": "Flour", "stock": {"2030-01-01": 2}, "totalQuantity": 2}}
+    cache = InventoryCache.instance()
+    assert cache.find_id("Flour") == "a"
+    assert cache.lots.pick("a", 2, "2029-01-01") == {"2030-01-01": 2}
+
+
+def test_failed_start_is_not_kept(offline):
+    with pytest.raises(ConnectionError):
+        InventoryCache.instance()
+    assert InventoryCache._instance is None
+
+    offline.local_copy = {"a": {"itemName": "Flour", "totalQuantity": 0}}
+    assert InventoryCache.instance().find_id("Flour") == "a"
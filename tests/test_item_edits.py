@@ -0,0 +1,54 @@
+from controllers.food_inventory_controller import FoodInventory
+from storage import get_storage
+
+
+def seed(app):
+    inventory = FoodInventory()
+    item_id = next(iter(inventory.createItem({"itemName": "Flour", "stock": {"2030-01-01": 5}})))
+    assert get_storage().flush()
+    return inventory, item_id
+
+
+def test_edit_applies_to_the_item_it_was_made_on(app):
+    inventory, item_id = seed(app)
+    inventory.updateItem(item_id, {"itemName": "Rye Flour", "stock": {"2030-03-01": 4}})
+    assert inventory.cache.get_item(item_id)["itemName"] == "Rye Flour"
+    assert get_storage().flush()
+
+    assert get_storage().queue_status() == (0, 0)
+    assert get_storage().get(f"db/inventory/{item_id}") == {"itemName": "Rye Flour", "stock": {"2030-03-01": 4}, "totalQuantity": 4}
+
+
+def test_edit_is_refused_after_another_terminal_changed_the_item(app):
+    inventory, item_id = seed(app)
+    base = inventory.cache.get_item(item_id)
+
+    # Another terminal takes some flour while the edit dialog is open
+    app.update(f"db/inventory/{item_id}", {"stock/2030-01-01": 3, "totalQuantity": 3})
+    inventory.updateItem(item_id, {"stock": {"2030-01-01": 5}}, base)
+    assert get_storage().flush()
+
+    assert get_storage().queue_status() == (0, 1)
+    assert app.get(f"db/inventory/{item_id}/totalQuantity") == 3
+
+
+def test_delete_is_refused_after_another_terminal_added_stock(app):
+    inventory, item_id = seed(app)
+    base = inventory.cache.get_item(item_id)
+
+    app.update(f"db/inventory/{item_id}", {"stock/2030-02-01": 2, "totalQuantity": 7})
+    inventory.deleteItem(item_id, base)
+    assert get_storage().flush()
+
+    assert get_storage().queue_status() == (0, 1)
+    assert app.get(f"db/inventory/{item_id}/totalQuantity") == 7
+
+
+def test_delete_removes_an_unchanged_item(app):
+    inventory, item_id = seed(app)
+    inventory.deleteItem(item_id)
+    assert inventory.cache.get_item(item_id) is None
+    assert get_storage().flush()
+
+    assert get_storage().queue_status() == (0, 0)
+    assert app.get(f"db/inventory/{item_id}") is None
@@ -0,0 +1,75 @@
+import random
+
+from controllers.lot_index import LotIndex
+
+
+def make_index():
+    index = LotIndex()
+    index.rebuild({
+        "flour": {"itemName": "Flour", "stock": {"2030-01-01": 5, "2030-03-01": 10}},
+        "eggs": {"itemName": "Eggs", "stock": {"2029-12-01": 4}},
+        "salt": {"itemName": "Salt"},
+    })
+    return index
+
+
+def test_pick_takes_first_expiring_lots_first():
+    index = make_index()
+    assert index.pick("flour", 3, "2029-01-01") == {"2030-01-01": 3}
+    assert index.pick("flour", 12, "2029-01-01") == {"2030-01-01": 5, "2030-03-01": 7}
+
+
+def test_pick_skips_expired_lots():
+    index = make_index()
+    assert index.pick("flour", 4, "2030-02-01") == {"2030-03-01": 4}
+    assert index.pick("flour", 11, "2030-02-01") is None
+
+
+def test_pick_returns_none_when_stock_is_short_or_missing():
+    index = make_index()
+    assert index.pick("flour", 16, "2029-01-01") is None
+    assert index.pick("salt", 1, "2029-01-01") is None
+    assert index.pick("unknown", 1, "2029-01-01") is None
+
+
+def test_update_item_replaces_lots_and_earliest():
+    index = make_index()
+    index.update_item("flour", {"2030-03-01": 2})
+    assert index.earliest("flour") == "2030-03-01"
+    assert index.pick("flour", 2, "2029-01-01") == {"2030-03-01": 2}
+    index.update_item("flour", None)
+    assert index.earliest("flour") is None
+    assert index.pick("flour", 1, "2029-01-01") is None
+
+
+def test_expiring_before_skips_removed_lots():
+    index = make_index()
+    index.update_item("eggs", None)
+    index.update_item("flour", {"2030-01-01": 1, "2031-01-01": 8})
+    assert index.expiring_before("2030-06-01") == [("2030-01-01", "flour", 1)]
+    assert index.items_expiring_before("2031-06-01") == {"flour"}
+
+
+def test_matches_a_full_scan_after_random_updates():
+    rng = random.Random(7)
+    index = LotIndex()
+    items = {}
+    index.rebuild(items)
+    dates = [f"2030-{month:02d}-01" for month in range(1, 13)]
+    for _ in range(2000):
+        item_id = f"item{rng.randint(0, 30)}"
+        if rng.random() < 0.2:
+            items.pop(item_id, None)
+            index.update_item(item_id, None)
+        else:
+            stock = {date: rng.randint(1, 9) for date in rng.sample(dates, rng.randint(1, 3))}
+            items[item_id] = stock
+            index.update_item(item_id, stock)
+
+    expected = sorted(
+        (date, item_id, quantity)
+        for item_id, stock in items.items() for date, quantity in stock.items() if date < "2030-07-01"
+    )
+    assert index.expiring_before("2030-07-01") == expected
+    for item_id, stock in items.items():
+        assert index.earliest(item_id) == min(stock)
@@ -0,0 +1,49 @@
+from controllers.inventory_cache import InventoryCache
+from controllers.order_controller import OrderController
+from storage import get_storage
+
+ORDER = {
+    "order_content": {"Flour": {"quantity": 5, "expiry_date": "2030-01-01"}},
+    "order_date": "2026-10-01",
+    "order_status": "Pending",
+}
+
+
+def flour_quantity():
+    cache = InventoryCache.instance()
+    item = cache.get_item(cache.find_id("Flour")) if cache.find_id("Flour") else None
+    return (item or {}).get("totalQuantity", 0)
+
+
+def test_receiving_an_order_adds_its_stock_once(app):
+    app.set("orders/o1", ORDER)
+    controller = OrderController()
+    assert controller.receive_orders(["o1"]) == ["o1"]
+    assert get_storage().flush()
+    assert app.get("orders/o1/order_status") == "Received"
+    assert flour_quantity() == 5
+
+    # Already received here, so it is not queued again
+    assert controller.receive_orders(["o1"]) == []
+    assert controller.receive_order("o1") is False
+    assert get_storage().flush()
+    assert flour_quantity() == 5
+    assert get_storage().queue_status() == (0, 0)
+
+
+def test_order_received_elsewhere_first_is_refused_without_stock(app):
+    app.set("orders/o1", ORDER)
+    storage = get_storage()
+    controller = OrderController()
+
+    # Queued while offline; another terminal receives the order before this one is sent
+    with storage._flush_lock:
+        assert controller.receive_orders(["o1"]) == ["o1"]
+        assert flour_quantity() == 5
+        app.update("orders/o1", {"order_status": "Received", "receiptId": "other-terminal"})
+    assert storage.flush()
+
+    assert storage.queue_status() == (0, 1)
+    assert app.get("orders/o1/receiptId") == "other-terminal"
+    assert not app.get("db/inventory")
+    assert flour_quantity() == 0
@@ -0,0 +1,53 @@
+from controllers.food_inventory_controller import FoodInventory
+from controllers.staff_controller import StaffController
+from storage import get_storage
+
+
+def seed(app):
+    inventory = FoodInventory()
+    flour = next(iter(inventory.createItem({"itemName": "Flour", "stock": {"2030-01-01": 3, "2030-02-01": 3}})))
+    eggs = next(iter(inventory.createItem({"itemName": "Eggs", "stock": {"2030-01-01": 2}})))
+    recipe_id = next(iter(StaffController().addRecipe({"recipeName": "Bread", "ingredients": {"Flour": 4, "Eggs": 1}})))
+    assert get_storage().flush()
+    return flour, eggs, recipe_id
+
+
+def test_recipe_order_deducts_every_ingredient_first_expiring_first(app):
+    flour, eggs, recipe_id = seed(app)
+    assert StaffController().orderRecipe(recipe_id)
+    assert get_storage().flush()
+
+    assert app.get(f"db/inventory/{flour}/stock") == {"2030-02-01": 2}
+    assert app.get(f"db/inventory/{flour}/totalQuantity") == 2
+    assert app.get(f"db/inventory/{eggs}/totalQuantity") == 1
+
+
+def test_recipe_order_is_turned_down_when_the_cache_is_short(app):
+    flour, eggs, recipe_id = seed(app)
+    assert StaffController().orderRecipe(recipe_id)
+    assert not StaffController().orderRecipe(recipe_id)
+    assert get_storage().flush()
+    assert get_storage().queue_status() == (0, 0)
+    assert app.get(f"db/inventory/{eggs}/totalQuantity") == 1
+
+
+def test_recipe_order_short_of_one_ingredient_deducts_none(app):
+    flour, eggs, recipe_id = seed(app)
+    storage = get_storage()
+
+    # Another terminal uses up the eggs before this order is sent
+    with storage._flush_lock:
+        assert StaffController().orderRecipe(recipe_id)
+        app.update(f"db/inventory/{eggs}", {"stock": None, "totalQuantity": 0})
+    assert storage.flush()
+
+    assert storage.queue_status() == (0, 1)
+    assert app.get(f"db/inventory/{flour}/totalQuantity") == 6
+    assert app.get(f"db/inventory/{flour}/stock") == {"2030-01-01": 3, "2030-02-01": 3}
+
+
+def test_recipe_order_uses_the_recipe_it_is_given(app):
+    flour, eggs, recipe_id = seed(app)
+    assert StaffController().orderRecipe("loadedBeforeItWasDeleted", {"recipeName": "Omelette", "ingredients": {"Eggs": 2}})
+    assert get_storage().flush()
+    assert app.get(f"db/inventory/{eggs}/totalQuantity") == 0
@@ -0,0 +1,131 @@
+import pytest
+
+from storage import resilience
+from storage.resilience import CircuitBreaker, CircuitOpenError, ResilientStorage
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyStorage:
+    # Passes calls to a backend, raising a transient error while down is set
+    transient_errors = (ConnectionError,)
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.down = False
+        self.calls = 0
+
+    def __getattr__(self, name):
+        call = getattr(self.backend, name)
+
+        def wrapper(*args, **kwargs):
+            self.calls += 1
+            if self.down:
+                raise ConnectionError("unreachable")
+            return call(*args, **kwargs)
+        return wrapper
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_trial_through_after_reset(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial opens it for another full period
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow() and breaker.allow()
+
+
+def test_reads_fall_back_to_last_known_data(sqlite, clock):
+    sqlite.set("orders/o1", {"order_status": "Pending"})
+    flaky = FlakyStorage(sqlite)
+    storage = ResilientStorage(flaky, CircuitBreaker(2, 30), read_attempts=2, backoff_seconds=0)
+    assert storage.get("orders") == {"o1": {"order_status": "Pending"}}
+    assert storage.offline_since() is None
+
+    flaky.down = True
+    assert storage.get("orders") == {"o1": {"order_status": "Pending"}}
+    assert storage.get("orders/o1/order_status") == "Pending"
+    assert storage.offline_since() is not None
+    assert storage.breaker.is_open
+
+    # While open, reads are answered without calling the backend and writes fail fast
+    calls = flaky.calls
+    assert storage.get("orders") == {"o1": {"order_status": "Pending"}}
+    with pytest.raises(CircuitOpenError):
+        storage.set("orders/o2", {"order_status": "Pending"})
+    assert flaky.calls == calls
+
+    flaky.down = False
+    clock.now += 30
+    storage.set("orders/o2", {"order_status": "Pending"})
+    assert not storage.breaker.is_open
+    assert storage.offline_since() is None
+    assert sorted(storage.get("orders")) == ["o1", "o2"]
+
+
+def test_read_without_known_data_raises(sqlite, clock):
+    flaky = FlakyStorage(sqlite)
+    flaky.down = True
+    storage = ResilientStorage(flaky, CircuitBreaker(3, 30), read_attempts=1, backoff_seconds=0)
+    with pytest.raises(ConnectionError):
+        storage.get("orders")
+
+
+def test_refused_requests_do_not_count_as_outages(sqlite, clock):
+    storage = ResilientStorage(FlakyStorage(sqlite), CircuitBreaker(1, 30), backoff_seconds=0)
+    with pytest.raises(ValueError):
+        storage.get("outside/the/collections")
+    assert not storage.breaker.is_open
+
+
+def test_only_the_most_recently_used_results_are_kept(sqlite, clock):
+    sqlite.set("orders/o1", {"order_status": "Pending"})
+    flaky = FlakyStorage(sqlite)
+    storage = ResilientStorage(flaky, CircuitBreaker(10, 30), read_attempts=1, backoff_seconds=0, max_snapshots=2)
+    storage.get("orders")
+    for since in range(5):
+        storage.query("orders", "order_status", start_at=str(since))
+    assert len(storage._snapshots) == 2
+
+    # A result that is read again stays
+    storage.get("orders")
+    storage.query("orders", "order_status", start_at="9")
+    flaky.down = True
+    assert storage.get("orders/o1/order_status") == "Pending"
@@ -0,0 +1,50 @@
+from controllers.search_index import SearchIndex
+
+
+def make_index():
+    index = SearchIndex()
+    index.sync({
+        "item1": ("Tomato Sauce",),
+        "item2": ("Tomatillo",),
+        "item3": ("Chicken Breast", "Poultry"),
+    })
+    return index
+
+
+def test_empty_query_means_no_filter():
+    assert make_index().search("  ") is None
+
+
+def test_prefix_matches_every_word():
+    index = make_index()
+    assert index.search("tom") == {"item1", "item2"}
+    assert index.search("tom sau") == {"item1"}
+    assert index.search("chick poul") == {"item3"}
+    assert index.search("tom chick") == set()
+
+
+def test_id_prefix_matches():
+    assert make_index().search("item3") == {"item3"}
+
+
+def test_fuzzy_match_when_no_prefix_matches():
+    assert make_index().search("tomatoe") == {"item1"}
+    assert make_index().search("chiken") == {"item3"}
+
+
+def test_sync_reindexes_changed_and_removed_documents():
+    index = make_index()
+    index.sync({"item1": ("Tomato Paste",), "item3": ("Chicken Breast", "Poultry")})
+    assert index.search("sauce") == set()
+    assert index.search("paste") == {"item1"}
+    assert index.search("tomatillo") == set()
+    assert "tomatillo" not in index.postings
+    assert index._prefix("tomati") == set()
+
+
+def test_update_removes_with_none():
+    index = make_index()
+    index.update("item2", None)
+    assert index.search("tom") == {"item1"}
+    index.update("item2", ("Tomatillo Salsa",))
+    assert index.search("salsa") == {"item2"}
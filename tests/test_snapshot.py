@@ -0,0 +1,123 @@
+import pytest
+
+from storage.base import query_children
+from storage.snapshot import SnapshotStorage, STAMP_FIELD
+
+TREES = ("db/inventory", "db/recipes", "orders")
+
+
+class FlakyStorage:
+    # Passes calls to a backend, raising a transient error while down is set
+    transient_errors = (ConnectionError,)
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.down = False
+
+    def __getattr__(self, name):
+        call = getattr(self.backend, name)
+
+        def wrapper(*args, **kwargs):
+            if self.down:
+                raise ConnectionError("unreachable")
+            return call(*args, **kwargs)
+        return wrapper
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "snapshot.msgpack")
+
+
+def open_snapshot(backend, snapshot_path, max_age=60):
+    return SnapshotStorage(backend, snapshot_path, TREES, max_age=max_age, save_seconds=3600)
+
+
+def test_query_children_orders_filters_and_limits():
+    children = {
+        "a": {"date": "2026-01-03"}, "b": {"date": "2026-01-01"}, "c": {"date": "2026-01-02"},
+        "d": {"other": 1}, "e": {"date": 5}, "f": {"date": True},
+    }
+    assert list(query_children(children, "date")) == ["f", "e", "b", "c", "a"]
+    assert list(query_children(children, "date", start_at="2026-01-02")) == ["c", "a"]
+    assert list(query_children(children, "date", start_at="2026-01-01", end_at="2026-01-02")) == ["b", "c"]
+    assert list(query_children(children, "date", equal_to="2026-01-03")) == ["a"]
+    assert list(query_children(children, "date", limit_to_first=2)) == ["f", "e"]
+    assert list(query_children(children, "date", limit_to_last=2)) == ["c", "a"]
+
+
+def test_query_children_breaks_ties_by_key():
+    children = {"z": {"status": "Pending"}, "m": {"status": "Pending"}, "a": {"status": "Received"}}
+    assert list(query_children(children, "status")) == ["m", "z", "a"]
+
+
+def test_writes_are_stamped_and_reads_are_not(sqlite, snapshot_path):
+    storage = open_snapshot(sqlite, snapshot_path)
+    storage.set("orders/o1", {"order_status": "Pending"})
+    storage.update("orders/o1", {"order_status": "Received"})
+    storage.update("/", {"db/recipes/r1": {"recipeName": "Soup"}})
+
+    assert STAMP_FIELD in sqlite.get("orders/o1")
+    assert STAMP_FIELD in sqlite.get("db/recipes/r1")
+    assert storage.get("orders/o1") == {"order_status": "Received"}
+    assert storage.get("orders") == {"o1": {"order_status": "Received"}}
+    assert storage.query("orders", "order_status", equal_to="Received") == {"o1": {"order_status": "Received"}}
+    assert storage.transaction("orders/o1", lambda order: dict(order, order_status="Pending")) == {"order_status": "Pending"}
+    storage.close()
+
+
+def test_restart_fetches_only_changes_since_the_snapshot(sqlite, snapshot_path):
+    storage = open_snapshot(sqlite, snapshot_path)
+    storage.update("orders", {f"o{i}": {"order_status": "Received"} for i in range(5)})
+    assert len(storage.get("orders")) == 5
+    storage.save()
+
+    # Meanwhile: a stamped change, a deletion, and a record written without a stamp
+    other = open_snapshot(sqlite, snapshot_path + ".other")
+    other.update("orders/o1", {"order_status": "Pending"})
+    other.delete("orders/o2")
+    sqlite.set("orders/o9", {"order_status": "Pending"})
+
+    restarted = open_snapshot(sqlite, snapshot_path)
+    assert restarted.has_local_copy("orders")
+    assert restarted._changes("orders", restarted.records["orders"]) == {
+        "o0": {"order_status": "Received"}, "o1": {"order_status": "Pending"},
+        "o3": {"order_status": "Received"}, "o4": {"order_status": "Received"},
+        "o9": {"order_status": "Pending"},
+    }
+    assert sorted(restarted.query("orders", "order_status", equal_to="Pending")) == ["o1", "o9"]
+
+
+def test_saved_copy_answers_reads_while_offline(sqlite, snapshot_path):
+    storage = open_snapshot(sqlite, snapshot_path)
+    storage.set("db/recipes/r1", {"recipeName": "Soup"})
+    storage.get("db/recipes")
+    storage.close()
+
+    flaky = FlakyStorage(sqlite)
+    flaky.down = True
+    restarted = open_snapshot(flaky, snapshot_path, max_age=0)
+    assert restarted.get("db/recipes/r1") == {"recipeName": "Soup"}
+    with pytest.raises(ConnectionError):
+        restarted.get("orders")
+
+
+def test_listener_keeps_the_tree_it_listens_to_for_the_next_start(sqlite, snapshot_path):
+    sqlite.set("db/inventory/a", {"itemName": "Flour", "totalQuantity": 5})
+    storage = open_snapshot(sqlite, snapshot_path)
+    assert not storage.has_local_copy("db/inventory")
+
+    events = []
+    registration = storage.listen("db/inventory", lambda *event: events.append(event))
+    storage.update("db/inventory/a", {"totalQuantity": 3})
+    sqlite.set("db/inventory/b", {"itemName": "Eggs", "totalQuantity": 1})
+    assert all(STAMP_FIELD not in str(event) for event in events)
+    registration.close()
+    storage.close()
+
+    restarted = open_snapshot(sqlite, snapshot_path)
+    assert restarted.has_local_copy("db/inventory")
+    assert restarted.records["db/inventory"] == {
+        "a": {"itemName": "Flour", "totalQuantity": 3},
+        "b": {"itemName": "Eggs", "totalQuantity": 1},
+    }
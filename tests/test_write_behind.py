@@ -0,0 +1,158 @@
+import pytest
+
+import controllers.operations
+from storage.base import Increment
+from storage.write_behind import WriteBehindStorage, WriteJournal, _merge, _overlay, _entry
+
+
+@pytest.fixture
+def queue(sqlite, tmp_path):
+    storage = WriteBehindStorage(sqlite, str(tmp_path / "queue.db"))
+    yield storage
+    storage.close()
+
+
+def deduct(item_id, itemName, quantity, lots):
+    return (f"db/inventory/{item_id}", "deductLots",
+            {"itemName": itemName, "quantity": quantity, "lots": lots, "today": "2029-01-01"})
+
+
+def test_merge_folds_writes_and_increments():
+    merged, prefixes = {}, set()
+    assert _merge(merged, prefixes, {"db/inventory/a/totalQuantity": Increment(2), "orders/o1/order_status": "Pending"})
+    assert _merge(merged, prefixes, {"db/inventory/a/totalQuantity": Increment(3)})
+    assert _merge(merged, prefixes, {"orders/o1/order_status": "Received"})
+    assert merged["db/inventory/a/totalQuantity"].amount == 5
+    assert merged["orders/o1/order_status"] == "Received"
+
+    # An increment after a plain value is applied to it, as the backend would
+    assert _merge(merged, prefixes, {"db/inventory/b/totalQuantity": 4})
+    assert _merge(merged, prefixes, {"db/inventory/b/totalQuantity": Increment(1)})
+    assert merged["db/inventory/b/totalQuantity"] == 5
+
+
+def test_merge_refuses_paths_above_or_below_merged_ones():
+    merged, prefixes = {"db/inventory/a/stock/2030-01-01": 4}, {"db", "db/inventory", "db/inventory/a", "db/inventory/a/stock"}
+    assert not _merge(merged, prefixes, {"db/inventory/a": None})
+    assert not _merge(merged, prefixes, {"db/inventory/a/stock/2030-01-01/x": 1})
+    assert merged == {"db/inventory/a/stock/2030-01-01": 4}
+
+
+def test_overlay_applies_updates_at_above_and_below_path():
+    stored = {"itemName": "Flour", "totalQuantity": 5}
+    pending = [
+        _entry({"db/inventory/a/totalQuantity": Increment(2)}),
+        _entry({"db/inventory/a/stock/2030-01-01": 7}),
+    ]
+    assert _overlay("db/inventory/a", stored, pending) == {
+        "itemName": "Flour", "totalQuantity": 7, "stock": {"2030-01-01": 7}
+    }
+    assert _overlay("db/inventory/a", stored, [_entry({"db/inventory": {"b": {}}})]) is None
+    assert _overlay("db/inventory/a/itemName", "Flour", [_entry({"db/inventory/a": {"itemName": "Meal"}})]) == "Meal"
+
+
+def test_overlay_shows_steps_that_apply_and_skips_aborted_ones():
+    entry = _entry(([deduct("a", "Flour", 2, {"2030-01-01": 2}), deduct("b", "Eggs", 9, {})], None))
+    flour = {"itemName": "Flour", "stock": {"2030-01-01": 5}, "totalQuantity": 5}
+    eggs = {"itemName": "Eggs", "stock": {"2030-01-01": 1}, "totalQuantity": 1}
+    shown = _overlay("db/inventory", {"a": flour, "b": eggs}, [entry])
+    assert shown["a"]["totalQuantity"] == 3
+    assert shown["b"] == eggs
+
+
+def test_recipe_order_is_refused_as_a_whole(sqlite, queue):
+    sqlite.update("db/inventory", {
+        "a": {"itemName": "Flour", "stock": {"2030-01-01": 5}, "totalQuantity": 5},
+        "b": {"itemName": "Eggs", "stock": {"2030-01-01": 1}, "totalQuantity": 1},
+    })
+    queue.enqueue([deduct("a", "Flour", 2, {"2030-01-01": 2}), deduct("b", "Eggs", 3, {"2030-01-01": 3})])
+    assert queue.flush()
+
+    assert queue.queue_status() == (0, 1)
+    assert sqlite.get("db/inventory/a/totalQuantity") == 5
+    assert sqlite.get("db/inventory/b/totalQuantity") == 1
+    assert queue.get("db/inventory/a/totalQuantity") == 5
+
+
+def test_recipe_order_applies_every_step(sqlite, queue):
+    sqlite.update("db/inventory", {
+        "a": {"itemName": "Flour", "stock": {"2030-01-01": 1, "2030-02-01": 4}, "totalQuantity": 5},
+        "b": {"itemName": "Eggs", "stock": {"2030-01-01": 3}, "totalQuantity": 3},
+    })
+    # The planned lots of a were used up meanwhile, so the operation picks again
+    queue.enqueue([deduct("a", "Flour", 2, {"2030-01-01": 2}), deduct("b", "Eggs", 3, {"2030-01-01": 3})])
+    assert queue.flush()
+
+    assert queue.queue_status() == (0, 0)
+    assert sqlite.get("db/inventory/a") == {"itemName": "Flour", "stock": {"2030-02-01": 3}, "totalQuantity": 3}
+    assert sqlite.get("db/inventory/b/totalQuantity") == 0
+    assert not sqlite.get("db/inventory/b/stock")
+
+
+def test_unknown_operation_is_set_aside(sqlite, tmp_path):
+    journal = WriteJournal(str(tmp_path / "queue.db"))
+    journal.append([
+        {"kind": "operation", "steps": [{"path": "orders/o1", "name": "fromANewerVersion", "args": {}}], "then": None},
+        {"kind": "update", "changes": {"orders/o2/order_status": "Pending"}},
+    ])
+    journal.close()
+
+    queue = WriteBehindStorage(sqlite, str(tmp_path / "queue.db"))
+    try:
+        assert queue.flush()
+        assert queue.queue_status() == (0, 1)
+        assert sqlite.get("orders/o2/order_status") == "Pending"
+    finally:
+        queue.close()
+
+
+def test_listener_shows_queued_writes_once_and_ignores_their_echo(sqlite, queue):
+    sqlite.set("db/inventory/a", {"itemName": "Flour", "totalQuantity": 5})
+    events = []
+    registration = queue.listen("db/inventory", lambda *event: events.append(event))
+    assert events == [("put", "/", {"a": {"itemName": "Flour", "totalQuantity": 5}})]
+
+    queue.update("db/inventory/a", {"totalQuantity": Increment(2)})
+    queue.flush()
+    assert events[1:] == [("patch", "/", {"a": {"itemName": "Flour", "totalQuantity": 7}})]
+
+    # A change made elsewhere is passed on
+    sqlite.set("db/inventory/b", {"itemName": "Eggs", "totalQuantity": 1})
+    assert events[2:] == [("patch", "/", {"b": {"itemName": "Eggs", "totalQuantity": 1}})]
+    registration.close()
+
+
+def test_listener_rolls_back_a_refused_operation(sqlite, queue):
+    sqlite.set("db/inventory/a", {"itemName": "Flour", "stock": {"2030-01-01": 5}, "totalQuantity": 5})
+    events = []
+    registration = queue.listen("db/inventory", lambda *event: events.append(event))
+
+    # Another terminal takes the stock before this order is sent
+    queue._flush_lock.acquire()
+    try:
+        queue.enqueue([deduct("a", "Flour", 4, {"2030-01-01": 4})])
+        assert events[-1] == ("patch", "/", {"a": {"itemName": "Flour", "stock": {"2030-01-01": 1}, "totalQuantity": 1}})
+        sqlite.set("db/inventory/a", {"itemName": "Flour", "stock": {"2030-01-01": 2}, "totalQuantity": 2})
+    finally:
+        queue._flush_lock.release()
+    queue.flush()
+
+    assert queue.queue_status() == (0, 1)
+    assert events[-1] == ("patch", "/", {"a": {"itemName": "Flour", "stock": {"2030-01-01": 2}, "totalQuantity": 2}})
+    registration.close()
+
+
+def test_follow_up_sends_stock_to_the_owner_of_a_claimed_name(sqlite, queue):
+    # Another terminal created Flour first, as item b
+    sqlite.set("db/inventoryIndex/Flour", "b")
+    sqlite.set("db/inventory/b", {"itemName": "Flour", "stock": {"2030-01-01": 1}, "totalQuantity": 1})
+    items = {"a": {"itemName": "Flour", "stock": {"2030-01-01": 4}}}
+    queue.enqueue(
+        controllers.operations.claim_steps({"a": "Flour"}),
+        ("addStock", {"items": items, "claimed": ["a"]})
+    )
+    assert queue.flush()
+
+    assert queue.queue_status() == (0, 0)
+    assert sqlite.get("db/inventory/a") is None
+    assert sqlite.get("db/inventory/b") == {"itemName": "Flour", "stock": {"2030-01-01": 5}, "totalQuantity": 5}
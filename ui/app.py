@@ -2,17 +2,16 @@ import tkinter as tk
 from tkinter import ttk, messagebox, font
 from datetime import datetime, timedelta
 
-import firebase_admin
-from firebase_admin import credentials, db
+import importlib
 import os
-from dotenv import load_dotenv
+import threading
 
 from config.app_config import AppConfig
+from storage import get_storage
 from ui.inventory_page import InventoryPage
 from ui.recipe_page import RecipePage
 from ui.order_page import OrderPage
 from models.user import Admin
-from ui.dashboard_page import DashboardPage
 
 class StockOverflowApp(tk.Tk):
     def __init__(self):
@@ -23,14 +22,8 @@ class StockOverflowApp(tk.Tk):
         # App configuration
         self.config = AppConfig()
         
-        # Database connection
-        # Load environment variables
-        load_dotenv()
-        DB_URL = os.getenv("DB_URL")
-
-        # Initialize Firebase Admin SDK
-        cred = credentials.Certificate("key.json")
-        db = firebase_admin.initialize_app(cred, {"databaseURL": DB_URL})
+        # Database connection (backend chosen by AppConfig.STORAGE_BACKEND)
+        self.storage = get_storage()
 
         icon_path = os.path.join(os.path.dirname(__file__), "so_ico.png")
         self.iconphoto(False, tk.PhotoImage(file=icon_path))
@@ -42,6 +35,9 @@ class StockOverflowApp(tk.Tk):
         
         # Default user
         self.current_user = {"username": "Staff", "role": "Staff"}
+
+        # Pages are built once per login and kept alive between navigations
+        self.pages = {}
         
         # Initialize UI components
         self.create_custom_fonts()
@@ -201,17 +197,31 @@ class StockOverflowApp(tk.Tk):
         status_frame = tk.Frame(self, bg="#f0f0f0", height=25)
         status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        status_text = f"Stock Overflow System | Current Time: {current_time}"
-        
-        status_label = tk.Label(
+        self.status_label = tk.Label(
             status_frame,
-            text=status_text,
             font=("Helvetica", 10),
             bg="#f0f0f0",
             fg="#333333"
         )
-        status_label.pack(side=tk.LEFT, padx=10, pady=3)
+        self.status_label.pack(side=tk.LEFT, padx=10, pady=3)
+        self.update_clock()
+
+    def update_clock(self):
+        # Ticks on the main thread, so it keeps running while pages load in the background
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        status = f"Stock Overflow System | Current Time: {current_time}"
+        offline_since = self.storage.offline_since()
+        pending, refused = self.storage.queue_status()
+        if offline_since is not None:
+            # Pages keep working from the last data read; make sure nobody mistakes it for live data
+            status += f" | OFFLINE - showing data from {offline_since.strftime('%H:%M:%S')}"
+            if pending:
+                status += f" | {pending} changes waiting to sync"
+        if refused:
+            status += f" | {refused} changes could not be synced"
+        alert = offline_since is not None or refused
+        self.status_label.config(text=status, fg=self.config.SECONDARY_COLOR if alert else "#333333")
+        self.after(1000, self.update_clock)
 
     def handle_login(self, username, password, dialog):
         if self.admin.login(username, password):
@@ -258,6 +268,7 @@ class StockOverflowApp(tk.Tk):
                 )
                 self.orders_btn.grid(row=0, column=3, padx=10)
 
+            self.clear_content()
             self.show_dashboard()
         
             self.update_idletasks()
@@ -292,6 +303,7 @@ class StockOverflowApp(tk.Tk):
                 self.recipes_btn.grid_forget()
                 self.recipes_btn.grid(row=0, column=0, padx=10)
 
+            self.clear_content()
             self.show_recipes()
 
             self.update_idletasks()
@@ -299,60 +311,59 @@ class StockOverflowApp(tk.Tk):
             messagebox.showwarning("Error", "You are not logged in.")
 
     def clear_content(self):
+        # Pages depend on the current user's role, so they are rebuilt after a login or logout
         for widget in self.content_frame.winfo_children():
             widget.destroy()
+        self.pages = {}
+
+    def show_page(self, name, page_class):
+        # Hide the current page and show the named one, building it on first use. A hidden page's
+        # loads are left to finish: each is keyed, so there is at most one per table, and its
+        # result keeps the page current for refresh(). Cancelling would also drop a queued
+        # action's reply, such as a recipe order's.
+        for page in self.pages.values():
+            page.pack_forget()
+
+        page = self.pages.get(name)
+        if page is None:
+            page = page_class(
+                self.content_frame, 
+                self.storage, 
+                self.config, 
+                self.current_user,
+                self.title_font,
+                self.header_font,
+                self.normal_font
+            )
+            self.pages[name] = page
+        else:
+            page.refresh()
+        page.pack(fill=tk.BOTH, expand=True)
     
     def show_inventory(self):
-        self.clear_content()
-        inventory_page = InventoryPage(
-            self.content_frame, 
-            db, 
-            self.config, 
-            self.current_user,
-            self.title_font,
-            self.header_font,
-            self.normal_font
-        )
-        inventory_page.pack(fill=tk.BOTH, expand=True)
+        self.show_page("inventory", InventoryPage)
     
     def show_recipes(self):
-        self.clear_content()
-        recipe_page = RecipePage(
-            self.content_frame, 
-            "test", 
-            self.config, 
-            self.current_user,
-            self.title_font,
-            self.header_font,
-            self.normal_font
-        )
-        recipe_page.pack(fill=tk.BOTH, expand=True)
+        self.show_page("recipes", RecipePage)
     
     def show_orders(self):
-        self.clear_content()
-        order_page = OrderPage(
-            self.content_frame, 
-            "test", 
-            self.config, 
-            self.current_user,
-            self.title_font,
-            self.header_font,
-            self.normal_font
-        )
-        order_page.pack(fill=tk.BOTH, expand=True)
+        self.show_page("orders", OrderPage)
+
+    def warm_dashboard(self):
+        # Import matplotlib in the background ahead of an admin login; staff never pay for it
+        def preload():
+            try:
+                importlib.import_module("ui.dashboard_page")
+            except Exception as e:
+                print(f"Error preloading dashboard: {e}")
+
+        threading.Thread(target=preload, daemon=True).start()
 
     def show_dashboard(self):
-        self.clear_content()
-        dashboard_page = DashboardPage(
-            self.content_frame, 
-            "test", 
-            self.config, 
-            self.current_user,
-            self.title_font,
-            self.header_font,
-            self.normal_font
-        )
-        dashboard_page.pack(fill=tk.BOTH, expand=True)
+        # The dashboard pulls in matplotlib, so it is only imported when first shown
+        from ui.dashboard_page import DashboardPage
+
+        self.show_page("dashboard", DashboardPage)
     
     def switch_profile(self):
         dialog = tk.Toplevel(self)
@@ -364,6 +375,9 @@ class StockOverflowApp(tk.Tk):
 
         self.admin = Admin()
 
+        # Load the dashboard's dependencies while the credentials are typed in
+        self.warm_dashboard()
+
         self.center_window(dialog, 400, 350)
         
         header_frame = tk.Frame(dialog, bg=self.config.PRIMARY_COLOR, height=40)
@@ -0,0 +1,104 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads shared by every page; fetches spend their time waiting on the network
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ui-loader")
+
+# How often the Tk main thread checks for finished fetches while any are pending
+POLL_INTERVAL_MS = 50
+
+
+class AsyncLoader:
+    # Runs blocking fetches off the Tk main thread and hands their results back to it.
+    # Tk widgets may only be touched from the main thread, so workers post results to a
+    # queue and the main thread drains it with after() instead of calling back directly.
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._results = queue.Queue()
+        self._pending = {}
+        self._latest = {}
+        self._next_id = 0
+        self._poll_id = None
+        self._closed = False
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    def submit(self, fetch, on_done, on_error=None, key=None):
+        # Run fetch() on a worker; on_done(result) or on_error(exception) runs on the main thread.
+        # A newer request with the same key supersedes an older one that has not finished yet.
+        if self._closed:
+            return None
+        self._next_id += 1
+        request_id = self._next_id
+        if key is not None:
+            self.cancel(self._latest.get(key))
+            self._latest[key] = request_id
+
+        future = _executor.submit(self._run, request_id, fetch)
+        self._pending[request_id] = (future, key, on_done, on_error)
+        self._schedule_poll()
+        return request_id
+
+    def cancel(self, request_id=None):
+        # Drop one request, or every request when no id is given; late results are ignored
+        request_ids = list(self._pending) if request_id is None else [request_id]
+        for pending_id in request_ids:
+            entry = self._pending.pop(pending_id, None)
+            if entry is None:
+                continue
+            future, key, _, _ = entry
+            future.cancel()
+            if key is not None and self._latest.get(key) == pending_id:
+                del self._latest[key]
+
+    def close(self):
+        self._closed = True
+        self.cancel()
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+    def _run(self, request_id, fetch):
+        try:
+            self._results.put((request_id, fetch(), None))
+        except Exception as e:
+            self._results.put((request_id, None, e))
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while not self._closed:
+            try:
+                request_id, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                continue
+            _, key, on_done, on_error = entry
+            if key is not None and self._latest.get(key) == request_id:
+                del self._latest[key]
+
+            try:
+                if error is None:
+                    on_done(result)
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    print(f"Error loading data: {error}")
+            except Exception as e:
+                print(f"Error displaying loaded data: {e}")
+        if self._pending:
+            self._schedule_poll()
+
+    def _on_destroy(self, event):
+        # Pages are kept while hidden and keep their loads; once destroyed, stop waiting for their data
+        if event.widget is self.widget:
+            self.close()
+
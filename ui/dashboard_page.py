@@ -1,12 +1,120 @@
+import time
 import tkinter as tk
 from tkinter import ttk
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+import math
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 from controllers.food_inventory_controller import FoodInventory
 from controllers.staff_controller import StaffController
 from controllers.order_controller import OrderController
+from ui.async_loader import AsyncLoader
+
+# Dashboard fetches run side by side, so a refresh takes as long as the slowest one
+_fetch_pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="dashboard-fetch")
+
+class DashboardChart:
+    # A figure and Tk canvas created once per card and updated in place on every refresh.
+    # Figure is used instead of pyplot so figures are not kept alive by pyplot's registry.
+    # The tight layout is redone on every draw, since an update in place can change the width of
+    # tick labels or move pie labels.
+
+    def __init__(self, master):
+        self.frame = tk.Frame(master, bg="white")
+        self.figure = Figure(figsize=(4, 3), dpi=100, layout="tight")
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.data_key = None
+        self.labels = None
+        self.bars = []
+        self.annotations = []
+        self.wedges = []
+        self.texts = []
+        self.autotexts = []
+
+    def show(self):
+        # Packing again moves the chart after the widgets packed before it
+        self.frame.pack_forget()
+        self.frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def hide(self):
+        self.frame.pack_forget()
+
+    def update_bars(self, labels, values, color, ylabel, title):
+        # Skip the redraw entirely when the data has not changed since the last refresh
+        data_key = ("bar", tuple(labels), tuple(values))
+        if data_key == self.data_key:
+            return
+        self.data_key = data_key
+
+        if self.bars and self.labels == tuple(labels):
+            for bar, annotation, value in zip(self.bars, self.annotations, values):
+                bar.set_height(value)
+                annotation.xy = (bar.get_x() + bar.get_width() / 2, value)
+                annotation.set_text(f"{value}")
+            self.ax.relim()
+            self.ax.autoscale_view()
+        else:
+            self.ax.clear()
+            self.labels = tuple(labels)
+            self.wedges, self.texts, self.autotexts = [], [], []
+            self.bars = list(self.ax.bar(labels, values, color=color))
+            self.annotations = [
+                self.ax.annotate(f"{bar.get_height()}",
+                                 xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                                 xytext=(0, 3),
+                                 textcoords="offset points",
+                                 ha="center", va="bottom",
+                                 fontsize=8)
+                for bar in self.bars
+            ]
+            self.ax.set_ylabel(ylabel, fontsize=8)
+            self.ax.set_title(title, fontsize=10)
+            self.ax.tick_params(axis="x", labelrotation=45, labelsize=8)
+            self.ax.tick_params(axis="y", labelsize=8)
+        self.canvas.draw_idle()
+
+    def update_pie(self, values, labels, colors, startangle=90):
+        data_key = ("pie", tuple(labels), tuple(values))
+        if data_key == self.data_key:
+            return
+        self.data_key = data_key
+
+        if self.wedges and self.labels == tuple(labels):
+            # Same slices as before: move the wedge edges and their labels instead of redrawing the axes
+            total = float(sum(values))
+            theta = startangle
+            for wedge, text, autotext, value in zip(self.wedges, self.texts, self.autotexts, values):
+                sweep = 360.0 * value / total
+                wedge.set_theta1(theta)
+                wedge.set_theta2(theta + sweep)
+                middle = math.radians(theta + sweep / 2)
+                x, y = math.cos(middle), math.sin(middle)
+                text.set_position((1.1 * x, 1.1 * y))
+                text.set_horizontalalignment("left" if x > 0 else "right")
+                autotext.set_position((0.6 * x, 0.6 * y))
+                autotext.set_text(f"{100.0 * value / total:.1f}%")
+                theta += sweep
+        else:
+            self.ax.clear()
+            self.labels = tuple(labels)
+            self.bars, self.annotations = [], []
+            self.wedges, self.texts, self.autotexts = self.ax.pie(
+                values,
+                labels=labels,
+                colors=colors,
+                autopct='%1.1f%%',
+                startangle=startangle,
+                textprops={'fontsize': 8}
+            )
+            # A whole pie always spans the unit circle, so the limits are fixed and the axes box
+            # is made square; fitting the limits instead depends on the previous draw
+            self.ax.set(xlim=(-1.1, 1.1), ylim=(-1.1, 1.1))
+            self.ax.set_aspect('equal', adjustable='box')
+        self.canvas.draw_idle()
+
 
 class DashboardPage(tk.Frame):
     def __init__(self, parent, db, config, current_user, title_font, header_font, normal_font):
@@ -18,6 +126,10 @@ class DashboardPage(tk.Frame):
         self.title_font = title_font
         self.header_font = header_font
         self.normal_font = normal_font
+        self.loader = AsyncLoader(self)
+        self.charts = {}
+        self.shown_data = {}
+        self.loaded_at = None
         
         self.create_ui()
         self.load_dashboard_data()
@@ -142,18 +254,69 @@ class DashboardPage(tk.Frame):
 
         return card, scrollable_frame
 
+    def refresh(self):
+        # Called when the page is shown again; a recent snapshot is reused as it is
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.config.PAGE_REFRESH_SECONDS:
+            return
+        self.load_dashboard_data()
+
     def load_dashboard_data(self):
+        # Fetch everything in the background and keep the window responsive meanwhile
+        self.timestamp_label.config(text="Loading...")
+        for card, content in self.cards.values():
+            if not content.winfo_children():
+                tk.Label(content, text="Loading...", font=("Helvetica", 12), bg="white").pack(anchor="w", pady=5)
+
+        self.loader.submit(self.fetch_dashboard_data, self.show_dashboard_data, self.show_load_error, key="dashboard")
+
+    def fetch_dashboard_data(self):
+        # One snapshot shared by every card; runs on a worker thread, so it must not touch any widget
+        order_controller = OrderController()
+        fetches = {
+            "inventory": lambda: FoodInventory().displayItems(),
+            "recipes": lambda: StaffController().viewAllRecipes(),
+            "recent_orders": lambda: order_controller.get_recent_orders(5),
+            "pending_orders": order_controller.get_pending_orders,
+            "total_orders": order_controller.count_orders,
+        }
+        futures = {name: _fetch_pool.submit(fetch) for name, fetch in fetches.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def show_dashboard_data(self, data):
+        self.loaded_at = time.monotonic()
         self.timestamp_label.config(text=f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+        # Only cards whose inputs changed since the last snapshot are rebuilt
+        previous, self.shown_data = self.shown_data, data
+        if data["inventory"] != previous.get("inventory"):
+            self.load_inventory_summary(data["inventory"])
+            self.load_alerts(data["inventory"])
+        if data["recipes"] != previous.get("recipes"):
+            self.load_recipe_summary(data["recipes"])
+        order_keys = ("recent_orders", "pending_orders", "total_orders")
+        if any(data[key] != previous.get(key) for key in order_keys):
+            self.load_order_summary(data["recent_orders"], data["pending_orders"], data["total_orders"])
+
+    def show_load_error(self, error):
+        self.timestamp_label.config(text="Update failed")
+        self.shown_data = {}
+        chart_frames = [chart.frame for chart in self.charts.values()]
+        for chart in self.charts.values():
+            chart.hide()
+        for card, content in self.cards.values():
+            for widget in content.winfo_children():
+                if widget not in chart_frames:
+                    widget.destroy()
+            tk.Label(
+                content,
+                text=f"Error loading dashboard data: {str(error)}",
+                font=("Helvetica", 12),
+                bg="white",
+                fg="red"
+            ).pack(anchor="w", pady=5)
         
-        self.load_inventory_summary()
-        self.load_recipe_summary()
-        self.load_order_summary()
-        self.load_alerts()
-        
-    def load_inventory_summary(self):
+    def load_inventory_summary(self, inventory_data):
         try:
-            inventory_data = FoodInventory().displayItems()
-
             total_items = len(inventory_data)
             low_stock_count = 0
             near_expiry_count = 0
@@ -223,16 +386,17 @@ class DashboardPage(tk.Frame):
                 fg="red"
             ).pack(anchor="w", pady=5)
     
-    def load_recipe_summary(self):
+    def load_recipe_summary(self, recipes):
         try:
-            recipes = StaffController().viewAllRecipes()
-
             total_recipes = len(recipes)
 
             recipe_card, recipe_content = self.cards["recipe"]
+            chart = self.get_chart("recipe")
 
             for widget in recipe_content.winfo_children():
-                widget.destroy()
+                if widget is not chart.frame:
+                    widget.destroy()
+            chart.hide()
 
             summary_frame = tk.Frame(recipe_content, bg="white")
             summary_frame.pack(fill=tk.X, padx=5, pady=10)
@@ -318,35 +482,10 @@ class DashboardPage(tk.Frame):
                     if top_ingredients:
                         ingredients, counts = zip(*top_ingredients)
 
-                        fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
-
                         short_names = [name[:12] + '...' if len(name) > 12 else name for name in ingredients]
 
-                        bars = ax.bar(short_names, counts, color=self.config.PRIMARY_COLOR)
-
-                        for bar in bars:
-                            height = bar.get_height()
-                            ax.annotate(f'{height}',
-                                        xy=(bar.get_x() + bar.get_width() / 2, height),
-                                        xytext=(0, 3),
-                                        textcoords="offset points",
-                                        ha='center', va='bottom',
-                                        fontsize=8)
-
-                        ax.set_ylabel('Recipes', fontsize=8)
-                        ax.set_title('Ingredient Usage', fontsize=10)
-                        ax.tick_params(axis='x', labelrotation=45, labelsize=8)
-                        ax.tick_params(axis='y', labelsize=8)
-
-                        plt.tight_layout()
-
-                        # Create canvas for the matplotlib figure
-                        chart_frame = tk.Frame(recipe_content, bg="white")
-                        chart_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-                        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-                        canvas.draw()
-                        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+                        chart.update_bars(short_names, counts, self.config.PRIMARY_COLOR, 'Recipes', 'Ingredient Usage')
+                        chart.show()
             else:
                 tk.Label(
                     recipe_list_frame,
@@ -364,28 +503,25 @@ class DashboardPage(tk.Frame):
                 fg="red"
             ).pack(anchor="w", pady=5)
     
-    def load_order_summary(self):
+    def load_order_summary(self, orders, pending_orders, total_orders):
         try:
-            order_controller = OrderController()
-            orders = order_controller.get_all_orders()
-
             order_card, order_content = self.cards["order"]
+            chart = self.get_chart("order")
 
             for widget in order_content.winfo_children():
-                widget.destroy()
+                if widget is not chart.frame:
+                    widget.destroy()
+            chart.hide()
 
             summary_frame = tk.Frame(order_content, bg="white")
             summary_frame.pack(fill=tk.X, padx=5, pady=10)
 
-            total_orders = len(orders) if orders else 0
-
-            status_counts = {"Pending": 0, "Received": 0, "Other": 0}
-            for order_id, order_data in orders.items():
-                status = order_data.get("order_status", "Other")
-                if status in status_counts:
-                    status_counts[status] += 1
-                else:
-                    status_counts["Other"] += 1
+            # The app only creates pending orders and only ever marks them received, so every
+            # order that is not pending is received and counting keys is enough for the split
+            status_counts = {
+                "Pending": len(pending_orders),
+                "Received": max(total_orders - len(pending_orders), 0)
+            }
 
             tk.Label(
                 summary_frame,
@@ -421,37 +557,17 @@ class DashboardPage(tk.Frame):
                 )
                 chart_label.pack(anchor="w", padx=5, pady=5)
 
-                # Create pie chart
-                fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
-
                 # Data for pie chart
-                status_values = [status_counts['Pending'], status_counts['Received'], status_counts['Other']]
-                labels = ['Pending', 'Received', 'Other']
-                colors = ['#2196F3', '#4CAF50', '#9E9E9E']
+                status_values = [status_counts['Pending'], status_counts['Received']]
+                labels = ['Pending', 'Received']
+                colors = ['#2196F3', '#4CAF50']
 
                 filtered_data = [(count, label, color) for count, label, color in zip(status_values, labels, colors) if count > 0]
 
                 if filtered_data:
                     counts, labels, colors = zip(*filtered_data)
-                    ax.pie(
-                        counts, 
-                        labels=labels, 
-                        colors=colors,
-                        autopct='%1.1f%%', 
-                        startangle=90,
-                        textprops={'fontsize': 8}
-                    )
-
-                    ax.axis('equal')
-                    plt.tight_layout()
-
-                    # Create canvas for the matplotlib figure
-                    chart_frame = tk.Frame(order_content, bg="white")
-                    chart_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-                    canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-                    canvas.draw()
-                    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+                    chart.update_pie(counts, labels, colors)
+                    chart.show()
 
             separator2 = ttk.Separator(order_content, orient="horizontal")
             separator2.pack(fill=tk.X, padx=15, pady=10)
@@ -469,9 +585,7 @@ class DashboardPage(tk.Frame):
                 order_list_frame = tk.Frame(order_content, bg="white")
                 order_list_frame.pack(fill=tk.X, padx=10, pady=5)
 
-                order_items = list(orders.items())
-
-                for i, (order_id, order_data) in enumerate(order_items[:5]):
+                for i, (order_id, order_data) in enumerate(orders.items()):
                     order_date = order_data.get("order_date", "N/A")
                     order_status = order_data.get("order_status", "Pending")
 
@@ -546,11 +660,8 @@ class DashboardPage(tk.Frame):
                 fg="red"
             ).pack(anchor="w", pady=5)
     
-    def load_alerts(self):
+    def load_alerts(self, inventory_data):
         try:
-            # Get inventory data for alerts
-            inventory_data = FoodInventory().displayItems()
-
             alert_card, alert_content = self.cards["alert"]
 
             for widget in alert_content.winfo_children():
@@ -659,7 +770,13 @@ class DashboardPage(tk.Frame):
                 fg="red"
             ).pack(anchor="w", pady=5)
 
+    def get_chart(self, card_key):
+        # Charts are created on first use and then reused for the life of the page
+        if card_key not in self.charts:
+            card, content = self.cards[card_key]
+            self.charts[card_key] = DashboardChart(content)
+        return self.charts[card_key]
+
     def on_close(self):
-        plt.close("all")
         self.master.quit()
         self.master.destroy()
\ No newline at end of file
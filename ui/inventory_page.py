@@ -2,6 +2,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from controllers.food_inventory_controller import FoodInventory
+from controllers.inventory_cache import InventoryCache
+from controllers.search_index import SearchIndex
+from ui.async_loader import AsyncLoader
+from ui.virtual_table import VirtualTable
+
+COLUMN_TITLES = {"itemName": "Item Name", "stock": "Expiry Date", "totalQuantity": "Quantity"}
+
+# Columns combined in a sort: the last clicked one first, earlier clicks break ties
+MAX_SORT_KEYS = 2
 
 class InventoryPage(tk.Frame):
     
@@ -15,9 +24,15 @@ class InventoryPage(tk.Frame):
         self.header_font = header_font
         self.normal_font = normal_font
         
-        self.inventory_data = FoodInventory().displayItems()
+        self.inventory_data = []
+        self.all_rows = []
+        self.search_index = SearchIndex()
+        self.loaded_version = None
+        self.sort_keys = ["itemName"]
+        self.sort_key_cache = {}
+        self.loader = AsyncLoader(self)
         self.create_ui()
-        self.load_inventory_data()
+        self.refresh_inventory()
     
     def create_ui(self):
         header = tk.Frame(self, bg=self.config.BG_COLOR)
@@ -49,6 +64,19 @@ class InventoryPage(tk.Frame):
                 **self.config.BUTTON_STYLES["primary"]
             )
             add_btn.pack(side=tk.RIGHT, padx=15)
+
+        # Filters the loaded rows through the search index on every keystroke
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
+        search_entry = tk.Entry(header, textvariable=self.search_var, font=("Helvetica", 12), width=20)
+        search_entry.pack(side=tk.RIGHT, padx=5)
+        tk.Label(
+            header,
+            text="Search:",
+            font=("Helvetica", 12),
+            bg=self.config.BG_COLOR,
+            fg=self.config.TEXT_COLOR
+        ).pack(side=tk.RIGHT)
         
         self.create_legend()
         
@@ -62,7 +90,8 @@ class InventoryPage(tk.Frame):
         style.configure("Treeview", rowheight=25)
         style.configure("Treeview.Heading", font=("Helvetica", 12, "bold"))
         
-        self.tree = ttk.Treeview(table_frame, columns=("itemName", "stock", "totalQuantity"), show='headings')
+        # Only the rows on screen are handed to Tk, so large inventories stay fast to load and scroll
+        self.tree = VirtualTable(table_frame, columns=("itemName", "stock", "totalQuantity"), bg=self.config.BG_COLOR)
         self.tree.heading("itemName", text="Item Name ▼", command=lambda: self.on_column_click("itemName"))
         self.tree.heading("stock", text="Expiry Date", command=lambda: self.on_column_click("stock"))
         self.tree.heading("totalQuantity", text="Quantity", command=lambda: self.on_column_click("totalQuantity"))
@@ -71,9 +100,6 @@ class InventoryPage(tk.Frame):
         self.tree.column("stock", width=200, anchor="center")
         self.tree.column("totalQuantity", width=80, anchor="center")
         
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(fill=tk.BOTH, expand=True)
         self.tree.bind("<<TreeviewSelect>>", self.on_treeview_select)
 
@@ -148,13 +174,12 @@ class InventoryPage(tk.Frame):
         both_label.pack(side=tk.LEFT)
 
     def load_inventory_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
+        # Rows are keyed by item id, so the selection and scroll position survive a reload
         self.tree.tag_configure("low_stock", background=self.config.LIGHTY_COLOR, foreground="white")
         self.tree.tag_configure("near_expiry", background=self.config.ORANGE_COLOR, foreground="black")
         self.tree.tag_configure("low_and_near", background=self.config.SECONDARY_COLOR, foreground="black")
 
+        rows = []
         if self.inventory_data:
             for item_dict in self.inventory_data:
                 for item_id, item_details in item_dict.items():
@@ -175,9 +200,18 @@ class InventoryPage(tk.Frame):
                     else:
                         tag = ""
 
-                    self.tree.insert("", "end", values=(item_name, expiry_dates, total_quantity), tags=(tag,))
+                    rows.append((item_id, (item_name, expiry_dates, total_quantity), (tag,)))
         else:
             print("No inventory data found.")
+        self.all_rows = rows
+        self.apply_search()
+
+    def apply_search(self):
+        matches = self.search_index.search(self.search_var.get())
+        if matches is None:
+            self.tree.set_rows(self.all_rows)
+        else:
+            self.tree.set_rows([row for row in self.all_rows if row[0] in matches])
 
     def on_item_double_click(self, event):
         selected_item = self.tree.selection()
@@ -190,6 +224,9 @@ class InventoryPage(tk.Frame):
             expiry_dates = item_values[1]
             total_quantity = item_values[2]
 
+            # Saving or deleting is refused later if the item changes elsewhere after this point
+            base_item = InventoryCache.instance().get_item(selected_item[0])
+
             dialog = tk.Toplevel(self)
             dialog.title("Item Details")
             dialog.geometry("400x350")
@@ -290,10 +327,9 @@ class InventoryPage(tk.Frame):
                         "stock": {new_expiry_dates: int(new_total_quantity)},
                         "totalQuantity": int(new_total_quantity)
                     }
-                    FoodInventory().updateItem(item_id, update_data)
+                    FoodInventory().updateItem(item_id, update_data, base_item)
                     messagebox.showinfo("Success", "Item updated successfully!")
-                    self.inventory_data = FoodInventory().displayItems()
-                    self.load_inventory_data()
+                    self.refresh_inventory()
                     dialog.destroy()
 
             def delete_item():
@@ -306,10 +342,9 @@ class InventoryPage(tk.Frame):
 
                 if item_id:
                     if messagebox.askyesno("Delete Item", f"Are you sure you want to delete '{item_name}'?"):
-                        FoodInventory().deleteItem(item_id)
+                        FoodInventory().deleteItem(item_id, base_item)
                         messagebox.showinfo("Success", f"Deleted '{item_name}' successfully!")
-                        self.inventory_data = FoodInventory().displayItems()
-                        self.load_inventory_data()
+                        self.refresh_inventory()
                         dialog.destroy()
             
             button_frame = tk.Frame(content_frame, bg=self.config.BG_COLOR)
@@ -421,8 +456,7 @@ class InventoryPage(tk.Frame):
             messagebox.showinfo("Success", "Item added successfully!")
             dialog.destroy()
 
-            self.inventory_data = FoodInventory().displayItems()
-            self.load_inventory_data()
+            self.refresh_inventory()
 
         button_frame = tk.Frame(content_frame, bg=self.config.BG_COLOR)
         button_frame.pack(fill=tk.X, pady=15)
@@ -443,19 +477,99 @@ class InventoryPage(tk.Frame):
         )
         cancel_button.pack(side=tk.RIGHT, padx=5)
 
+    def refresh(self):
+        # Called when the page is shown again; the cache is live, so an unchanged one needs no work
+        if self.loaded_version is not None:
+            loaded_items, loaded_date = self.loaded_version
+            current_items, current_date = self.inventory_version()
+            if loaded_items is current_items and loaded_date == current_date:
+                return
+        self.refresh_inventory()
+
+    def inventory_version(self):
+        # Cached items are replaced on every change, so their identity tells whether anything changed.
+        # The date is part of it because near-expiry flags move at midnight.
+        return InventoryCache.instance().get_items(), datetime.now().date()
+
+    def refresh_inventory(self):
+        # Reload the inventory in the background and show it in the current sort order
+        if not self.inventory_data:
+            self.tree.show_message("Loading...")
+        self.loader.submit(
+            self.fetch_inventory,
+            self.on_inventory_loaded,
+            self.show_load_error,
+            key="inventory"
+        )
+
+    def fetch_inventory(self):
+        version = self.inventory_version()
+        inventory_data = FoodInventory().displayItems()
+
+        # Items are searchable by name or id; only items that changed are re-indexed
+        self.search_index.sync({
+            item_id: (item_details.get("itemName", ""),)
+            for item_dict in inventory_data
+            for item_id, item_details in item_dict.items()
+        })
+        return version, inventory_data
+
+    def show_load_error(self, error):
+        # Keep showing what was loaded before; only an empty table gets the message
+        if self.inventory_data:
+            print(f"Error loading inventory: {error}")
+        else:
+            self.tree.show_message(f"Error loading inventory: {error}")
+
+    def on_inventory_loaded(self, result):
+        self.loaded_version, inventory_data = result
+        self.tree.clear_message()
+        self.inventory_data = inventory_data
+        self.sort_key_cache = {}
+        self.sort_inventory_data()
+        self.load_inventory_data()
+
     def on_column_click(self, column_name):
         # Toggle sort order
         self.sort_order[column_name] = not self.sort_order[column_name]
-        order_symbol = "▲" if self.sort_order[column_name] else "▼"
 
-        self.tree.heading("itemName", text="Item Name")
-        self.tree.heading("stock", text="Expiry Date")
-        self.tree.heading("totalQuantity", text="Quantity")
+        # The clicked column becomes the primary key and the previous one breaks ties
+        self.sort_keys = [column_name] + [key for key in self.sort_keys if key != column_name]
+        self.sort_keys = self.sort_keys[:MAX_SORT_KEYS]
+
+        for column, title in COLUMN_TITLES.items():
+            self.tree.heading(column, text=title)
+        for rank, column in enumerate(self.sort_keys):
+            if rank == 0:
+                order_symbol = "▲" if self.sort_order[column] else "▼"
+            else:
+                order_symbol = "△" if self.sort_order[column] else "▽"
+            self.tree.heading(column, text=f"{COLUMN_TITLES[column]} {order_symbol}")
+
+        # Sort the rows already loaded instead of refetching; only the rows on screen are redrawn
+        self.sort_inventory_data()
+        self.load_inventory_data()
 
-        self.tree.heading(column_name, text=f"{column_name.replace('itemName', 'Item Name').replace('stock', 'Expiry Date').replace('totalQuantity', 'Quantity')} {order_symbol}")
+    def sort_inventory_data(self):
+        # Stable sorts from the least to the most significant key give a multi-key sort
+        for column in reversed(self.sort_keys):
+            keys = self.get_sort_keys(column)
+            self.inventory_data.sort(key=lambda item_dict: keys[next(iter(item_dict))], reverse=self.sort_order[column])
 
-        self.inventory_data = FoodInventory().displayItems(column_name, self.sort_order[column_name])
-        self.load_inventory_data()
+    def get_sort_keys(self, column):
+        # Sort keys are computed once per column until the data is reloaded
+        if column not in self.sort_key_cache:
+            keys = {}
+            for item_dict in self.inventory_data:
+                for item_id, item_details in item_dict.items():
+                    if column == "stock":
+                        keys[item_id] = item_details.get("earliestExpiry") or ""
+                    elif column == "totalQuantity":
+                        keys[item_id] = item_details.get("totalQuantity", 0)
+                    else:
+                        keys[item_id] = item_details.get("itemName", "")
+            self.sort_key_cache[column] = keys
+        return self.sort_key_cache[column]
 
     def center_window(self, window, width, height):
         screen_width = window.winfo_screenwidth()
@@ -1,8 +1,12 @@
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 from datetime import datetime
 from controllers.order_controller import OrderController
+from controllers.search_index import SearchIndex
 from models.order import Order
+from ui.async_loader import AsyncLoader
+from ui.virtual_table import VirtualTable
 
 class OrderPage(tk.Frame):
     
@@ -15,6 +19,11 @@ class OrderPage(tk.Frame):
         self.title_font = title_font
         self.header_font = header_font
         self.normal_font = normal_font
+        self.orders = None
+        self.all_rows = []
+        self.search_index = SearchIndex()
+        self.loaded_at = None
+        self.loader = AsyncLoader(self)
 
         self.create_ui()
         self.load_orders()
@@ -49,11 +58,19 @@ class OrderPage(tk.Frame):
         )
         self.receive_btn.pack(side=tk.RIGHT, padx=5)
 
+        # Filters the loaded rows through the search index on every keystroke
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
+        search_entry = tk.Entry(header, textvariable=self.search_var, font=("Helvetica", 12), width=20)
+        search_entry.pack(side=tk.RIGHT, padx=5)
+        tk.Label(header, text="Search:", font=("Helvetica", 12), bg=self.config.BG_COLOR, fg=self.config.TEXT_COLOR).pack(side=tk.RIGHT)
+
         table_frame = tk.Frame(self, bg=self.config.BG_COLOR)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         columns = ("ID", "Date", "Items", "Status")
-        self.orders_tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        # Only the rows on screen are handed to Tk, so long order lists stay fast to load and scroll
+        self.orders_tree = VirtualTable(table_frame, columns=columns, bg=self.config.BG_COLOR)
         
         self.orders_tree.heading("ID", text="ID")
         self.orders_tree.heading("Date", text="Date")
@@ -65,22 +82,63 @@ class OrderPage(tk.Frame):
         self.orders_tree.column("Items", width=200)
         self.orders_tree.column("Status", width=100)
         
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.orders_tree.yview)
-        self.orders_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.orders_tree.pack(fill=tk.BOTH, expand=True)
 
         self.orders_tree.bind("<<TreeviewSelect>>", self.on_row_selected)
         
+    def refresh(self):
+        # Called when the page is shown again; recently loaded orders are reused as they are
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.config.PAGE_REFRESH_SECONDS:
+            return
+        self.load_orders()
+
     def load_orders(self):
+        # Fetch orders in the background; the table shows a placeholder until the first load
+        if self.orders is None:
+            self.orders_tree.show_message("Loading...")
+        self.loader.submit(
+            self.fetch_orders,
+            self.show_orders,
+            self.show_load_error,
+            key="orders"
+        )
+
+    def fetch_orders(self):
+        # Every pending order plus the most recent ones, instead of the whole history
         order_controller = OrderController()
-        orders = order_controller.get_all_orders()
-        self.orders_tree.delete(*self.orders_tree.get_children())
-        
+        orders = order_controller.get_recent_orders(self.config.ORDER_PAGE_LIMIT)
+        orders.update(order_controller.get_pending_orders())
+        orders = dict(sorted(orders.items(), key=lambda x: x[1].get("order_date", "")))
+
+        # Orders are searchable by id, date, status and the items they contain
+        self.search_index.sync({
+            order_id: (order_data.get("order_date", ""), order_data.get("order_status", "Pending"),
+                       *order_data.get("order_content", {}))
+            for order_id, order_data in orders.items()
+        })
+        return orders
+
+    def show_load_error(self, error):
+        # Keep showing what was loaded before; only an empty table gets the message
+        if self.orders:
+            print(f"Error loading orders: {error}")
+        else:
+            self.orders = None
+            self.orders_tree.show_message(f"Error loading orders: {error}")
+
+    def show_orders(self, orders):
+        self.loaded_at = time.monotonic()
+        if orders == self.orders:
+            # Unchanged, so the rows and the current selection stay as they are
+            return
+        self.orders = orders
+
+        self.orders_tree.clear_message()
         if not orders:
             print("No orders found.")
-            return
 
+        # Rows are keyed by order id, so the selection survives a reload
+        rows = []
         for order_id, order_data in orders.items():
             order_date = order_data.get("order_date", "N/A")
             order_content = order_data.get("order_content", {})
@@ -91,12 +149,19 @@ class OrderPage(tk.Frame):
                 for item, details in order_content.items()]
             )
 
-            self.orders_tree.insert(
-                "", tk.END, 
-                values=(order_id, order_date, formatted_content, order_status)
-            )
+            rows.append((order_id, (order_id, order_date, formatted_content, order_status), ()))
 
-            print(f"Order ID: {order_id}, Date: {order_date}, Items: {formatted_content}, Status: {order_status}")
+        self.all_rows = rows
+        self.apply_search()
+        # A kept selection may now point at an order that was received meanwhile
+        self.on_row_selected(None)
+
+    def apply_search(self):
+        matches = self.search_index.search(self.search_var.get())
+        if matches is None:
+            self.orders_tree.set_rows(self.all_rows)
+        else:
+            self.orders_tree.set_rows([row for row in self.all_rows if row[0] in matches])
 
     def on_row_selected(self, event):
         # Enable the Receive Order button only if a row is selected and not received
@@ -125,9 +190,10 @@ class OrderPage(tk.Frame):
             return
         
         order_controller = OrderController()
-        order_controller.receive_order(order_id)
-        
-        messagebox.showinfo("Success", f"Order {order_id} received!")
+        if order_controller.receive_order(order_id):
+            messagebox.showinfo("Success", f"Order {order_id} queued to be received!")
+        else:
+            messagebox.showerror("Error", f"Order {order_id} could not be received, it may no longer be pending.")
         
         self.load_orders()
         self.receive_btn.config(state=tk.DISABLED)
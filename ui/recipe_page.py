@@ -1,9 +1,14 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from controllers.staff_controller import StaffController
+from controllers.inventory_cache import InventoryCache
+from controllers.search_index import SearchIndex
 from models.recipe import Recipe
 from models.ingredient import Ingredient
+from ui.async_loader import AsyncLoader
+from ui.virtual_table import VirtualTable
 
 class RecipePage(tk.Frame):
     def __init__(self, parent, db, config, current_user, title_font, header_font, normal_font):
@@ -17,6 +22,12 @@ class RecipePage(tk.Frame):
         self.normal_font = normal_font
         
         self.selected_recipe_id = None
+        self.recipes = None
+        self.recipe_data = {}
+        self.all_rows = []
+        self.search_index = SearchIndex()
+        self.loaded_at = None
+        self.loader = AsyncLoader(self)
         
         self.create_ui()
 
@@ -35,12 +46,19 @@ class RecipePage(tk.Frame):
                                         **self.config.BUTTON_STYLES["secondary"]
                                         )
             self.delete_btn.pack(side=tk.RIGHT, padx=5)
+
+        # Filters the loaded rows through the search index on every keystroke
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
+        search_entry = tk.Entry(header, textvariable=self.search_var, font=("Helvetica", 12), width=20)
+        search_entry.pack(side=tk.RIGHT, padx=5)
+        tk.Label(header, text="Search:", font=("Helvetica", 12), bg=self.config.BG_COLOR, fg=self.config.TEXT_COLOR).pack(side=tk.RIGHT)
         
         table_frame = tk.Frame(self, bg=self.config.BG_COLOR)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         columns = ("Recipe Name", "Ingredients")
-        self.recipes_tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        self.recipes_tree = VirtualTable(table_frame, columns=columns, bg=self.config.BG_COLOR)
 
         self.recipes_tree.heading("Recipe Name", text="Recipe Name")
         self.recipes_tree.heading("Ingredients", text="Ingredients")
@@ -48,11 +66,7 @@ class RecipePage(tk.Frame):
         self.recipes_tree.column("Recipe Name", width=200, anchor="center")
         self.recipes_tree.column("Ingredients", width=300, anchor="center")
 
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.recipes_tree.yview)
-        self.recipes_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.recipes_tree.pack(fill=tk.BOTH, expand=True)
-
         self.recipes_tree.bind("<<TreeviewSelect>>", self.on_row_selected)
 
         self.action_frame = tk.Frame(self, bg=self.config.BG_COLOR)
@@ -66,17 +80,64 @@ class RecipePage(tk.Frame):
 
         self.load_recipe_data()
 
+    def refresh(self):
+        # Called when the page is shown again; recently loaded recipes are reused as they are
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.config.PAGE_REFRESH_SECONDS:
+            return
+        self.load_recipe_data()
+
     def load_recipe_data(self):
-        self.recipes_tree.delete(*self.recipes_tree.get_children())
+        # Fetch recipes in the background; the table shows a placeholder until the first load
+        if self.recipes is None:
+            self.recipes_tree.show_message("Loading...")
+        self.loader.submit(
+            lambda: StaffController().viewAllRecipes(),
+            self.show_recipe_data,
+            self.show_load_error,
+            key="recipes"
+        )
+
+    def show_load_error(self, error):
+        # Keep showing what was loaded before; only an empty table gets the message
+        if self.recipes:
+            print(f"Error loading recipes: {error}")
+        else:
+            self.recipes = None
+            self.recipes_tree.show_message(f"Error loading recipes: {error}")
 
-        recipes = StaffController().viewAllRecipes()
+    def show_recipe_data(self, recipes):
+        self.loaded_at = time.monotonic()
+        if recipes == self.recipes:
+            # Unchanged, so the rows and the current selection stay as they are
+            return
+        self.recipes = recipes
+
+        self.recipes_tree.clear_message()
+
+        # Rows are keyed by recipe id, so the selection survives a reload
+        rows = []
+        documents = {}
+        self.recipe_data = {}
         for recipe_entry in recipes:
             for recipe_id, recipe_data in recipe_entry.items():
+                self.recipe_data[recipe_id] = recipe_data
                 recipe_name = recipe_data.get("recipeName", "Unknown Recipe")
                 ingredients = recipe_data.get("ingredients", {})
                 ingredients_str = ", ".join([f"{item} ({qty})" for item, qty in ingredients.items()])
 
-                self.recipes_tree.insert("", tk.END, values=(recipe_name, ingredients_str), tags=(recipe_id,))
+                rows.append((recipe_id, (recipe_name, ingredients_str), (recipe_id,)))
+                documents[recipe_id] = (recipe_name, *ingredients)
+        self.search_index.sync(documents)
+        self.all_rows = rows
+        self.apply_search()
+
+    def apply_search(self):
+        # Recipes match on their name, their ingredient names or their id
+        matches = self.search_index.search(self.search_var.get())
+        if matches is None:
+            self.recipes_tree.set_rows(self.all_rows)
+        else:
+            self.recipes_tree.set_rows([row for row in self.all_rows if row[0] in matches])
 
     def on_row_selected(self, event):
         selected = self.recipes_tree.selection()
@@ -95,13 +156,28 @@ class RecipePage(tk.Frame):
         if not self.selected_recipe_id:
             return
 
-        success = StaffController().orderRecipe(self.selected_recipe_id)
+        # The recipe comes from the loaded rows and the order is planned on a worker, since the
+        # first order starts the inventory cache
+        recipe_id = self.selected_recipe_id
+        recipe = self.recipe_data.get(recipe_id)
+        self.make_button.config(state=tk.DISABLED)
+        self.loader.submit(
+            lambda: StaffController().orderRecipe(recipe_id, recipe),
+            self.show_order_result,
+            self.show_order_error
+        )
 
+    def show_order_result(self, success):
+        self.make_button.config(state=tk.NORMAL if self.selected_recipe_id else tk.DISABLED)
         if success:
-            messagebox.showinfo("Success", "Recipe made successfully, inventory updated!")
+            messagebox.showinfo("Success", "Recipe order queued, inventory updated!")
         else:
             messagebox.showerror("Error", "Not enough ingredients in inventory!")
 
+    def show_order_error(self, error):
+        self.make_button.config(state=tk.NORMAL if self.selected_recipe_id else tk.DISABLED)
+        messagebox.showerror("Error", f"Could not order the recipe: {error}")
+
     def add_recipe(self):
         dialog = tk.Toplevel(self)
         dialog.title("Add Recipe")
@@ -143,11 +219,23 @@ class RecipePage(tk.Frame):
             fg=self.config.TEXT_COLOR
         ).pack(anchor="w", pady=(10, 2))
 
-        inventory_items = [item["itemName"] for item in StaffController().inventory_ref.get().values()]
         ingredient_var = tk.StringVar()
-        ingredient_dropdown = ttk.Combobox(content_frame, textvariable=ingredient_var, values=inventory_items)
+        ingredient_dropdown = ttk.Combobox(content_frame, textvariable=ingredient_var, values=[])
         ingredient_dropdown.pack(anchor="w", pady=(0, 10), fill=tk.X)
 
+        # The first use of the inventory cache may download the inventory, so the names are
+        # fetched on a worker and filled in when they arrive
+        def show_item_names(names):
+            if ingredient_dropdown.winfo_exists():
+                ingredient_dropdown.config(values=names)
+
+        self.loader.submit(
+            lambda: InventoryCache.instance().item_names(),
+            show_item_names,
+            lambda error: print(f"Error loading inventory items: {error}"),
+            key="item_names"
+        )
+
         tk.Label(
             content_frame, 
             text="Quantity:",
@@ -0,0 +1,206 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Rows moved per mouse wheel notch
+WHEEL_ROWS = 3
+
+
+class VirtualTable(tk.Frame):
+    # A table whose rows live in a Python list; Tk only ever holds the rows on screen.
+    # The inner Treeview keeps a small pool of rows that are refilled as the view scrolls,
+    # so creating and scrolling 100k rows costs the same as a screenful.
+    # It mirrors the parts of the Treeview API the pages use (heading, column,
+    # tag_configure, selection, item and <<TreeviewSelect>>), keyed by the row ids.
+
+    def __init__(self, master, columns, height=20, **kwargs):
+        super().__init__(master, **kwargs)
+        self.rows = []
+        self.positions = {}
+        self.top = 0
+        self.visible = height
+        self.selected = set()
+        self.anchor = None
+        self.message = None
+        self.shown = []
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", self.on_wheel)
+        self.tree.bind("<Button-5>", self.on_wheel)
+        self.tree.bind("<Up>", lambda event: self.step_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.step_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.step_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.step_selection(self.visible))
+
+    # Treeview-compatible API
+
+    def heading(self, column, **options):
+        return self.tree.heading(column, **options)
+
+    def column(self, column, **options):
+        return self.tree.column(column, **options)
+
+    def tag_configure(self, tag, **options):
+        return self.tree.tag_configure(tag, **options)
+
+    def selection(self):
+        return tuple(sorted(self.selected, key=self.positions.get))
+
+    def item(self, iid, option=None):
+        # Accepts a selection tuple like Treeview does when one row is selected
+        if isinstance(iid, tuple):
+            iid = iid[0]
+        _, values, tags = self.rows[self.positions[iid]]
+        row = {"values": values, "tags": tags}
+        return row if option is None else row[option]
+
+    def exists(self, iid):
+        return iid in self.positions
+
+    # Data
+
+    def set_rows(self, rows):
+        # Replace the backing rows, an ordered list of (iid, values, tags); only the view is redrawn
+        self.rows = [(iid, tuple(values), tuple(tags)) for iid, values, tags in rows]
+        self.positions = {iid: position for position, (iid, _, _) in enumerate(self.rows)}
+
+        previous = self.selected
+        self.selected = {iid for iid in previous if iid in self.positions}
+        if self.anchor not in self.positions:
+            self.anchor = None
+
+        self.top = self.clamp(self.top)
+        self.render()
+        if self.selected != previous:
+            self.event_generate("<<TreeviewSelect>>")
+
+    def show_message(self, text):
+        # Show a single unselectable message row instead of the data, e.g. while loading
+        self.message = text
+        self.tree.delete(*self.tree.get_children())
+        self.shown = []
+        blanks = ("",) * (len(self.tree["columns"]) - 1)
+        self.tree.insert("", "end", iid="message", values=(text,) + blanks)
+        self.tree.configure(selectmode="none")
+
+    def clear_message(self):
+        if self.message is None:
+            return
+        self.message = None
+        self.tree.delete(*self.tree.get_children())
+        self.tree.configure(selectmode="extended")
+        self.render()
+
+    def see(self, iid):
+        position = self.positions.get(iid)
+        if position is None:
+            return
+        if position < self.top:
+            self.scroll_to(position)
+        elif position >= self.top + self.visible:
+            self.scroll_to(position - self.visible + 1)
+
+    # Rendering
+
+    def clamp(self, top):
+        return max(0, min(top, len(self.rows) - self.visible))
+
+    def render(self):
+        if self.message is not None:
+            return
+        window = self.rows[self.top:self.top + self.visible]
+
+        # Grow or shrink the pool of Tk rows to the size of the window
+        if not self.shown and window:
+            self.after_idle(self.measure)
+        for slot in range(len(self.shown), len(window)):
+            self.tree.insert("", "end", iid=f"slot{slot}")
+            self.shown.append(None)
+        if len(self.shown) > len(window):
+            self.tree.delete(*[f"slot{slot}" for slot in range(len(window), len(self.shown))])
+            del self.shown[len(window):]
+
+        # Only slots whose row changed are rewritten
+        selection = []
+        for slot, row in enumerate(window):
+            if self.shown[slot] != row:
+                self.tree.item(f"slot{slot}", values=row[1], tags=row[2])
+                self.shown[slot] = row
+            if row[0] in self.selected:
+                selection.append(f"slot{slot}")
+        self.tree.selection_set(selection)
+
+        if self.rows:
+            self.scrollbar.set(self.top / len(self.rows), (self.top + len(window)) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, top):
+        top = self.clamp(top)
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    # Events
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.top - WHEEL_ROWS)
+        else:
+            self.scroll_to(self.top + WHEEL_ROWS)
+        return "break"
+
+    def on_resize(self, event):
+        self.measure()
+
+    def measure(self):
+        # Fit the pool to the height actually available, using the first row to measure
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if not bbox:
+            return
+        _, heading_height, _, row_height = bbox
+        visible = max(1, (self.tree.winfo_height() - heading_height) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.top = self.clamp(self.top)
+            self.render()
+
+    def on_tree_select(self, event):
+        # Translate the selection of on-screen slots back to row ids; rows off screen keep theirs
+        if self.message is not None:
+            return
+        on_screen = {row[0] for row in self.rows[self.top:self.top + self.visible]}
+        picked = {self.shown[int(slot[len("slot"):])][0] for slot in self.tree.selection()}
+        selected = (self.selected - on_screen) | picked
+        if selected != self.selected:
+            if picked - self.selected:
+                self.anchor = next(iter(picked - self.selected))
+            self.selected = selected
+            self.event_generate("<<TreeviewSelect>>")
+
+    def step_selection(self, offset):
+        # Keyboard navigation that scrolls past the rows on screen
+        if not self.rows or self.message is not None:
+            return "break"
+        position = self.positions.get(self.anchor, self.top - 1 if offset > 0 else self.top)
+        position = max(0, min(position + offset, len(self.rows) - 1))
+        self.anchor = self.rows[position][0]
+        self.selected = {self.anchor}
+        self.see(self.anchor)
+        self.render()
+        self.event_generate("<<TreeviewSelect>>")
+        return "break"